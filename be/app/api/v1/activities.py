@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from app.services import activity_service
 from typing import Dict, Any
 
@@ -7,8 +8,8 @@ router = APIRouter()
 
 @router.get("/activities", response_model=Dict[str, Any])
 async def get_activities():
-    return activity_service.get_detected_activities()
+    return await run_in_threadpool(activity_service.get_detected_activities)
 
 @router.get("/fullscan-activities", response_model=Dict[str, Any])
 async def get_fullscan_activities():
-    return activity_service.get_fullscan_detected_activities()
\ No newline at end of file
+    return await run_in_threadpool(activity_service.get_fullscan_detected_activities)
\ No newline at end of file
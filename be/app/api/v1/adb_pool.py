@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+from app.utils.adb_pool import adb_pool
+
+# Inisialisasi router
+router = APIRouter()
+
+
+@router.get("/adb-pool-stats")
+async def adb_pool_stats():
+    try:
+        return {
+            "status": 200,
+            "message": "ADB pool stats retrieved successfully",
+            "data": adb_pool.stats(),
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get ADB pool stats: {str(e)}"
+        )
@@ -21,6 +21,10 @@ from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from app.repositories.risk_repository import RiskRepository
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    ScanCatalogRepository,
+)
 
 router = APIRouter()
 load_dotenv()
@@ -33,10 +37,13 @@ os.makedirs(BASE_SCAN_PATH, exist_ok=True)
 
 def get_latest_scan_directory(base_path: Path) -> Path:
         try:
-            directories = [d for d in base_path.iterdir() if d.is_dir()]
-            if not directories:
-                raise FileNotFoundError(f"Tidak ada direktori scan ditemukan di {base_path}")
-            latest_directory = max(directories, key=lambda x: x.stat().st_mtime)
+            latest_directory = ScanCatalogRepository.get_latest_scan_directory(
+                base_path, status=SCAN_STATUS_COMPLETED
+            )
+            if latest_directory is None:
+                raise FileNotFoundError(
+                    f"Tidak ada direktori scan selesai ditemukan di {base_path}"
+                )
             logger.info(f"Direktori scan terbaru ditemukan: {latest_directory}")
             return latest_directory
         except Exception as e:
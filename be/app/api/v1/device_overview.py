@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from app.services.device_overview_service import DeviceOverviewService
 
 router = APIRouter()
@@ -7,7 +8,9 @@ router = APIRouter()
 @router.get("/device-overview/")
 async def device_overview():
     try:
-        overview_data = DeviceOverviewService.get_device_overview()
+        overview_data = await run_in_threadpool(
+            DeviceOverviewService.get_device_overview
+        )
 
         return {
             "status": 200,
@@ -1,5 +1,4 @@
 import asyncio
-import shutil
 import aiohttp
 import os
 import logging
@@ -10,21 +9,33 @@ import requests
 import aiohttp
 import httpx
 import subprocess
+import queue
+import threading
 
 from pathlib import Path
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set
 from app.repositories.data_pulling_repository import Data_Pulling
 from app.services.data_pulling_service import dataPullingService
 from app.services.device_overview_service import DeviceOverviewService
 from app.services.device_scan_service import run_device_scan
+from app.services.scan_scheduler import scan_scheduler
+from app.utils.adb_pool import adb_pool
 from app.utils.calculate_progress import calculate_realistic_progress
+from app.utils.file_hash import sha256_file
+from app.utils.token_bucket import TokenBucket
 from app.repositories.risk_repository import RiskRepository
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    SCAN_STATUS_FAILED,
+    ScanCatalogRepository,
+)
 from app.repositories.fast_scan_repository import read_dumpsys_activities, calculate_security_percentage_from_activities, background_fast_scan
-from app.api.v1.results import get_result
+from app.api.v1.results import generate_scan_result
 
 router = APIRouter()
 load_dotenv()
@@ -96,32 +107,33 @@ async def get_device_details(serial_number: str) -> dict:
         logger.error(f"Gagal mengambil detail perangkat: {e}")
         return {}
     
-def restart_adb_server():
+def reconnect_device(serial_number: str):
+    # Hanya device yang bermasalah yang di-reconnect, ADB server tetap berjalan
+    # agar scan device lain tidak terputus.
     try: 
-        subprocess.run(["adb","kill-server"], check=True)
-        subprocess.run(["adb","start-server"], check=True)
+        with adb_pool.server_access(serial_number):
+            subprocess.run(["adb", "-s", serial_number, "reconnect"], check=True)
 
-        print('=== ADB Server restarted Successfully ! ===')
+        print(f'=== Device {serial_number} reconnected Successfully ! ===')
     except subprocess.CalledProcessError as e:
-        print(f"Failed to Restart ADB Server {e}")
+        print(f"Failed to Reconnect Device {serial_number} {e}")
         raise
 
 @router.get("/fastscan-progress/{serial_number}")
 async def fastscan_progress(serial_number: str):
     try:
         
-        base_dir = f"output-scan/fast-scan/{serial_number}"
+        base_dir = BASE_SCAN_PATH / "fast-scan" / serial_number
         
         if not os.path.exists(base_dir):
             raise HTTPException(status_code=404, detail="Serial number directory not found")
         
-        subdirs = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-        if not subdirs:
+        # Progress dari scan terbaru, bukan folder pertama hasil listing
+        target_folder = ScanCatalogRepository.get_latest_scan_directory(base_dir)
+        if target_folder is None:
             raise HTTPException(status_code=404, detail="No subdirectory found in serial number directory")
         
-        target_folder = subdirs[0]
-        
-        log_file_path = os.path.join(base_dir, target_folder, "command.log")
+        log_file_path = os.path.join(target_folder, "command.log")
         if not os.path.exists(log_file_path):
             logger.error("Log file not found!")
             raise HTTPException(status_code=404, detail="Log file not found")
@@ -138,23 +150,21 @@ async def fastscan_progress(serial_number: str):
 async def fullscan_progress(serial_number: str):
     try:
         
-        base_dir = f"output-scan/full-scan/{serial_number}"
+        base_dir = BASE_SCAN_PATH / "full-scan" / serial_number
         
         
         if not os.path.exists(base_dir):
             raise HTTPException(status_code=404, detail="Serial number directory not found")
         
         
-        subdirs = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
+        # Progress dari scan terbaru, bukan folder pertama hasil listing
+        target_folder = ScanCatalogRepository.get_latest_scan_directory(base_dir)
         
-        if not subdirs:
+        if target_folder is None:
             raise HTTPException(status_code=404, detail="No subdirectory found in serial number directory")
         
         
-        target_folder = subdirs[0]
-        
-        
-        log_file_path = os.path.join(base_dir, target_folder, "command.log")
+        log_file_path = os.path.join(target_folder, "command.log")
         print(f"Looking for log file at: {log_file_path}")
 
         if not os.path.exists(log_file_path):
@@ -172,13 +182,15 @@ async def fullscan_progress(serial_number: str):
         )
 
 @router.post("/fast-scan/{serial_number}")
-async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundTasks):
+async def fast_scan(serial_number: str, name: str):
     try:
         start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         current_time = datetime.now().strftime("%d%m%Y_%H%M%S")
         scan_id = f"{serial_number}_{current_time}"
         
-        device_details = DeviceOverviewService.get_device_overview()
+        device_details = await run_in_threadpool(
+            DeviceOverviewService.get_device_overview, serial_number
+        )
         model = device_details.get("model", "")
         imei1 = device_details.get("imei1", "")
         imei2 = device_details.get("imei2", "")
@@ -192,6 +204,7 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
         
         output_dir = BASE_SCAN_PATH / "fast-scan" / serial_number / current_time
         output_dir.mkdir(parents=True, exist_ok=True)
+        ScanCatalogRepository.record_scan(output_dir, "fast-scan", serial_number, scan_id)
         
         # Buat file detail_result.json awal dengan menyertakan time_stamp
         fast_scan_result_path = output_dir / "detail_result.json"
@@ -245,28 +258,34 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
             json.dump(history_entries, f, indent=4)
         
         # Kirim data new_entry ke background task agar initial_data selalu tersedia
-        background_tasks.add_task(background_fast_scan, str(output_dir), serial_number, scan_id, new_entry)
+        job = scan_scheduler.submit(
+            serial_number, scan_id, "fast-scan",
+            background_fast_scan, str(output_dir), serial_number, scan_id, new_entry
+        )
         
         return {
             "status": 200,
             "message": "Fast scan started successfully in the background",
-            "data": {"serial_number": serial_number, "name": name, "scan_id": scan_id},
+            "data": {"serial_number": serial_number, "name": name, "scan_id": scan_id, "queue_status": job["status"]},
         }
     
     except Exception as e:
         error_message = str(e)
         # Penanganan error (termasuk restart ADB) seperti sebelumnya...
         if "Unable to connect to the device over USB" in error_message or "Device is busy" in error_message:
-            logger.error("Detected connection or busy error. Restarting ADB server...")
+            logger.error(f"Detected connection or busy error. Reconnecting device {serial_number}...")
             try:
-                restart_adb_server()
+                await run_in_threadpool(reconnect_device, serial_number)
                 if fast_scan_result_path.exists():
                     with open(fast_scan_result_path, "r") as f:
                         result_data = json.load(f)
                     result_data["status"] = "restarted"
                     with open(fast_scan_result_path, "w") as f:
                         json.dump(result_data, f, indent=4)
-                background_tasks.add_task(background_fast_scan, str(output_dir), serial_number, scan_id, new_entry)
+                scan_scheduler.submit(
+                    serial_number, scan_id, "fast-scan",
+                    background_fast_scan, str(output_dir), serial_number, scan_id, new_entry
+                )
                 if history_scan_path.exists():
                     with open(history_scan_path, "r") as f:
                         history_entries = json.load(f)
@@ -278,7 +297,7 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
                         json.dump(history_entries, f, indent=4)
                 return {
                     "status": 200,
-                    "message": "ADB server restarted and fast scan retried in the background",
+                    "message": "Device reconnected and fast scan retried in the background",
                     "data": {"serial_number": serial_number, "name": name, "scan_id": scan_id},
                 }
             except Exception as adb_error:
@@ -290,6 +309,7 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
                     result_data["failed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     with open(fast_scan_result_path, "w") as f:
                         json.dump(result_data, f, indent=4)
+                    ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_FAILED)
                 if history_scan_path.exists():
                     with open(history_scan_path, "r") as f:
                         history_entries = json.load(f)
@@ -301,7 +321,7 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
                         json.dump(history_entries, f, indent=4)
                 raise HTTPException(
                     status_code=500,
-                    detail=f"Failed to restart ADB server and retry fast scan: {str(adb_error)}"
+                    detail=f"Failed to reconnect device and retry fast scan: {str(adb_error)}"
                 )
         else:
             if fast_scan_result_path.exists():
@@ -312,6 +332,7 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
                 result_data["failed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 with open(fast_scan_result_path, "w") as f:
                     json.dump(result_data, f, indent=4)
+                ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_FAILED)
             if history_scan_path.exists():
                 with open(history_scan_path, "r") as f:
                     history_entries = json.load(f)
@@ -328,11 +349,14 @@ async def fast_scan(serial_number: str, name: str, background_tasks: BackgroundT
 
 
 @router.post("/full-scan/{serial_number}")
-async def full_scan(serial_number: str, name: str, background_tasks: BackgroundTasks):
+async def full_scan(serial_number: str, name: str):
+    output_dir = None
     try:
         start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        device_details = DeviceOverviewService.get_device_overview()
+        device_details = await run_in_threadpool(
+            DeviceOverviewService.get_device_overview, serial_number
+        )
         current_time = datetime.now().strftime("%d%m%Y_%H%M%S")
         
         model = device_details.get("model", "Unknown")
@@ -408,6 +432,7 @@ async def full_scan(serial_number: str, name: str, background_tasks: BackgroundT
         
         output_dir = BASE_SCAN_PATH / "full-scan" / serial_number / current_time
         output_dir.mkdir(parents=True, exist_ok=True)
+        ScanCatalogRepository.record_scan(output_dir, scan_type, serial_number, scan_id)
         
         
         # bagian ini untuk membuat detail_result.json
@@ -421,7 +446,9 @@ async def full_scan(serial_number: str, name: str, background_tasks: BackgroundT
 
         
         
-        background_tasks.add_task(run_full_scan, str(output_dir), serial_number, scan_id)
+        job = scan_scheduler.submit(
+            serial_number, scan_id, scan_type, run_full_scan, str(output_dir), serial_number, scan_id
+        )
         
         
         add_scan_history(
@@ -444,21 +471,26 @@ async def full_scan(serial_number: str, name: str, background_tasks: BackgroundT
                 "serial_number": serial_number,
                 "name": name,
                 "scan_type": scan_type,
-                "scan_id": scan_id
+                "scan_id": scan_id,
+                "queue_status": job["status"]
             },
         }
     except Exception as e:
-        
+        # Scan yang sudah tercatat di katalog tapi gagal dijadwalkan
+        if output_dir is not None:
+            ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_FAILED)
         return {"status": 500, "message": f"Failed to start full scan: {str(e)}"}    
     
     except Exception as e:
         error_message = str(e)
         if "Unable to connect to the device over USB" in error_message or "Device is busy" in error_message:
-            logger.error("Detected connection or busy error. Restarting ADB server...")
+            logger.error(f"Detected connection or busy error. Reconnecting device {serial_number}...")
             try:
-                restart_adb_server()
+                await run_in_threadpool(reconnect_device, serial_number)
                 
-                background_tasks.add_task(run_full_scan, str(output_dir), serial_number, scan_id)
+                scan_scheduler.submit(
+                    serial_number, scan_id, scan_type, run_full_scan, str(output_dir), serial_number, scan_id
+                )
                 add_scan_history(
                     no=entry_no,
                     name=name,
@@ -473,7 +505,7 @@ async def full_scan(serial_number: str, name: str, background_tasks: BackgroundT
                 )
                 return {
                     "status": 200,
-                    "message": "ADB server restarted and full scan retried in the background",
+                    "message": "Device reconnected and full scan retried in the background",
                     "data": {
                         "serial_number": serial_number,
                         "name": name,
@@ -496,7 +528,7 @@ async def full_scan(serial_number: str, name: str, background_tasks: BackgroundT
                 )
                 raise HTTPException(
                     status_code=500,
-                    detail=f"Failed to restart ADB server and retry full scan: {str(adb_error)}"
+                    detail=f"Failed to reconnect device and retry full scan: {str(adb_error)}"
                 )
         else:
             add_scan_history(
@@ -528,23 +560,20 @@ def get_last_scan_percentage(serial_number: str, current_timestamp: str) -> str:
             logger.info(f"No previous scans found for serial number {serial_number}")
             return "0.0%"
         
-        # Dapatkan semua folder timestamp
-        timestamps = [d for d in os.listdir(base_scan_dir) if os.path.isdir(os.path.join(base_scan_dir, d))]
-        timestamps.sort(reverse=True)  # Sort descending
-        
-        # Cari timestamp sebelumnya (yang bukan timestamp saat ini)
-        previous_timestamp = None
-        for timestamp in timestamps:
-            if timestamp != current_timestamp:
-                previous_timestamp = timestamp
-                break
+        # Scan selesai terbaru selain scan saat ini, diurutkan dari katalog (nama
+        # folder %d%m%Y_%H%M%S tidak bisa diurutkan sebagai string)
+        previous_scan_dir = ScanCatalogRepository.get_latest_scan_directory(
+            base_scan_dir,
+            exclude=base_scan_dir / current_timestamp if current_timestamp else None,
+            status=SCAN_STATUS_COMPLETED,
+        )
         
-        if not previous_timestamp:
+        if previous_scan_dir is None:
             logger.info(f"No previous scan found before {current_timestamp}")
             return "0.0%"
         
         # Baca file detail_result.json dari scan sebelumnya
-        previous_result_path = base_scan_dir / previous_timestamp / "detail_result.json"
+        previous_result_path = previous_scan_dir / "detail_result.json"
         if not previous_result_path.exists():
             logger.warning(f"No detail_result.json found in previous scan directory: {previous_result_path}")
             return "0.0%"
@@ -579,11 +608,21 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
         logger.info(f"Last scan percentage: {last_scan_percentage}")
 
         logger.info(f"Starting full scan in directory: {output_dir}")
-        run_device_scan(output_dir)  
-        retrieved_files = retrieve_device_files(serial_number, output_dir)
+        run_device_scan(output_dir, serial_number)  
+        # File yang selesai ditarik langsung di-hash dan disubmit selama pull berjalan
+        submitter = DeepScanSubmitter(serial_number)
+        try:
+            with adb_pool.server_access(serial_number):
+                retrieved_files = retrieve_device_files(
+                    serial_number, output_dir, on_file_ready=submitter.add,
+                    resolve_known_files=submitter.resolve_known_files if REMOTE_HASHING else None
+                )
+        except Exception:
+            submitter.cancel()
+            raise
         logger.info(f"Retrieved {len(retrieved_files)} files")
         
-        scan_result = perform_deep_scan(serial_number, retrieved_files)
+        scan_result = submitter.close()
         logger.info("Deep scan completed")
         
         save_scan_result(output_dir, scan_result)
@@ -594,10 +633,12 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
         logger.info("Scan result processed")
         
         try:
-            asyncio.run(get_result(serial_number, "full-scan"))
-            logger.info("get_result executed successfully")
+            asyncio.run(
+                generate_scan_result(serial_number, "full-scan", Path(output_dir))
+            )
+            logger.info("generate_scan_result executed successfully")
         except Exception as get_result_error:
-            logger.error(f"Error executing get_result: {get_result_error}")
+            logger.error(f"Error executing generate_scan_result: {get_result_error}")
         
         
         # Hitung security percentage
@@ -609,7 +650,7 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
             new_security_percentage = RiskRepository.calculate_security_percentage(task_results)
             logger.info(f"Calculated security percentage: {new_security_percentage}")
         
-        # === AMBIL NILAI scan_overview DARI FILE full-scan_result.json DI FOLDER DENGAN TIMESTAMP TERBARU ===
+        # === AMBIL NILAI scan_overview DARI FILE full-scan_result.json SCAN INI ===
         default_scan_overview = {
             "applications": {"scanned": 0, "threats": 0},
             "documents": {"scanned": 0, "threats": 0},
@@ -619,30 +660,13 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
         default_total_threats = 0
         default_threats = []
 
-        base_scan_dir = BASE_SCAN_PATH / "full-scan" / serial_number
-        if base_scan_dir.exists():
-            timestamp_folders = [
-                d for d in os.listdir(base_scan_dir)
-                if os.path.isdir(os.path.join(base_scan_dir, d))
-            ]
-            timestamp_folders.sort(reverse=True)
-            if timestamp_folders:
-                latest_folder = Path(base_scan_dir) / timestamp_folders[0]
-                result_file_path = latest_folder / "full-scan_result.json"
-                if result_file_path.exists():
-                    with open(result_file_path, "r") as rf:
-                        result_data = json.load(rf)
-                    scan_overview = result_data.get("scan_overview", default_scan_overview)
-                    total_threats = result_data.get("total_threats", default_total_threats)
-                    threats = result_data.get("threats", default_threats)
-                else:
-                    scan_overview = default_scan_overview
-                    total_threats = default_total_threats
-                    threats = default_threats
-            else:
-                scan_overview = default_scan_overview
-                total_threats = default_total_threats
-                threats = default_threats
+        result_file_path = Path(output_dir) / "full-scan_result.json"
+        if result_file_path.exists():
+            with open(result_file_path, "r") as rf:
+                result_data = json.load(rf)
+            scan_overview = result_data.get("scan_overview", default_scan_overview)
+            total_threats = result_data.get("total_threats", default_total_threats)
+            threats = result_data.get("threats", default_threats)
         else:
             scan_overview = default_scan_overview
             total_threats = default_total_threats
@@ -697,6 +721,8 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
                 logger.info("History scan updated")
             else:
                 logger.warning(f"Tidak menemukan entry dengan id {scan_id} untuk di update")
+
+        ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_COMPLETED)
                 
     except Exception as e:
         logger.error(f"Error in run_full_scan: {str(e)}")
@@ -712,8 +738,10 @@ def run_full_scan(output_dir: str, serial_number: str, scan_id: str):
                 json.dump(error_data, f, indent=4)
         except Exception as write_error:
             logger.error(f"Failed to write error status: {write_error}")
+        ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_FAILED)
         raise
-def retrieve_device_files(serial_number: str, output_dir: str) -> list[str]:
+def retrieve_device_files(serial_number: str, output_dir: str, on_file_ready: Optional[Callable[[str], None]] = None,
+                          resolve_known_files: Optional[Callable[[Dict[str, str]], Set[str]]] = None) -> list[str]:
     try:
         
         os.makedirs(output_dir, exist_ok=True)
@@ -737,21 +765,9 @@ def retrieve_device_files(serial_number: str, output_dir: str) -> list[str]:
         try:
             
             
-            base_apk_paths = Data_Pulling.get_base_apk(serial_number)
-            
-        
-            isolated_path = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial_number}/installed_apps")
-            os.makedirs(isolated_path, exist_ok=True)
-            
-            for package, apk_path in base_apk_paths.items():
-                package_folder = os.path.join(isolated_path, package)
-                os.makedirs(package_folder, exist_ok=True)
-
-                new_apk_name = f"{package}.apk"
-                new_apk_path = os.path.join(package_folder, new_apk_name)
-
-                shutil.move(apk_path, new_apk_path)
-                logger.info(f"berhasil menyimpan apk {package} di folder {new_apk_path}")
+            # APK langsung ditarik ke installed_apps/{package}/{package}.apk
+            base_apk_paths = Data_Pulling.get_base_apk(serial_number, on_file_ready, resolve_known_files)
+            logger.info(f"{len(base_apk_paths)} apk berhasil ditarik dari device {serial_number}")
 
         except Exception as e:
             logger.error(f"ada Error ketika pulling apk : {e}") 
@@ -761,7 +777,7 @@ def retrieve_device_files(serial_number: str, output_dir: str) -> list[str]:
         for user_id in user_ids:
             try:
                 
-                result = Data_Pulling.pull_files_from_android(serial_number, user_id)        
+                result = Data_Pulling.pull_files_from_android(serial_number, user_id, on_file_ready, resolve_known_files)        
                 logger.info(f"File berhasil di-pull untuk user {user_id}: {result}")
 
                 
@@ -782,74 +798,465 @@ def retrieve_device_files(serial_number: str, output_dir: str) -> list[str]:
         logger.error(f"Terjadi Error di fungsi retrieve_device_files: {e}")
         raise Exception(f"Failed to retrieve files from device: {e}")
 
-def perform_deep_scan(serial_number: str, retrieved_files: List[str]):
+# Batas file per request /scan-files
+VT_MAX_BATCH_SIZE = int(os.getenv("VT_MAX_BATCH_SIZE", 412))
+# Interval pengecekan ulang kapasitas vtrotasi (detik)
+VT_CAPACITY_REFRESH_SECONDS = float(os.getenv("VT_CAPACITY_REFRESH_SECONDS", 30))
+# Kapasitas jika vtrotasi tidak menyediakan /capacity (setara 412 file per 65 detik)
+VT_FALLBACK_REQUESTS_PER_MINUTE = 412 * 60 / 65
+
+
+def get_vt_capacity() -> float:
     try:
-        isolated_folder = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial_number}")
+        response = requests.get(f"{os.getenv('DOCKER_URL')}capacity", timeout=10)
+        response.raise_for_status()
+        capacity = response.json()
+        logger.info(
+            f"Kapasitas vtrotasi: {capacity['active_keys']} API key aktif, "
+            f"{capacity['requests_per_minute']} request/menit"
+        )
+        return float(capacity["requests_per_minute"])
+    except Exception as e:
+        logger.warning(f"Gagal mengambil kapasitas vtrotasi, memakai kapasitas default: {e}")
+        return VT_FALLBACK_REQUESTS_PER_MINUTE
+
+
+# Mode hash di device: SHA-256 file dihitung di device lalu dicek ke cache verdict
+# vtrotasi, file yang sudah punya verdict tidak ditarik
+REMOTE_HASHING = os.getenv("REMOTE_HASHING", "false").lower() == "true"
 
-        def get_all_files(directory, serial_number):
-            file_paths = []
-            for root, _, files in os.walk(directory):
-                for file in files:
-                    
-                    relative_path = os.path.relpath(os.path.join(root, file), directory)
-                    
-                    formatted_path = f"/app/uploaded_files/{serial_number}/{relative_path}"
-                    file_paths.append(formatted_path)
-            return file_paths
-
-        check_isolated = get_all_files(isolated_folder, serial_number)
-        batch_size = 412
-        batches = [check_isolated[i:i + batch_size] for i in range(0, len(check_isolated), batch_size)]
-        all_scan_results = {
-            "task_ids": []
-        }
 
-        for i, batch in enumerate(batches, 1):
-            scan_url = f"{os.getenv('DOCKER_URL')}scan-files"
-            payload = {"file_paths": batch}
-            headers = {
-                "accept": "application/json",
-                "Content-Type": "application/json"
+def get_cached_verdicts(hashes: List[str]) -> Dict[str, dict]:
+    try:
+        response = requests.post(
+            f"{os.getenv('DOCKER_URL')}cached-verdicts", json={"sha256": hashes}, timeout=30
+        )
+        response.raise_for_status()
+        return response.json()["verdicts"]
+    except Exception as e:
+        logger.warning(f"Gagal mengambil cache verdict dari vtrotasi: {e}")
+        return {}
+
+
+# Jeda maksimum sebelum file yang sudah di-hash disubmit walaupun batch belum penuh (detik)
+DEEP_SCAN_SUBMIT_INTERVAL = float(os.getenv("DEEP_SCAN_SUBMIT_INTERVAL", 5))
+
+
+class DeepScanSubmitter:
+    """
+    Hashing dan submit file ke vtrotasi di thread terpisah. File ditambahkan lewat
+    add() selagi pull dari device masih berjalan, sehingga pull, hashing dan submit
+    berjalan bersamaan. File dengan hash yang sama (mis. media WhatsApp yang tersalin
+    ke beberapa kategori) cukup disubmit sekali, hasilnya nanti disalin ke semua path
+    yang sama lewat duplicate_files.
+    """
+
+    def __init__(self, serial_number: str):
+        self.serial_number = serial_number
+        self.isolated_folder = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial_number}")
+        self._queue = queue.Queue()
+        self._seen = set()
+        self._cancelled = False
+        self._error = None
+        # {sha256 (atau path jika file tidak terbaca): [path container]}
+        self._groups = {}
+        self._file_hashes = {}
+        self._pending = []
+        self._task_ids = []
+        self._task_groups = []
+        self._file_count = 0
+        # File yang tidak ditarik karena hash-nya sudah dikenal (mode hash di device)
+        self._known_files = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, local_path: str) -> None:
+        if local_path in self._seen:
+            return
+        self._seen.add(local_path)
+        self._queue.put(local_path)
+
+    def add_folder(self) -> None:
+        # File di folder isolasi yang belum ditambahkan (mis. sisa scan sebelumnya)
+        for root, _, files in os.walk(self.isolated_folder):
+            for file in files:
+                self.add(os.path.join(root, file))
+
+    def _container_path(self, local_path: str) -> str:
+        relative_path = os.path.relpath(local_path, self.isolated_folder)
+        return f"/app/uploaded_files/{self.serial_number}/{relative_path}"
+
+    def resolve_known_files(self, hashes: Dict[str, str]) -> Set[str]:
+        """
+        Cek hash yang dihitung di device ke cache verdict vtrotasi.
+        Menerima {path lokal tujuan: sha256} dan mengembalikan path yang tidak perlu
+        ditarik. Hanya file yang sudah punya verdict yang dilewati, verdict-nya
+        ditulis ke task_result lewat known_files supaya tetap masuk threats dan
+        perhitungan risiko. Path tersebut juga tidak disubmit lagi oleh add_folder.
+        """
+        if not hashes:
+            return set()
+
+        verdicts = get_cached_verdicts(list(set(hashes.values())))
+
+        known = set()
+        for local_path, digest in hashes.items():
+            response = verdicts.get(digest)
+            if response is None:
+                continue
+            known.add(local_path)
+            self._seen.add(local_path)
+            self._known_files[self._container_path(local_path)] = {
+                "sha256": digest,
+                "response": response,
             }
 
-            vtrotasi_response = requests.post(scan_url, headers=headers, json=payload, timeout=30)
+        logger.info(f"{len(known)} dari {len(hashes)} file sudah dikenal dari hash di device")
+        return known
 
-            if vtrotasi_response.status_code == 200:
-                response_data = vtrotasi_response.json()
-                logger.info(f"Request scan batch ke-{i} berhasil: {response_data}")
-                
-                
-                if "task_ids" in response_data:
-                    all_scan_results["task_ids"].extend(response_data["task_ids"])
+    def cancel(self) -> None:
+        self._cancelled = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def close(self) -> dict:
+        """Tunggu semua file selesai disubmit lalu kembalikan task_ids dan duplicate_files."""
+        self.add_folder()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error:
+            raise Exception(f"Gagal melakukan deep scan: {self._error}")
+
+        duplicate_files = {
+            task_id: group[1:] for task_id, group in self._task_groups if len(group) > 1
+        }
+        logger.info(
+            f"{self._file_count} file ditemukan, {len(self._task_ids)} file unik disubmit. "
+            f"Total task_ids: {len(self._task_ids)}"
+        )
+        return {
+            "task_ids": self._task_ids,
+            "duplicate_files": duplicate_files,
+            "known_files": self._known_files
+        }
+
+    def _hash_file(self, local_path: str) -> None:
+        container_path = self._container_path(local_path)
+        self._file_count += 1
+        try:
+            key = sha256_file(local_path)
+        except OSError:
+            # File yang tidak bisa dibaca tetap disubmit sendiri
+            key = local_path
+
+        group = self._groups.get(key)
+        if group is not None:
+            group.append(container_path)
+            return
+        self._groups[key] = [container_path]
+        # Hash dikirim ke vtrotasi supaya file tidak di-hash ulang di sana
+        if key != local_path:
+            self._file_hashes[container_path] = key
+        self._pending.append((container_path, self._groups[key]))
+
+    def _submit(self, batch: list, batch_number: int) -> None:
+        file_paths = [container_path for container_path, _ in batch]
+        scan_url = f"{os.getenv('DOCKER_URL')}scan-files"
+        payload = {
+            "file_paths": file_paths,
+            "sha256": {file_path: self._file_hashes[file_path] for file_path in file_paths if file_path in self._file_hashes},
+        }
+        headers = {
+            "accept": "application/json",
+            "Content-Type": "application/json"
+        }
+
+        vtrotasi_response = requests.post(scan_url, headers=headers, json=payload, timeout=30)
+
+        if vtrotasi_response.status_code == 200:
+            response_data = vtrotasi_response.json()
+            logger.info(f"Request scan batch ke-{batch_number} ({len(batch)} file) berhasil: {response_data}")
+
+            task_ids = response_data.get("task_ids", [])
+            self._task_ids.extend(task_ids)
+            for task_id, (_, group) in zip(task_ids, batch):
+                self._task_groups.append((task_id, group))
+        else:
+            logger.error(f"Error saat request scan batch ke-{batch_number}: {vtrotasi_response.status_code} - {vtrotasi_response.text}")
+            raise Exception(f"Request scan batch ke-{batch_number} gagal: {vtrotasi_response.status_code} - {vtrotasi_response.text}")
+
+    def _run(self) -> None:
+        try:
+            # Kecepatan submit mengikuti kapasitas vtrotasi (API key aktif x rate
+            # per key), jadi otomatis lebih cepat saat key ditambah lewat /add_keys.
+            bucket = TokenBucket(get_vt_capacity())
+            capacity_checked_at = time.monotonic()
+            batch_number = 0
+            pending_since = 0.0
+            closed = False
+
+            while not self._cancelled and (not closed or self._pending):
+                # Hash file yang masuk sampai batch penuh atau file tertua sudah
+                # menunggu DEEP_SCAN_SUBMIT_INTERVAL
+                while not closed and len(self._pending) < VT_MAX_BATCH_SIZE:
+                    timeout = None
+                    if self._pending:
+                        timeout = pending_since + DEEP_SCAN_SUBMIT_INTERVAL - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    try:
+                        local_path = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if local_path is None:
+                        closed = True
+                        break
+                    if not self._pending:
+                        pending_since = time.monotonic()
+                    self._hash_file(local_path)
+
+                if self._cancelled or not self._pending:
+                    continue
+
+                if time.monotonic() - capacity_checked_at >= VT_CAPACITY_REFRESH_SECONDS:
+                    bucket.set_rate(get_vt_capacity())
+                    capacity_checked_at = time.monotonic()
+
+                batch_size = bucket.take(
+                    min(VT_MAX_BATCH_SIZE, len(self._pending)),
+                    timeout=VT_CAPACITY_REFRESH_SECONDS,
+                )
+                if batch_size == 0:
+                    if bucket.rate_per_minute > 0:
+                        continue
+                    # Tidak ada API key aktif, file tetap disubmit agar hasil
+                    # dari cache verdict tetap didapat.
+                    logger.warning("Tidak ada API key aktif di vtrotasi, file disubmit tanpa menunggu kapasitas")
+                    batch_size = min(VT_MAX_BATCH_SIZE, len(self._pending))
+
+                batch = self._pending[:batch_size]
+                del self._pending[:batch_size]
+                batch_number += 1
+                self._submit(batch, batch_number)
+        except Exception as e:
+            logger.error(f"Error dalam perform_deep_scan: {e}")
+            self._error = e
+
+
+def perform_deep_scan(serial_number: str, retrieved_files: List[str]):
+    # Submit semua file di folder isolasi (tanpa overlap dengan pull)
+    return DeepScanSubmitter(serial_number).close()
+
+
+# Jumlah request /task-result(s) yang berjalan bersamaan
+RESULT_COLLECTOR_CONCURRENCY = int(os.getenv("RESULT_COLLECTOR_CONCURRENCY", 10))
+# Jeda awal dan maksimum antar polling task yang belum selesai (detik)
+RESULT_COLLECTOR_INITIAL_DELAY = float(os.getenv("RESULT_COLLECTOR_INITIAL_DELAY", 2))
+RESULT_COLLECTOR_MAX_DELAY = float(os.getenv("RESULT_COLLECTOR_MAX_DELAY", 30))
+# Batas waktu total menunggu semua task selesai (detik)
+RESULT_COLLECTOR_TIMEOUT = float(os.getenv("RESULT_COLLECTOR_TIMEOUT", 3600))
+# Jumlah task per request /task-results
+RESULT_COLLECTOR_BULK_SIZE = int(os.getenv("RESULT_COLLECTOR_BULK_SIZE", 500))
+
+
+def write_task_result(result_dir: str, task_id: str, response_data: dict, duplicate_files: dict):
+    result_value = response_data.get("response")
+
+    file_path = response_data.get("file_path", "")
+    if not file_path:
+        logger.warning(f"file_path tidak ditemukan untuk task {task_id}")
+        file_path = f"unknown_file_{task_id}"
+
+    if isinstance(result_value, str):
+        try:
+            result_value = json.loads(result_value)
+        except json.JSONDecodeError:
+            logger.warning(f"Nilai result untuk task {task_id} bukan JSON yang valid.")
+
+    # Hasil yang sama dipakai untuk semua file dengan hash yang sama
+    for same_file_path in [file_path] + duplicate_files.get(task_id, []):
+        file_name_with_extension = os.path.basename(same_file_path)  
+        if not file_name_with_extension:
+            logger.warning(f"file_path tidak mengandung nama file untuk task {task_id}")
+            file_name_with_extension = f"unknown_file_{task_id}"
+        file_name_without_extension = re.sub(r"\.\w+$", "", file_name_with_extension)  
+
+        new_file_name = f"{file_name_without_extension}.json"
+        result_file = os.path.join(result_dir, new_file_name)
+
+        with open(result_file, "w") as file:
+            json.dump(result_value, file, indent=4)
+        logger.info(f"Hasil task {task_id} disimpan di: {result_file}")
+
+
+def write_task_error(result_dir: str, task_id: str, error: str):
+    result_file = os.path.join(result_dir, f"error_task_{task_id}.json")
+    with open(result_file, "w") as file:
+        json.dump({"error": error}, file, indent=4)
+
+
+def handle_task_response(result_dir: str, task_id: str, response_data: dict, duplicate_files: dict) -> Optional[str]:
+    """
+    Tulis hasil task yang sudah selesai. Mengembalikan status akhir, atau None
+    jika task masih berjalan.
+    """
+    # Task yang selesai mengembalikan dict hasil scan_file_task
+    # (selalu berisi file_path), selain itu berisi status Celery.
+    if "file_path" in response_data:
+        write_task_result(result_dir, task_id, response_data, duplicate_files)
+        return "SUCCESS"
+
+    if response_data.get("status") == "FAILURE":
+        logger.error(f"Task {task_id} gagal: {response_data.get('result')}")
+        write_task_error(result_dir, task_id, str(response_data.get("result")))
+        return "FAILURE"
+
+    return None
+
+
+async def collect_task_result(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    task_id: str,
+    result_dir: str,
+    duplicate_files: dict,
+    deadline: float,
+) -> str:
+    """
+    Polling /task-result sampai task selesai (SUCCESS/FAILURE) dengan backoff,
+    lalu langsung menulis hasilnya ke task_result/. Mengembalikan status akhir.
+    Dipakai jika vtrotasi belum menyediakan /task-results.
+    """
+    task_result_url = f"{os.getenv('DOCKER_URL')}task-result/{task_id}"
+    delay = RESULT_COLLECTOR_INITIAL_DELAY
+    last_status = "PENDING"
+
+    while True:
+        try:
+            async with semaphore:
+                task_response = await client.get(task_result_url)
+
+            if task_response.status_code == 200:
+                response_data = task_response.json()
+                status = handle_task_response(result_dir, task_id, response_data, duplicate_files)
+                if status:
+                    return status
+                last_status = response_data.get("status", last_status)
             else:
-                logger.error(f"Error saat request scan batch ke-{i}: {vtrotasi_response.status_code} - {vtrotasi_response.text}")
-                raise Exception(f"Request scan batch ke-{i} gagal: {vtrotasi_response.status_code} - {vtrotasi_response.text}")
+                logger.warning(f"Error saat mengambil hasil task {task_id}: {task_response.status_code} - {task_response.text}")
+        except Exception as task_error:
+            logger.warning(f"Error saat mengambil hasil task {task_id}: {task_error}")
 
-            
-            if i < len(batches):
-                logger.info(f"Menunggu 65 detik sebelum mengirim batch berikutnya...")
-                time.sleep(65)
+        if time.monotonic() + delay > deadline:
+            logger.error(f"Task {task_id} belum selesai sampai batas waktu (status terakhir: {last_status})")
+            write_task_error(result_dir, task_id, f"Task belum selesai sampai batas waktu (status terakhir: {last_status})")
+            return "TIMEOUT"
 
-        logger.info(f"Semua batch berhasil diproses. Total task_ids: {len(all_scan_results['task_ids'])}")
-        return all_scan_results
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RESULT_COLLECTOR_MAX_DELAY)
+
+
+class BulkTaskResultsUnsupported(Exception):
+    pass
+
+
+async def fetch_task_results_bulk(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, task_ids: List[str]) -> Dict[str, dict]:
+    async def fetch_chunk(chunk):
+        async with semaphore:
+            response = await client.post(f"{os.getenv('DOCKER_URL')}task-results", json={"task_ids": chunk})
+        if response.status_code in (404, 405):
+            raise BulkTaskResultsUnsupported()
+        response.raise_for_status()
+        return response.json()["results"]
+
+    results = {}
+    chunks = [task_ids[i:i + RESULT_COLLECTOR_BULK_SIZE] for i in range(0, len(task_ids), RESULT_COLLECTOR_BULK_SIZE)]
+    for chunk_results in await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks]):
+        results.update(chunk_results)
+    return results
 
-    except Exception as e:
-        logger.error(f"Error dalam perform_deep_scan: {e}")
-        raise Exception(f"Gagal melakukan deep scan: {e}")
+
+async def collect_task_results(task_ids: List[str], result_dir: str, duplicate_files: dict) -> Dict[str, int]:
+    semaphore = asyncio.Semaphore(RESULT_COLLECTOR_CONCURRENCY)
+    deadline = time.monotonic() + RESULT_COLLECTOR_TIMEOUT
+    delay = RESULT_COLLECTOR_INITIAL_DELAY
+    pending = list(dict.fromkeys(task_ids))
+    summary = {}
+
+    def add_status(status):
+        summary[status] = summary.get(status, 0) + 1
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        # Semua task yang belum selesai diambil lewat /task-results dalam
+        # beberapa request per putaran, bukan satu request per task.
+        while pending:
+            try:
+                results = await fetch_task_results_bulk(client, semaphore, pending)
+            except BulkTaskResultsUnsupported:
+                logger.info("Endpoint /task-results tidak tersedia, mengambil hasil per task")
+                statuses = await asyncio.gather(*[
+                    collect_task_result(client, semaphore, task_id, result_dir, duplicate_files, deadline)
+                    for task_id in pending
+                ])
+                for status in statuses:
+                    add_status(status)
+                break
+            except Exception as e:
+                logger.warning(f"Error saat mengambil hasil task: {e}")
+                results = {}
+
+            still_pending = []
+            for task_id in pending:
+                status = None
+                if task_id in results:
+                    status = handle_task_response(result_dir, task_id, results[task_id], duplicate_files)
+                if status:
+                    add_status(status)
+                else:
+                    still_pending.append(task_id)
+
+            # Backoff hanya bertambah jika tidak ada task yang selesai
+            delay = RESULT_COLLECTOR_INITIAL_DELAY if len(still_pending) < len(pending) else min(delay * 2, RESULT_COLLECTOR_MAX_DELAY)
+            pending = still_pending
+            if not pending:
+                break
+
+            if time.monotonic() + delay > deadline:
+                for task_id in pending:
+                    last_status = results.get(task_id, {}).get("status", "PENDING")
+                    logger.error(f"Task {task_id} belum selesai sampai batas waktu (status terakhir: {last_status})")
+                    write_task_error(result_dir, task_id, f"Task belum selesai sampai batas waktu (status terakhir: {last_status})")
+                    add_status("TIMEOUT")
+                break
+
+            logger.info(f"{len(pending)} task belum selesai, cek ulang dalam {delay} detik")
+            await asyncio.sleep(delay)
+
+    return summary
+
+
+def write_known_files(result_dir: str, known_files: dict):
+    """
+    Tulis hasil file yang tidak disubmit karena hash-nya sudah punya verdict di
+    cache vtrotasi (mode hash di device). Verdict ditulis seperti hasil task biasa
+    sehingga ikut dihitung di threats dan security_percentage.
+    """
+    for file_path, known in known_files.items():
+        if known.get("response") is not None:
+            write_task_result(result_dir, "verdict-cache", {"file_path": file_path, "response": known["response"]}, {})
 
 
 def process_scan_result(scan_result_file: str):
     try:
         logger.info(f"Memproses file hasil scan: {scan_result_file}")         
-        time.sleep(10)
 
-        
         with open(scan_result_file, "r") as file:
             scan_result = json.load(file)
             logger.info(f"Isi scan_result: {scan_result}")  
         
         
         task_ids = scan_result.get("task_ids", [])
+        duplicate_files = scan_result.get("duplicate_files", {})
         logger.info(f"Menemukan {len(task_ids)} task_ids: {task_ids}")
         
 
@@ -858,59 +1265,13 @@ def process_scan_result(scan_result_file: str):
         os.makedirs(result_dir, exist_ok=True)
         logger.info(f"Menyimpan hasil response /task-result di direktori: {result_dir}")
 
+        write_known_files(result_dir, scan_result.get("known_files", {}))
 
+        # Setiap hasil ditulis begitu task-nya selesai, proses berhenti saat
+        # semua task sudah SUCCESS/FAILURE atau batas waktu tercapai.
+        summary = asyncio.run(collect_task_results(task_ids, result_dir, duplicate_files))
         
-        for task_id in task_ids:
-            try:
-                task_result_url = f"{os.getenv('DOCKER_URL')}task-result/{task_id}"
-                logger.info(f"Mengirim request ke {task_result_url}...")
-                
-                
-                task_response = requests.get(task_result_url, timeout=30)
-                
-                if task_response.status_code == 200:
-                    response_data = task_response.json()
-                    result_value = response_data.get("response")
-
-                    
-                    file_path = response_data.get("file_path", "")
-                    if not file_path:
-                        logger.warning(f"file_path tidak ditemukan untuk task {task_id}")
-                        file_path = f"unknown_file_{task_id}"
-
-                    
-                    file_name_with_extension = os.path.basename(file_path)  
-                    if not file_name_with_extension:
-                        logger.warning(f"file_path tidak mengandung nama file untuk task {task_id}")
-                        file_name_with_extension = f"unknown_file_{task_id}"
-                    file_name_without_extension = re.sub(r"\.\w+$", "", file_name_with_extension)  
-
-                    
-                    new_file_name = f"{file_name_without_extension}.json"
-                    result_file = os.path.join(result_dir, new_file_name)
-
-                    
-                    with open(result_file, "w") as file:
-                        if isinstance(result_value, str):
-                            try:
-                                result_value = json.loads(result_value)
-                            except json.JSONDecodeError:
-                                logger.warning(f"Nilai result untuk task {task_id} bukan JSON yang valid.")
-                                
-
-                        json.dump(result_value, file, indent=4)
-                    logger.info(f"Hasil task {task_id} disimpan di: {result_file}")
-                
-                else:
-                    logger.error(f"Error saat mengambil hasil task {task_id}: {task_response.status_code} - {task_response.text}")
-            
-            except Exception as task_error:
-                logger.error(f"Error saat mengirim task {task_id}: {task_error}")
-                result_file = os.path.join(result_dir, f"error_task_{task_id}.json")
-                with open(result_file, "w") as file:
-                    json.dump({"error": str(task_error)}, file, indent=4)
-        
-        logger.info("Proses selesai.")
+        logger.info(f"Proses selesai: {summary}")
     except FileNotFoundError:
         logger.error(f"File {scan_result_file} tidak ditemukan.")
     except json.JSONDecodeError:
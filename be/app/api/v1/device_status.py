@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from app.services.device_status_service import DeviceStatusService
 
 router = APIRouter()
@@ -6,7 +7,9 @@ router = APIRouter()
 
 @router.get("/check-device-status/")
 async def check_device_status():
-    status_data = DeviceStatusService.check_and_save_device_status()
+    status_data = await run_in_threadpool(
+        DeviceStatusService.check_and_save_device_status
+    )
 
     return {
         "status": 200,
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.is_rooted_device_service import check_if_device_is_rooted
 
 # Inisialisasi router
@@ -8,7 +9,7 @@ router = APIRouter()
 async def is_rooted(serial_number: str):
     try:
         # Panggil layanan untuk memeriksa status root
-        is_rooted = check_if_device_is_rooted(serial_number)
+        is_rooted = await run_in_threadpool(check_if_device_is_rooted, serial_number)
         return {
             "status": 200,
             "message": "Root status checked successfully",
@@ -1,15 +1,17 @@
 import os
 import json
 import logging
-import subprocess
+import shlex
 import glob
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List
 from dotenv import load_dotenv
 from app.repositories.malware_removal import delete_malware
 from app.services.device_overview_service import DeviceOverviewService
+from app.utils.adb_pool import adb_pool, AdbError
 
 router = APIRouter()
 load_dotenv()
@@ -25,24 +27,20 @@ class PackageNamesRequest(BaseModel):
 
 def get_device_serials():
     try:
-        result = subprocess.run(["adb", "devices"], capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split("\n")[1:]  
-        return [line.split()[0] for line in lines if line.endswith("\tdevice")]
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Failed to get device serials: {e.stderr}")
+        return adb_pool.get_device_serials()
+    except (AdbError, OSError) as e:
+        raise Exception(f"Failed to get device serials: {e}")
 
 def uninstall_package(serial_number: str, package_name: str):
     try:
-        result = subprocess.run(
-            ["adb", "-s", serial_number, "uninstall", package_name],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logger.info(f"Uninstall output: {result.stdout}")
+        output = adb_pool.shell(serial_number, f"pm uninstall {shlex.quote(package_name)}")
+        logger.info(f"Uninstall output: {output}")
+        if "Success" not in output:
+            logger.error(f"Failed to uninstall package: {output.strip()}")
+            return False
         return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to uninstall package: {e.stderr}")
+    except (AdbError, OSError) as e:
+        logger.error(f"Failed to uninstall package: {e}")
         return False
 
 def find_dumpsys_file(serial_number):
@@ -118,14 +116,14 @@ def update_fast_scan_result(serial_number, package_name):
 
 @router.delete("/delete-malware")
 async def delete_malware_endpoint():
-    result = delete_malware()
+    result = await run_in_threadpool(delete_malware)
     return result
 
 @router.delete("/delete-packages", summary="Delete multiple packages by their names")
 async def delete_packages(request: PackageNamesRequest):
     try:
         logger.info("Fetching device ID...")
-        device_serials = get_device_serials()
+        device_serials = await run_in_threadpool(get_device_serials)
         if not device_serials:
             logger.error("No connected device found.")
             raise HTTPException(status_code=404, detail="No connected device found via ADB.")
@@ -154,7 +152,9 @@ async def delete_packages(request: PackageNamesRequest):
                     logger.info(f"Package '{package_name}' found and deleted from JSON.")
                     
                     
-                    if uninstall_package(serial_number, package_name):
+                    if await run_in_threadpool(
+                        uninstall_package, serial_number, package_name
+                    ):
                         logger.info(f"Package '{package_name}' successfully uninstalled.")
                         deleted_packages.append(package_name)
                     else:
@@ -193,7 +193,7 @@ async def delete_packages(request: PackageNamesRequest):
 async def delete_package(package_name: str):
     try:
         logger.info("Fetching device ID...")
-        device_serials = get_device_serials()
+        device_serials = await run_in_threadpool(get_device_serials)
         if not device_serials:
             logger.error("No connected device found.")
             raise HTTPException(status_code=404, detail="No connected device found via ADB.")
@@ -228,7 +228,9 @@ async def delete_package(package_name: str):
 
         
         logger.info(f"Uninstalling package: {package_name}")
-        uninstall_success = uninstall_package(serial_number, package_name)
+        uninstall_success = await run_in_threadpool(
+            uninstall_package, serial_number, package_name
+        )
         if uninstall_success:
             logger.info(f"Package '{package_name}' successfully uninstalled.")
             
@@ -260,7 +262,7 @@ async def delete_package(package_name: str):
 async def delete_package_fastscan(package_name: str):
     try:
         logger.info("Fast scan: Fetching device ID...")
-        device_serials = get_device_serials()
+        device_serials = await run_in_threadpool(get_device_serials)
         if not device_serials:
             logger.error("Fast scan: No connected device found.")
             raise HTTPException(status_code=404, detail="No connected device found via ADB.")
@@ -291,7 +293,9 @@ async def delete_package_fastscan(package_name: str):
             }
         
         # Uninstall the package
-        uninstall_success = uninstall_package(serial_number, package_name)
+        uninstall_success = await run_in_threadpool(
+            uninstall_package, serial_number, package_name
+        )
         if uninstall_success:
             logger.info(f"Fast scan: Package '{package_name}' successfully uninstalled.")
             
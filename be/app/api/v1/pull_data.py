@@ -1,12 +1,13 @@
 from fastapi import APIRouter
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.data_pulling_service import dataPullingService
 router = APIRouter()
 
 @router.get("/pull-data/", response_model=dict)
 async def pull_data():
     try:
-        result = dataPullingService.process_all_devices()
+        result = await run_in_threadpool(dataPullingService.process_all_devices)
         return {
             "status": 200,
             "message": "Get categories successfully",
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.removal_progress_service import calculate_removal_progress
 from typing import List
 
@@ -17,7 +18,9 @@ async def removal_progress_threshold(
             raise ValueError("Threshold harus berada dalam rentang 0-100.")
         
         # Panggil service untuk menghitung progress
-        result = calculate_removal_progress(serial_number, package_names, threshold)
+        result = await run_in_threadpool(
+            calculate_removal_progress, serial_number, package_names, threshold
+        )
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail={"status": "error", "message": str(e)})
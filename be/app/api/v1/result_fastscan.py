@@ -7,6 +7,10 @@ import os
 from pathlib import Path
 import subprocess
 import re
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    ScanCatalogRepository,
+)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -16,16 +20,14 @@ router = APIRouter()
 
 def get_latest_scan_directory(base_path: str) -> str:
     try:
-        directories = [
-            d for d in os.listdir(base_path)
-            if os.path.isdir(os.path.join(base_path, d))
-        ]
-        if not directories:
-            raise FileNotFoundError(f"Tidak ada direktori scan ditemukan di {base_path}")
-        latest_directory = max(
-            directories, key=lambda x: os.path.getmtime(os.path.join(base_path, x))
+        latest_directory = ScanCatalogRepository.get_latest_scan_directory(
+            base_path, status=SCAN_STATUS_COMPLETED
         )
-        return os.path.join(base_path, latest_directory)
+        if latest_directory is None:
+            raise FileNotFoundError(
+                f"Tidak ada direktori scan selesai ditemukan di {base_path}"
+            )
+        return str(latest_directory)
     except Exception as e:
         logger.error(f"Error saat mencari direktori terbaru: {e}")
         raise
@@ -4,12 +4,17 @@ import logging
 import os
 from datetime import datetime
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 from typing import Dict, List
 from dotenv import load_dotenv
 from app.services.results_service import ResultService
 from app.repositories.risk_repository import RiskRepository
 from app.repositories.result_scan_overview_repository import ResultScanOverviewRepository
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    ScanCatalogRepository,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,10 +23,13 @@ load_dotenv()
 
 def get_latest_scan_directory(base_path: Path) -> Path:
     try:
-        directories = [d for d in base_path.iterdir() if d.is_dir()]
-        if not directories:
-            raise FileNotFoundError(f"Tidak ada direktori scan ditemukan di {base_path}")
-        latest_directory = max(directories, key=lambda x: x.stat().st_mtime)
+        latest_directory = ScanCatalogRepository.get_latest_scan_directory(
+            base_path, status=SCAN_STATUS_COMPLETED
+        )
+        if latest_directory is None:
+            raise FileNotFoundError(
+                f"Tidak ada direktori scan selesai ditemukan di {base_path}"
+            )
         logger.info(f"Direktori scan terbaru ditemukan: {latest_directory}")
         return latest_directory
     except Exception as e:
@@ -72,6 +80,82 @@ def count_scanned_and_threats_for_installer(installer_path: Path, dumpsys_data:
                 logger.info(f"Detected threat in installer: {package_name}")
     return {"scanned": scanned, "threats": threats}
 
+async def generate_scan_result(serial_number: str, scan_type: str,
+                               scan_directory: Path) -> Dict:
+    """
+    Susun hasil scan dari task_result di scan_directory lalu simpan ke
+    {scan_type}_result.json di folder yang sama. run_full_scan memanggilnya
+    langsung dengan folder scan yang sedang berjalan.
+    """
+    task_result_path = scan_directory / "task_result"
+    task_results = RiskRepository.read_task_results(task_result_path)
+    result_data = await run_in_threadpool(
+        ResultService.generate_result, serial_number, task_results
+    )
+
+    if not isinstance(result_data, dict):
+        raise ValueError("result_data harus berupa dictionary")
+    if not isinstance(result_data.get("threats", []), list):
+        raise ValueError("result_data['threats'] harus berupa list")
+
+    updated_threats = []
+
+    for threat in result_data.get("threats", []):
+        package_name = threat.get("package_name", "")
+        updated_threat = {
+            "name": name,
+            "package_name": package_name,
+            "date_time": threat.get("date_time", ""),
+            "type": threat.get("type", "")  
+        }
+        logger.info(f"Processed threat: {updated_threat}")
+        updated_threats.append(updated_threat)
+    
+    activities_detected = read_dumpsys_activities_detected(scan_directory)
+    for activity in activities_detected:
+        threat = {
+            "name": activity.get("activity", "unknown"),
+            "package_name": activity.get("package_name", "unknown"),
+            "date_time": datetime.now().isoformat(),
+            "type": "Application"
+        }
+        updated_threats.append(threat)
+    
+    result_data["threats"] = updated_threats
+    print(result_data["threats"])
+    result_data["total_threats"] = len(updated_threats)
+    logger.info(f"Total threats detected: {result_data['total_threats']}")
+    
+    scan_overview = {
+        "scan_overview": {
+            "applications": {"scanned": 0, "threats": 0},
+            "documents": {"scanned": 0, "threats": 0},
+            "media": {"scanned": 0, "threats": 0},
+            "installer": {"scanned": 0, "threats": 0}
+        },
+        "total_threats": 0,
+        "threats": updated_threats
+    }
+    result_data["scan_overview"] = scan_overview["scan_overview"]
+    result_data["total_threats"] = scan_overview["total_threats"]
+    result_data["threats"] = scan_overview["threats"]
+
+    base_path_media = os.getenv('MEDIA_ISOLATED_PATH')
+    installed_apps_path = Path(base_path_media) / f"{serial_number}" / "installed_apps"
+    applications_stats = count_scanned_and_threats(installed_apps_path, activities_detected)
+    result_data["scan_overview"]["applications"]["scanned"] += applications_stats["scanned"]
+    result_data["scan_overview"]["applications"]["threats"] += applications_stats["threats"]
+    installer_path = Path(base_path_media) / f"{serial_number}" / "installer"
+    installer_stats = count_scanned_and_threats_for_installer(installer_path, activities_detected)
+    result_data["scan_overview"]["installer"]["scanned"] += installer_stats["scanned"]
+    result_data["scan_overview"]["installer"]["threats"] += installer_stats["threats"]
+    
+    output_file_main = scan_directory / f"{scan_type}_result.json"
+    with open(output_file_main, "w") as file:
+        json.dump(result_data, file, indent=4)
+    logger.info(f"Hasil scan utama disimpan ke {output_file_main}")
+    return result_data
+
 @router.get("/result-fullscan-detail", response_model=Dict)
 async def get_result(serial_number: str, scan_type: str = "full-scan"):
     try:
@@ -80,72 +164,10 @@ async def get_result(serial_number: str, scan_type: str = "full-scan"):
 
         base_path = Path(os.path.expanduser(f"{str(os.getenv('BASE_SCAN_PATH'))}")) / scan_type / serial_number
         latest_scan_directory = get_latest_scan_directory(base_path)
-        task_result_path = latest_scan_directory / "task_result"
-        task_results = RiskRepository.read_task_results(task_result_path)
-        result_data = ResultService.generate_result(serial_number, task_results)
-
-        if not isinstance(result_data, dict):
-            raise ValueError("result_data harus berupa dictionary")
-        if not isinstance(result_data.get("threats", []), list):
-            raise ValueError("result_data['threats'] harus berupa list")
-
-        updated_threats = []
-
-        for threat in result_data.get("threats", []):
-            package_name = threat.get("package_name", "")
-            updated_threat = {
-                "name": name,
-                "package_name": package_name,
-                "date_time": threat.get("date_time", ""),
-                "type": threat.get("type", "")  
-            }
-            logger.info(f"Processed threat: {updated_threat}")
-            updated_threats.append(updated_threat)
-        
-        activities_detected = read_dumpsys_activities_detected(latest_scan_directory)
-        for activity in activities_detected:
-            threat = {
-                "name": activity.get("activity", "unknown"),
-                "package_name": activity.get("package_name", "unknown"),
-                "date_time": datetime.now().isoformat(),
-                "type": "Application"
-            }
-            updated_threats.append(threat)
-        
-        result_data["threats"] = updated_threats
-        print(result_data["threats"])
-        result_data["total_threats"] = len(updated_threats)
-        logger.info(f"Total threats detected: {result_data['total_threats']}")
-        
-        scan_overview = {
-            "scan_overview": {
-                "applications": {"scanned": 0, "threats": 0},
-                "documents": {"scanned": 0, "threats": 0},
-                "media": {"scanned": 0, "threats": 0},
-                "installer": {"scanned": 0, "threats": 0}
-            },
-            "total_threats": 0,
-            "threats": updated_threats
-        }
-        result_data["scan_overview"] = scan_overview["scan_overview"]
-        result_data["total_threats"] = scan_overview["total_threats"]
-        result_data["threats"] = scan_overview["threats"]
+        result_data = await generate_scan_result(
+            serial_number, scan_type, latest_scan_directory
+        )
 
-        base_path_media = os.getenv('MEDIA_ISOLATED_PATH')
-        installed_apps_path = Path(base_path_media) / f"{serial_number}" / "installed_apps"
-        applications_stats = count_scanned_and_threats(installed_apps_path, activities_detected)
-        result_data["scan_overview"]["applications"]["scanned"] += applications_stats["scanned"]
-        result_data["scan_overview"]["applications"]["threats"] += applications_stats["threats"]
-        installer_path = Path(base_path_media) / f"{serial_number}" / "installer"
-        installer_stats = count_scanned_and_threats_for_installer(installer_path, activities_detected)
-        result_data["scan_overview"]["installer"]["scanned"] += installer_stats["scanned"]
-        result_data["scan_overview"]["installer"]["threats"] += installer_stats["threats"]
-        
-        output_file_main = latest_scan_directory / f"{scan_type}_result.json"
-        with open(output_file_main, "w") as file:
-            json.dump(result_data, file, indent=4)
-        logger.info(f"Hasil scan utama disimpan ke {output_file_main}")
-        
         response = {
             "message": "Get result successfully",
             "status": "success",
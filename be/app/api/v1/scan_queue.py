@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+from app.services.scan_scheduler import scan_scheduler
+
+# Inisialisasi router
+router = APIRouter()
+
+
+@router.get("/scan-queue")
+async def get_scan_queue():
+    try:
+        return {
+            "status": 200,
+            "message": "Scan queue retrieved successfully",
+            "data": {
+                **scan_scheduler.stats(),
+                "jobs": scan_scheduler.get_jobs(),
+            },
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get scan queue: {str(e)}"
+        )
+
+
+@router.get("/scan-queue/{serial_number}")
+async def get_scan_queue_by_device(serial_number: str):
+    try:
+        return {
+            "status": 200,
+            "message": "Scan queue retrieved successfully",
+            "data": {
+                "serial_number": serial_number,
+                "jobs": scan_scheduler.get_jobs(serial_number),
+            },
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get scan queue: {str(e)}"
+        )
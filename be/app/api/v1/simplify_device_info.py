@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from app.repositories.simplify_info import get_device_info
 
 router = APIRouter()
@@ -7,7 +8,7 @@ router = APIRouter()
 @router.get("/simplify-get-info")
 async def simplify_get_info():
     """Endpoint to retrieve phone model and security patch version."""
-    device_info = get_device_info()
+    device_info = await run_in_threadpool(get_device_info)
     return {
         "status": "success" if "error" not in device_info else "failure",
         "message": (
@@ -27,6 +27,8 @@ from app.api.v1.history_full_scan import router as history_fullscan_router
 from app.api.v1.history_fast_scan import router as history_fastscan_router
 from app.api.v1.check_update_app import router as check_update_app
 from app.api.v1.update_cyber import router as update_cyber
+from app.api.v1.adb_pool import router as adb_pool_router
+from app.api.v1.scan_queue import router as scan_queue_router
 
 
 load_dotenv()
@@ -64,6 +66,8 @@ app.include_router(result_fastscan,prefix="/v1",tags=["device"] )
 app.include_router(check_update_app,prefix="/v1",tags=["ota-update"])
 app.include_router(update_cyber,prefix="/v1",tags=["ota-update"])
 app.include_router(calculate_risk_router,prefix="/v1",tags=["device"])
+app.include_router(adb_pool_router,prefix="/v1",tags=["device"])
+app.include_router(scan_queue_router,prefix="/v1",tags=["device"])
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/", include_in_schema=False)
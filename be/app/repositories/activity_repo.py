@@ -1,10 +1,10 @@
 import os
 import json
-import subprocess
 import glob
 from datetime import datetime
 from typing import List, Dict, Union
 from app.utils.config import PROJECT_ROOT
+from app.utils.adb_pool import adb_pool, AdbError
 
 def expand_project_root() -> str:
     try:
@@ -17,28 +17,14 @@ def expand_project_root() -> str:
 
 def get_device_id() -> Union[str, None]:
     try:
-        result = subprocess.run(
-            ["adb", "devices"],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=10
-        )
-        
-        print("[DEBUG] Raw ADB Output:\n" + result.stdout)
-        
-        devices = [
-            line.split("\t")[0]
-            for line in result.stdout.splitlines()[1:]
-            if "\tdevice" in line
-        ]
+        devices = adb_pool.get_device_serials()
         
         print(f"[DEBUG] Found devices: {devices}")
         
         return devices[0] if devices else None
         
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] ADB Command failed: {e.stderr}")
+    except AdbError as e:
+        print(f"[ERROR] ADB Command failed: {e}")
         return None
     except Exception as e:
         print(f"[ERROR] Unexpected error in get_device_id: {str(e)}")
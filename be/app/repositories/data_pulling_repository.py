@@ -1,83 +1,270 @@
-import shutil
 import os
 import subprocess
 import re
+import json
+import logging
+import shlex
 
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from fastapi import HTTPException
+from app.utils.adb_pool import adb_pool, AdbError
+from app.utils.file_link import link_or_copy
+from mvt.android.artifacts.dumpsys_packages import DumpsysPackagesArtifact
+from mvt.android.utils import ApkCache, get_apk_cache_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Jumlah file per perintah `adb pull` saat sync incremental
+SYNC_PULL_BATCH_SIZE = int(os.getenv("SYNC_PULL_BATCH_SIZE", 100))
+# Jumlah APK yang ditarik bersamaan dari satu device
+APK_PULL_CONCURRENCY = int(os.getenv("APK_PULL_CONCURRENCY", 4))
+# Batas satu perintah sha256sum di device (jumlah file dan total byte), supaya
+# satu perintah tidak melewati timeout socket ADB
+REMOTE_HASH_BATCH_SIZE = int(os.getenv("REMOTE_HASH_BATCH_SIZE", 200))
+REMOTE_HASH_BATCH_BYTES = int(os.getenv("REMOTE_HASH_BATCH_BYTES", 1024 * 1024 * 1024))
+# Kategorikan juga file tanpa ekstensi yang dikenal berdasarkan magic bytes
+FILE_MAGIC_SNIFFING = os.getenv("FILE_MAGIC_SNIFFING", "false").lower() == "true"
+
 
 class Data_Pulling:
     @staticmethod
     def check_adb_connected() -> bool:
         try:
-            result = subprocess.run(
-                ["adb", "devices"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-            output = result.stdout.decode("utf-8").strip()
-            lines = output.split("\n")
-            for line in lines[1:]:
-                if "device" in line:
-                    return True
-            return False
+            return len(adb_pool.get_device_serials()) > 0
         except Exception:
             return False
 
     @staticmethod
-    def get_device_serials() -> List[str]:  
+    def get_device_serials() -> List[str]:
         try:
-            result = subprocess.run(["adb", "devices"], capture_output=True, text=True, check=True)
-            lines = result.stdout.strip().split("\n")[1:]  # Skip the first line
-            return [line.split()[0] for line in lines if line.endswith("\tdevice")]
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Failed to get device serials: {e.stderr}")
+            return adb_pool.get_device_serials()
+        except (AdbError, OSError) as e:
+            raise Exception(f"Failed to get device serials: {e}")
 
     @staticmethod
     def user_enum(serial: str) -> List[str]:
         try:
-            result = subprocess.run(["adb", "-s", serial, "shell", "pm", "list", "users"], capture_output=True, text=True, check=True)
-            
-            #nge ekstrak id user dari nama user dan alias nya   
+            exit_code, output = adb_pool.run_shell(serial, "pm list users")
+            if exit_code != 0:
+                raise AdbError(f"pm list users exit code {exit_code}")
+
+            # nge ekstrak id user dari nama user dan alias nya
             pattern = r'UserInfo{(\d+):'
-            user_ids = re.findall(pattern, result.stdout)
+            user_ids = re.findall(pattern, output)
             return user_ids
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"User enumeration failed for device {serial}: {e.stderr}")
-        
+        except (AdbError, OSError) as e:
+            raise Exception(f"User enumeration failed for device {serial}: {e}")
+
+    @staticmethod
+    def get_device_manifest(serial: str, source_path: str) -> Dict[str, List[int]]:
+        """
+        Mengambil daftar file di perangkat dalam satu perintah shell.
+
+        :param serial: Serial number perangkat Android.
+        :param source_path: Folder sumber di perangkat, diakhiri "/".
+        :return: Dictionary {path relatif: [size, mtime]}.
+        """
+        # find toybox lama belum mendukung -printf, jadi stat dipakai sebagai fallback.
+        # Exit code tidak dipakai karena find tetap gagal (1) jika ada folder yang
+        # tidak bisa dibaca (misalnya Android/data).
+        commands = [
+            f"find '{source_path}' -type f -printf '%s %T@ %p\\n'",
+            f"find '{source_path}' -type f -exec stat -c '%s %Y %n' {{}} +",
+        ]
+        for command in commands:
+            _, output = adb_pool.run_shell(serial, command)
+            manifest = {}
+            for line in output.splitlines():
+                parts = line.split(" ", 2)
+                if len(parts) != 3 or not parts[2].startswith(source_path):
+                    continue
+                try:
+                    size, mtime = int(parts[0]), int(float(parts[1]))
+                except ValueError:
+                    continue
+                manifest[parts[2][len(source_path):]] = [size, mtime]
+            if manifest:
+                return manifest
+        return {}
 
+    @staticmethod
+    def load_sync_manifest(manifest_path: str) -> Dict[str, Dict]:
+        try:
+            with open(manifest_path, "r") as f:
+                data = json.load(f)
+            return {"files": data.get("files", {}), "categories": data.get("categories", {})}
+        except (OSError, ValueError):
+            return {"files": {}, "categories": {}}
 
+    @staticmethod
+    def save_sync_manifest(manifest_path: str, data: Dict[str, Dict]) -> None:
+        # Ditulis ke file sementara dulu supaya manifest tidak rusak jika proses terhenti
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, manifest_path)
 
-    #ngepull semua data berdasarkan user, nanti bakal disimpen di ~/project/temp/{serial}/{user}
     @staticmethod
-    def pull_files_from_android(serial: str, user: str) -> str:
+    def iter_pull_batches(serial: str, source_path: str, mirror_path: str, rel_paths: List[str]) -> Iterator[Tuple[List[str], bool]]:
+        """
+        Menarik file per batch. File dikelompokkan per folder supaya satu perintah
+        `adb pull` bisa membawa banyak file sekaligus.
+
+        :return: Iterator (daftar path relatif, berhasil) untuk setiap batch.
+        """
+        by_folder: Dict[str, List[str]] = {}
+        for rel_path in rel_paths:
+            by_folder.setdefault(os.path.dirname(rel_path), []).append(rel_path)
+
+        for folder, folder_paths in by_folder.items():
+            local_folder = os.path.join(mirror_path, folder)
+            os.makedirs(local_folder, exist_ok=True)
+            for i in range(0, len(folder_paths), SYNC_PULL_BATCH_SIZE):
+                batch = folder_paths[i:i + SYNC_PULL_BATCH_SIZE]
+                try:
+                    subprocess.run(
+                        ["adb", "-s", serial, "pull", "-a",
+                         *[source_path + rel_path for rel_path in batch], local_folder],
+                        capture_output=True, text=True, check=True
+                    )
+                    yield batch, True
+                except subprocess.CalledProcessError as e:
+                    logger.error(f"Gagal menarik {len(batch)} file dari {folder or '/'}: {e.stderr}")
+                    yield batch, False
+
+    @staticmethod
+    def get_remote_sha256(serial: str, device_paths: List[str], sizes: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+        """
+        Menghitung SHA-256 file langsung di perangkat (sha256sum toybox), banyak file
+        per perintah adb shell. File yang gagal di-hash (atau sha256sum tidak tersedia)
+        tidak ada di hasil, sehingga tetap ditarik seperti biasa.
+
+        :param serial: Serial number perangkat Android.
+        :param device_paths: Path file di perangkat.
+        :param sizes: Ukuran file (opsional) untuk membatasi byte per perintah.
+        :return: Dictionary {path di perangkat: sha256}.
+        """
+        batches = []
+        batch, batch_bytes = [], 0
+        for device_path in device_paths:
+            size = (sizes or {}).get(device_path, 0)
+            if batch and (len(batch) >= REMOTE_HASH_BATCH_SIZE or batch_bytes + size > REMOTE_HASH_BATCH_BYTES):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(device_path)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+
+        hashes = {}
+        for batch in batches:
+            command = "sha256sum " + " ".join(shlex.quote(device_path) for device_path in batch)
+            try:
+                _, output = adb_pool.run_shell(serial, command)
+            except (AdbError, OSError) as e:
+                logger.warning(f"Gagal menghitung hash {len(batch)} file di device {serial}: {e}")
+                continue
+            requested = set(batch)
+            for line in output.splitlines():
+                digest, _, device_path = line.partition("  ")
+                if len(digest) == 64 and device_path in requested:
+                    hashes[device_path] = digest.lower()
+        return hashes
+
+    @staticmethod
+    def sniff_file_category(file_path: str) -> Optional[str]:
+        """Tentukan kategori dari magic bytes untuk file tanpa ekstensi yang dikenal."""
+        try:
+            with open(file_path, "rb") as f:
+                header = f.read(16)
+        except OSError:
+            return None
+        if header[4:8] == b"ftyp":  # MP4/MOV/3GP
+            return "media"
+        for signature, category in MAGIC_SIGNATURES:
+            if header.startswith(signature):
+                return category
+        return None
+
+    # ngepull semua data berdasarkan user, nanti bakal disimpen di
+    # ~/project/temp/{serial}/{user}
+    @staticmethod
+    def pull_files_from_android(serial: str, user: str, on_file_ready: Optional[Callable[[str], None]] = None,
+                                resolve_known_files: Optional[Callable[[Dict[str, str]], Set[str]]] = None) -> str:
         """
         Mengambil file dari perangkat Android berdasarkan user dan menyimpannya di folder tujuan.
         File-file tersebut akan disortir berdasarkan ekstensi dan dipindahkan ke folder yang sesuai.
 
+        Daftar file (size, mtime) disimpan di manifest per device, sehingga pada scan
+        berikutnya hanya file yang baru/berubah yang ditarik dan file yang sudah dihapus
+        di perangkat ikut dihapus dari mirror lokal.
+
+        Kategori ditentukan dari listing perangkat sebelum pull. File yang masuk kategori
+        ditarik lebih dulu dan langsung diteruskan ke on_file_ready per batch, sehingga
+        hashing dan submit ke VirusTotal bisa berjalan selama sisa file masih ditarik.
+
         :param serial: Serial number perangkat Android.
         :param user: User ID pada perangkat Android.
+        :param on_file_ready: Callback opsional dengan path file di folder kategori.
+        :param resolve_known_files: Callback opsional untuk mode hash di device. Menerima
+            {path file di folder kategori: sha256} dan mengembalikan path yang hasilnya
+            sudah punya verdict (tidak perlu ditarik).
         :return: Pesan sukses atau error.
         """
         try:
             # Path tujuan untuk menyimpan file yang di-pull dari perangkat Android
             dest_path = os.path.expanduser(f"{str(os.getenv('DESTINATION_FOR_DATA_PULLING'))}/{serial}")
             os.makedirs(dest_path, exist_ok=True)  # Buat folder jika belum ada
-            
+
             # Path sumber di perangkat Android (misalnya, /storage/emulated/0/)
             source_path = f"/storage/emulated/{user}/"
-            
-            # Jalankan perintah ADB untuk menarik file dari perangkat Android
-            result = subprocess.run(
-                ["adb", "-s", serial, "pull", "-a", source_path, dest_path, "--sync"],
-                capture_output=True, text=True, check=True
-            )
-            
+            # adb pull menyimpan folder sumber sebagai {dest_path}/{user}
+            mirror_path = os.path.join(dest_path, user)
+            manifest_path = os.path.join(dest_path, f".sync_manifest_{user}.json")
+
+            previous = Data_Pulling.load_sync_manifest(manifest_path)
+            current = Data_Pulling.get_device_manifest(serial, source_path)
+            full_sync = not previous["files"] or not current or not os.path.isdir(mirror_path)
+            pulled_all = not current
+
+            if pulled_all:
+                # Listing gagal: tarik semua seperti sebelumnya lalu pakai isi mirror
+                # (mtime sama karena pull -a)
+                subprocess.run(
+                    ["adb", "-s", serial, "pull", "-a", source_path, dest_path, "--sync"],
+                    capture_output=True, text=True, check=True
+                )
+                for root, _, files in os.walk(mirror_path):
+                    for file in files:
+                        local_path = os.path.join(root, file)
+                        stat = os.stat(local_path)
+                        current[os.path.relpath(local_path, mirror_path)] = [stat.st_size, int(stat.st_mtime)]
+
+            if full_sync:
+                changed = list(current)
+                # File lokal yang tidak ada lagi di perangkat
+                removed = []
+                for root, _, files in os.walk(mirror_path):
+                    for file in files:
+                        rel_path = os.path.relpath(os.path.join(root, file), mirror_path)
+                        if rel_path not in current:
+                            removed.append(rel_path)
+            else:
+                changed = [
+                    rel_path for rel_path, stat in current.items()
+                    if previous["files"].get(rel_path) != stat
+                ]
+                removed = [rel_path for rel_path in previous["files"] if rel_path not in current]
+
             # Path untuk menyimpan file yang diisolasi (APK, dokumen, dll)
             isolated_path = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial}")
             os.makedirs(isolated_path, exist_ok=True)  # Buat folder jika belum ada
-            
+
             # Path untuk folder installed_apps (file APK yang sudah di-pull sebelumnya)
             installed_apps_path = os.path.join(isolated_path, "installed_apps")
-            
+
             # Daftar kategori folder untuk menyimpan file berdasarkan ekstensi
             categories = {
                 'installer': os.path.join(isolated_path, 'installer'),  # Folder untuk aplikasi (APK, EXE, dll)
@@ -85,64 +272,251 @@ class Data_Pulling:
                 'archive': os.path.join(isolated_path, 'archive'),      # Folder untuk arsip (ZIP, RAR, dll)
                 'media': os.path.join(isolated_path, 'media'),      # Folder untuk arsip (MP4, JPG, dll)
             }
-            
+
             # Buat folder untuk setiap kategori jika belum ada
             for folder in categories.values():
                 os.makedirs(folder, exist_ok=True)
-            
-            # Loop melalui semua file yang di-pull dari perangkat Android
-            for root, _, files in os.walk(dest_path):
-                for file in files:
-                    # Gunakan os.path.splitext untuk mendapatkan ekstensi file (misalnya, ".apk")
-                    file_extension = os.path.splitext(file)[1].lower().strip('.')  # Hapus tanda titik dari ekstensi
-                    
-                    # Tentukan kategori file berdasarkan ekstensi
-                    category = None
-                    for cat, extensions in FILE_CATEGORIES.items():
-                        if file_extension in extensions:
-                            category = cat  # Set kategori jika ekstensi cocok
-                            break
-                    
-                    # Jika file termasuk dalam kategori yang ditentukan
+
+            # Index kategori: {path relatif di mirror: path file di folder kategori}.
+            # adb pull menulis file baru (inode baru), jadi link lama untuk file yang
+            # berubah atau dihapus harus dilepas dulu.
+            category_index = previous["categories"]
+            for rel_path in [*removed, *changed]:
+                linked_path = category_index.pop(rel_path, None)
+                if linked_path and os.path.lexists(linked_path):
+                    os.remove(linked_path)
+            for rel_path in removed:
+                local_path = os.path.join(mirror_path, rel_path)
+                if os.path.lexists(local_path):
+                    os.remove(local_path)
+                # Hapus folder yang jadi kosong, berhenti di mirror_path
+                folder = os.path.dirname(local_path)
+                while folder != mirror_path and folder.startswith(mirror_path):
+                    try:
+                        os.rmdir(folder)
+                    except OSError:
+                        break
+                    folder = os.path.dirname(folder)
+
+            claimed = {linked_path: rel_path for rel_path, linked_path in category_index.items()}
+            link_methods: Dict[str, int] = {}
+
+            # File kategori yang tidak berubah sejak sync sebelumnya langsung diteruskan
+            if on_file_ready:
+                for linked_path in category_index.values():
+                    if os.path.isfile(linked_path):
+                        on_file_ready(linked_path)
+
+            def link_file(rel_path: str, category: str) -> None:
+                file = os.path.basename(rel_path)
+                file_path = os.path.join(mirror_path, rel_path)  # Path lengkap file sumber
+                if not os.path.isfile(file_path):
+                    return
+
+                # Periksa apakah file berada di folder installed_apps
+                if file_path.startswith(installed_apps_path):
+                    print(f"File {file} berada di folder installed_apps. Mengabaikan.")
+                    return
+
+                # Tentukan folder tujuan berdasarkan kategori
+                destination_folder = categories.get(category, isolated_path)  # Default ke isolated_path jika kategori tidak ditemukan
+                destination_file_path = os.path.join(destination_folder, file)  # Path lengkap file tujuan
+
+                # Periksa apakah nama file sudah dipakai file lain di folder tujuan
+                if destination_file_path in claimed:
+                    print(f"File {file} sudah ada di {destination_folder}. Mengabaikan duplikat.")
+                    return
+                # Salinan dari versi lama (sebelum ada index) diganti dengan link
+                if os.path.lexists(destination_file_path):
+                    os.remove(destination_file_path)
+
+                # Hardlink/reflink ke folder tujuan, copy hanya jika beda filesystem
+                method = link_or_copy(file_path, destination_file_path)
+                link_methods[method] = link_methods.get(method, 0) + 1
+                category_index[rel_path] = destination_file_path
+                claimed[destination_file_path] = rel_path
+                if on_file_ready:
+                    on_file_ready(destination_file_path)
+
+            # Kategori ditentukan dari ekstensi di listing perangkat, sebelum pull
+            candidates = {}
+            others = []
+            for rel_path in changed:
+                file_extension = os.path.splitext(rel_path)[1].lower().strip('.')  # Hapus tanda titik dari ekstensi
+                category = EXTENSION_CATEGORIES.get(file_extension)
+                if category:
+                    candidates[rel_path] = category
+                else:
+                    others.append(rel_path)
+
+            # Mode hash di device: file yang hash-nya sudah dikenal tidak ditarik.
+            # File ini tidak dicatat di manifest, jadi dicek lagi di sync berikutnya.
+            skipped = set()
+            if resolve_known_files and candidates and not pulled_all:
+                device_hashes = Data_Pulling.get_remote_sha256(
+                    serial,
+                    [source_path + rel_path for rel_path in candidates],
+                    {source_path + rel_path: current[rel_path][0] for rel_path in candidates},
+                )
+                destinations = {}
+                for rel_path, category in candidates.items():
+                    digest = device_hashes.get(source_path + rel_path)
+                    destination_file_path = os.path.join(categories[category], os.path.basename(rel_path))
+                    if digest and destination_file_path not in claimed:
+                        destinations[destination_file_path] = (rel_path, digest)
+                known = resolve_known_files({path: digest for path, (_, digest) in destinations.items()})
+                skipped = {destinations[path][0] for path in known if path in destinations}
+                for rel_path in skipped:
+                    del candidates[rel_path]
+
+            failed = set()
+            if pulled_all:
+                candidate_batches = [(list(candidates), True)]
+            else:
+                candidate_batches = Data_Pulling.iter_pull_batches(serial, source_path, mirror_path, list(candidates))
+            # File kategori ditarik lebih dulu dan langsung dikategorikan per batch
+            for batch, pulled in candidate_batches:
+                if not pulled:
+                    failed.update(batch)
+                    continue
+                for rel_path in batch:
+                    link_file(rel_path, candidates[rel_path])
+
+            # Sisa file ditarik per batch, juga pada sync pertama. `adb pull` folder
+            # penuh akan menarik ulang file kategori (adb pull tidak mengenal --sync)
+            # dan membuat inode baru, sehingga link di folder kategori jadi basi.
+            if not pulled_all:
+                for batch, pulled in Data_Pulling.iter_pull_batches(serial, source_path, mirror_path, others):
+                    if not pulled:
+                        failed.update(batch)
+
+            if FILE_MAGIC_SNIFFING:
+                for rel_path in others:
+                    if rel_path in failed or not current[rel_path][0]:
+                        continue
+                    category = Data_Pulling.sniff_file_category(os.path.join(mirror_path, rel_path))
                     if category:
-                        file_path = os.path.join(root, file)  # Path lengkap file sumber
-                        
-                        # Periksa apakah file berada di folder installed_apps
-                        if installed_apps_path in root:
-                            print(f"File {file} berada di folder installed_apps. Mengabaikan.")
-                            continue  # Lanjutkan ke file berikutnya jika file berada di installed_apps
-                        
-                        # Tentukan folder tujuan berdasarkan kategori
-                        destination_folder = categories.get(category, isolated_path)  # Default ke isolated_path jika kategori tidak ditemukan
-                        destination_file_path = os.path.join(destination_folder, file)  # Path lengkap file tujuan
-                        
-                        # Periksa apakah file sudah ada di folder tujuan
-                        if os.path.exists(destination_file_path):
-                            print(f"File {file} sudah ada di {destination_folder}. Mengabaikan duplikat.")
-                            continue  # Lanjutkan ke file berikutnya jika file sudah ada
-                        
-                        # Pindahkan file ke folder tujuan
-                        shutil.copy(file_path, destination_folder)
-                        print(f"File {file} dipindahkan ke {destination_folder}.")
+                        link_file(rel_path, category)
+
+            logger.info(
+                f"Sync {serial} user {user}: {len(current)} file di perangkat, "
+                f"{len(changed) - len(failed) - len(skipped)} ditarik, {len(skipped)} dilewati (hash dikenal), "
+                f"{len(removed)} dihapus, {len(failed)} gagal"
+            )
+            if link_methods:
+                logger.info(f"File dikategorikan ke {isolated_path}: {link_methods}")
+
+            # File yang gagal ditarik tidak dicatat, supaya dicoba lagi di sync berikutnya
+            files = {
+                rel_path: stat for rel_path, stat in current.items()
+                if rel_path not in failed and rel_path not in skipped
+            }
+            if files:
+                Data_Pulling.save_sync_manifest(manifest_path, {"files": files, "categories": category_index})
 
             return f"Files pulled successfully for user {user} to {dest_path}, and sorted files moved to {isolated_path}"
         except subprocess.CalledProcessError as e:
             raise Exception(f"ADB pull failed for device {serial}, user {user}: {e.stderr}")
-        
+        except (AdbError, OSError) as e:
+            raise Exception(f"Sync failed for device {serial}, user {user}: {e}")
+
     @staticmethod
-    def get_base_apk(serial: str):
+    def list_third_party_apks(serial: str) -> Dict[str, str]:
+        """
+        Mengambil path base.apk semua aplikasi user-installed dalam satu perintah.
+
+        :param serial: Serial number perangkat Android.
+        :return: Dictionary {nama paket: path base.apk di perangkat}.
+        """
+        exit_code, output = adb_pool.run_shell(serial, "pm list packages -f -3 --user 0")
+        if exit_code != 0:
+            raise AdbError(f"pm list packages exit code {exit_code}")
+
+        packages = {}
+        for line in output.splitlines():
+            line = line.strip()
+            if not line.startswith("package:"):
+                continue
+            # Format: package:/data/app/~~xxx==/com.contoh-yyy==/base.apk=com.contoh
+            apk_path, _, package = line[len("package:"):].rpartition("=")
+            if apk_path and package:
+                packages[package] = apk_path
+        return packages
+
+    @staticmethod
+    def get_package_versions(serial: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Mengambil versionCode dan lastUpdateTime semua paket dalam satu perintah.
+        Output dumpsys disaring di perangkat supaya yang dikirim hanya baris yang dipakai.
+
+        :param serial: Serial number perangkat Android.
+        :return: Dictionary {nama paket: (versionCode, lastUpdateTime)}.
+        """
+        try:
+            _, output = adb_pool.run_shell(
+                serial, "dumpsys package packages | grep -E '^  Package \\[|versionCode=|lastUpdateTime='"
+            )
+        except (AdbError, OSError) as e:
+            # Tanpa versi, semua APK tetap ditarik seperti biasa
+            logger.warning(f"Gagal mengambil versi paket dari device {serial}: {e}")
+            return {}
+        versions = {}
+        for package in DumpsysPackagesArtifact().parse_dumpsys_packages(output):
+            key = get_apk_cache_key(package)
+            if key:
+                # Paket yang sama bisa muncul lagi di "Hidden system packages"
+                versions.setdefault(package["package_name"], key)
+        return versions
+
+    @staticmethod
+    def pull_apk(serial: str, package: str, apk_path: str, isolated_path: str,
+                 apk_cache: Optional[ApkCache] = None, cache_key: Optional[Tuple[str, str]] = None) -> str:
+        # Buat folder untuk setiap package, nama file sesuai dengan nama package
+        package_folder = os.path.join(isolated_path, package)
+        os.makedirs(package_folder, exist_ok=True)
+        new_apk_path = os.path.join(package_folder, f"{package}.apk")
+
+        # Aplikasi yang tidak diupdate sejak scan sebelumnya diambil dari cache
+        cached_path = apk_cache.get(package, apk_path, cache_key) if apk_cache and cache_key else None
+        if cached_path:
+            if not (os.path.exists(new_apk_path) and os.path.samefile(cached_path, new_apk_path)):
+                ApkCache.link(cached_path, new_apk_path)
+            return new_apk_path
+
+        # File lama bisa jadi hardlink ke cache, jadi dihapus dulu sebelum ditimpa
+        if os.path.lexists(new_apk_path):
+            os.remove(new_apk_path)
+
+        # Download base.apk langsung ke lokasi akhirnya
+        subprocess.run(
+            ["adb", "-s", serial, "pull", "-a", apk_path, new_apk_path],
+            capture_output=True, text=True, check=True
+        )
+        if apk_cache and cache_key:
+            apk_cache.put(package, apk_path, cache_key, new_apk_path)
+        return new_apk_path
+
+    @staticmethod
+    def get_base_apk(serial: str, on_file_ready: Optional[Callable[[str], None]] = None,
+                     resolve_known_files: Optional[Callable[[Dict[str, str]], Set[str]]] = None):
         """
         Mendapatkan path base.apk untuk setiap paket yang terinstal di perangkat Android dan mendownloadnya ke folder isolated_path.
+        Beberapa APK ditarik bersamaan (APK_PULL_CONCURRENCY), aplikasi yang versionCode
+        dan lastUpdateTime-nya tidak berubah diambil dari cache APK tanpa pull ulang.
 
         :param serial: Serial number perangkat Android.
+        :param on_file_ready: Callback opsional dengan path APK yang selesai ditarik.
+        :param resolve_known_files: Callback opsional untuk mode hash di device, lihat
+            pull_files_from_android. APK yang dikembalikan tetap ditarik, hanya tidak
+            diteruskan ke on_file_ready.
         :return: Dictionary yang berisi nama paket dan path base.apk-nya.
         """
         try:
-            # Mendapatkan daftar semua paket yang terinstal (hanya aplikasi user-installed)
-            packages_output = subprocess.getoutput(f"adb -s {serial} shell pm list packages -3 --user 0")
-            
-            # Memisahkan output menjadi list nama paket
-            packages = packages_output.replace("package:", "").splitlines()
+            # Path base.apk semua aplikasi user-installed (satu perintah pm)
+            packages = Data_Pulling.list_third_party_apks(serial)
+            # Cache APK per device, key: versionCode dan lastUpdateTime
+            versions = Data_Pulling.get_package_versions(serial)
+            apk_cache = ApkCache(serial)
 
             # Dictionary untuk menyimpan hasil
             base_apk_paths = {}
@@ -151,62 +525,66 @@ class Data_Pulling:
             isolated_path = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial}/installed_apps/")
             os.makedirs(isolated_path, exist_ok=True)
 
-            # Loop melalui setiap paket dan dapatkan path base.apk-nya
-            for package in packages:
-                try:
-                    # Dapatkan output dari `adb shell pm path {package}`
-                    path_output = subprocess.getoutput(f"adb -s {serial} shell pm path {package}")
-                    
-                    # Pisahkan output menjadi beberapa baris (setiap baris adalah path terpisah)
-                    paths = path_output.strip().splitlines()
-
-                    # Loop melalui setiap path
-                    for path in paths:
-                        # Ambil path base.apk dari output (biasanya dalam format "package:/path/to/base.apk")
-                        base_apk_path = path.replace("package:", "").strip()
-
-                        # Jika path base.apk ditemukan
-                        if base_apk_path:
-                            # Buat folder untuk setiap package
-                            package_folder = os.path.join(isolated_path, package)
-                            os.makedirs(package_folder, exist_ok=True)
-
-                            # Nama file baru sesuai dengan nama package
-                            new_apk_name = f"{package}.apk"
-                            new_apk_path = os.path.join(package_folder, new_apk_name)
-
-                            # Download base.apk dari perangkat Android
-                            subprocess.run(["adb", "-s", serial, "pull", "-a",base_apk_path, new_apk_path, "--sync"], check=True)
-
-                            # Simpan path baru ke dalam dictionary
-                            base_apk_paths[package] = new_apk_path
-                            break  # Hanya ambil base.apk, abaikan split_config jika ada
+            # Mode hash di device: APK yang tidak ada di cache di-hash di device dulu,
+            # APK yang hash-nya sudah punya verdict tetap ditarik (supaya tetap
+            # tercatat di isolated.json dan masuk cache APK) tapi tidak disubmit lagi
+            known = set()
+            if resolve_known_files:
+                apk_destinations = {
+                    package: os.path.join(isolated_path, package, f"{package}.apk")
+                    for package, apk_path in packages.items()
+                    if not (versions.get(package) and apk_cache.get(package, apk_path, versions[package]))
+                }
+                device_hashes = Data_Pulling.get_remote_sha256(
+                    serial, [packages[package] for package in apk_destinations]
+                )
+                known = resolve_known_files({
+                    new_apk_path: device_hashes[packages[package]]
+                    for package, new_apk_path in apk_destinations.items()
+                    if packages[package] in device_hashes
+                })
 
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Gagal menarik base.apk untuk paket {package}: {e.stderr}")
-                    continue
+            # Lock device dipegang di thread ini selama semua worker berjalan
+            with adb_pool.server_access(serial), ThreadPoolExecutor(max_workers=APK_PULL_CONCURRENCY) as executor:
+                futures = {
+                    executor.submit(
+                        Data_Pulling.pull_apk, serial, package, apk_path, isolated_path,
+                        apk_cache, versions.get(package)
+                    ): package
+                    for package, apk_path in packages.items()
+                }
+                for future in as_completed(futures):
+                    package = futures[future]
+                    try:
+                        base_apk_paths[package] = future.result()
+                    except subprocess.CalledProcessError as e:
+                        logger.error(f"Gagal menarik base.apk untuk paket {package}: {e.stderr}")
+                        continue
+                    logger.info(f"berhasil menyimpan apk {package} di folder {base_apk_paths[package]}")
+                    if on_file_ready and base_apk_paths[package] not in known:
+                        on_file_ready(base_apk_paths[package])
 
             return base_apk_paths
 
         except Exception as e:
             logger.error(f"Terjadi kesalahan dalam fungsi get_base_apk: {e}")
             raise Exception(f"Failed to get base APK: {e}")
-        
+
     @staticmethod
     def generate_isolated_json(serial: str) -> str:
         # Dapatkan path dasar dari environment variable
         base_path = os.path.expanduser(f"{str(os.getenv('APP_ISOLATED_FOR_VIRUS_TOTAL'))}/{serial}")
-        
+
         if not os.path.isdir(base_path):
             raise Exception(f"Direktori isolasi untuk serial {serial} tidak ditemukan: {base_path}")
-        
+
         result = {
             "archive": [],
             "documents": [],
             "installer": [],
             "application": []
         }
-        
+
         # Proses folder kategori: archive, documents, installer
         for category in ["archive", "documents", "installer"]:
             category_path = os.path.join(base_path, category)
@@ -215,9 +593,9 @@ class Data_Pulling:
                     file_path = os.path.join(category_path, file)
                     if os.path.isfile(file_path):
                         result[category].append(file)
-        
+
         # Proses kategori aplikasi.
-        # Pertama, cek apakah terdapat folder 'installed_apps'. 
+        # Pertama, cek apakah terdapat folder 'installed_apps'.
         # Sesuai fungsi get_base_apk, base.apk disimpan di:
         # APP_ISOLATED_FOR_VIRUS_TOTAL/{serial}/installed_apps/{package}/{package}.apk
         installed_apps_path = os.path.join(base_path, "installed_apps")
@@ -239,14 +617,15 @@ class Data_Pulling:
                     apk_path = os.path.join(entry_path, apk_name)
                     if os.path.isfile(apk_path):
                         result["application"].append(apk_name)
-        
+
         # Tulis data JSON ke file isolated.json di base_path
         json_file_path = os.path.join(base_path, "isolated.json")
         with open(json_file_path, "w") as json_file:
             json.dump(result, json_file, indent=4)
-        
+
         return json_file_path
-    
+
+
 FILE_CATEGORIES = {
 
     'archive': [
@@ -261,8 +640,35 @@ FILE_CATEGORIES = {
         "pdf", "doc", "docx", "xls", "xlsx", "txt"
     ],
     'media': [
-        "mov", "avi", "mp4", "mp3", "mpeg", "jpg", 
-        "png", "svg", "gif", "webp", "mkv", "wav", 
+        "mov", "avi", "mp4", "mp3", "mpeg", "jpg",
+        "png", "svg", "gif", "webp", "mkv", "wav",
         "ogg", "wmv"
     ],
-    }
\ No newline at end of file
+    }
+
+# Lookup kategori berdasarkan ekstensi
+EXTENSION_CATEGORIES = {
+    extension: category
+    for category, extensions in FILE_CATEGORIES.items()
+    for extension in extensions
+}
+
+# Magic bytes untuk FILE_MAGIC_SNIFFING (ftyp MP4/MOV dicek terpisah di offset 4)
+MAGIC_SIGNATURES = [
+    (b"PK\x03\x04", "archive"),
+    (b"Rar!\x1a\x07", "archive"),
+    (b"7z\xbc\xaf\x27\x1c", "archive"),
+    (b"\x1f\x8b", "archive"),
+    (b"BZh", "archive"),
+    (b"\xfd7zXZ\x00", "archive"),
+    (b"MZ", "installer"),
+    (b"dex\n", "installer"),
+    (b"%PDF", "documents"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "documents"),
+    (b"\x89PNG\r\n\x1a\n", "media"),
+    (b"\xff\xd8\xff", "media"),
+    (b"GIF8", "media"),
+    (b"ID3", "media"),
+    (b"OggS", "media"),
+    (b"RIFF", "media"),
+]
@@ -5,6 +5,11 @@ import logging
 from pathlib import Path
 from typing import List, Dict
 from app.api.v1.device_scan import run_device_scan
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    SCAN_STATUS_FAILED,
+    ScanCatalogRepository,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -51,7 +56,7 @@ def background_fast_scan(output_dir: str, serial_number: str, scan_id: str, init
         logger.info(f"Starting fast scan for device {serial_number} with scan_id {scan_id}...")
         
         # Jalankan pemindaian perangkat
-        run_device_scan(output_dir)
+        run_device_scan(output_dir, serial_number)
         logger.info(f"Fast scan finished for device {serial_number}.")
         
         # Baca aktivitas dari file dumpsys
@@ -102,6 +107,8 @@ def background_fast_scan(output_dir: str, serial_number: str, scan_id: str, init
                 json.dump(history_entries, f, indent=4)
         else:
             logger.warning("history_scan.json tidak ditemukan untuk diupdate.")
+
+        ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_COMPLETED)
     
     except Exception as e:
         logger.error(f"Error during fast scan for device {serial_number}: {e}")
@@ -125,4 +132,5 @@ def background_fast_scan(output_dir: str, serial_number: str, scan_id: str, init
             "failed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         create_fast_scan_detail_result(Path(output_dir), error_data)
+        ScanCatalogRepository.update_status(output_dir, SCAN_STATUS_FAILED)
         raise
@@ -1,15 +1,10 @@
-import subprocess
+from app.utils.adb_pool import adb_pool
 
 def check_root_status_via_adb(serial_number: str) -> bool:
     try:
-        result = subprocess.run(
-            ["adb", "-s", serial_number, "shell", "su -c 'whoami'"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        output = adb_pool.shell(serial_number, "su -c 'whoami'")
 
-        if "root" in result.stdout:
+        if "root" in output:
             return True
         else:
             return False
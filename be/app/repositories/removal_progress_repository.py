@@ -1,20 +1,18 @@
 import os
 import json
-import subprocess
 from app.utils.config import PROJECT_ROOT
+from app.utils.adb_pool import adb_pool, AdbError
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_device_id() -> str:
-    result = subprocess.run(["adb", "devices"], capture_output=True, text=True)
-    lines = result.stdout.splitlines()
-    for line in lines[1:]:
-        parts = line.split()
-        if len(parts) >= 2 and parts[1] == "device":
-            return parts[0]
-    return None
+    try:
+        return adb_pool.get_default_serial()
+    except (AdbError, OSError) as e:
+        logger.error(f"Gagal mendapatkan daftar device: {e}")
+        return None
 
 def find_dumpsys_file(serial_number: str) -> str:
     base_path = os.path.join(PROJECT_ROOT, "output-scan", "full-scan", serial_number)
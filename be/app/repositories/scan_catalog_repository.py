@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Katalog scan: satu baris per folder scan
+# (BASE_SCAN_PATH/{scan_type}/{serial}/{timestamp}) beserta statusnya, sehingga
+# mencari scan terbaru cukup satu query terindeks tanpa listing folder
+SCAN_CATALOG_DB = os.path.expanduser(
+    os.getenv(
+        "SCAN_CATALOG_DB",
+        os.path.join(
+            os.path.expanduser(str(os.getenv("BASE_SCAN_PATH"))), "scan_catalog.db"
+        ),
+    )
+)
+# Lama menunggu lock SQLite sebelum error "database is locked" (milidetik)
+SCAN_CATALOG_BUSY_TIMEOUT_MS = int(os.getenv("SCAN_CATALOG_BUSY_TIMEOUT_MS", 5000))
+
+# Status scan di katalog: "started" saat folder dibuat, lalu "completed" atau "failed"
+SCAN_STATUS_STARTED = "started"
+SCAN_STATUS_COMPLETED = "completed"
+SCAN_STATUS_FAILED = "failed"
+
+_local = threading.local()
+
+
+def _normalize(path: Union[str, Path]) -> str:
+    return os.path.realpath(os.path.expanduser(str(path)))
+
+
+def _status_from_disk(scan_dir: str) -> str:
+    # Folder yang tidak dicatat lewat record_scan: status diambil dari
+    # detail_result.json, scan yang tidak tercatat gagal dianggap selesai
+    try:
+        with open(os.path.join(scan_dir, "detail_result.json"), "r") as file:
+            if json.load(file).get("status") == SCAN_STATUS_FAILED:
+                return SCAN_STATUS_FAILED
+    except (OSError, ValueError, AttributeError):
+        pass
+    return SCAN_STATUS_COMPLETED
+
+
+class ScanCatalogRepository:
+    @staticmethod
+    def _get_connection() -> sqlite3.Connection:
+        # Koneksi dipakai ulang per thread (scan berjalan di thread scheduler)
+        conn = getattr(_local, "conn", None)
+        if conn is not None and _local.pid == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(SCAN_CATALOG_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(
+            SCAN_CATALOG_DB, timeout=SCAN_CATALOG_BUSY_TIMEOUT_MS / 1000
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scans (
+                scan_dir TEXT PRIMARY KEY,
+                base_path TEXT NOT NULL,
+                scan_type TEXT,
+                serial_number TEXT,
+                scan_id TEXT,
+                created_at REAL NOT NULL,
+                status TEXT
+            )
+        """
+        )
+        # Katalog dari sebelum kolom status ada
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(scans)")}
+        if "status" not in columns:
+            conn.execute("ALTER TABLE scans ADD COLUMN status TEXT")
+            rows = conn.execute("SELECT scan_dir FROM scans").fetchall()
+            conn.executemany(
+                "UPDATE scans SET status = ? WHERE scan_dir = ?",
+                [(_status_from_disk(row["scan_dir"]), row["scan_dir"]) for row in rows],
+            )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scans_base_path_created_at "
+            "ON scans (base_path, created_at)"
+        )
+        conn.commit()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def record_scan(scan_dir: Union[str, Path], scan_type: str = None,
+                    serial_number: str = None, scan_id: str = None,
+                    created_at: float = None) -> None:
+        """
+        Catat folder scan baru dengan status "started". Dipanggil saat folder scan
+        dibuat, urutan scan diambil dari created_at (bukan dari nama folder
+        %d%m%Y_%H%M%S yang tidak bisa diurutkan sebagai string).
+        """
+        scan_dir = _normalize(scan_dir)
+        # Folder lama didaftarkan dulu agar scan sebelumnya tetap ditemukan
+        ScanCatalogRepository._ensure_indexed(os.path.dirname(scan_dir))
+        conn = ScanCatalogRepository._get_connection()
+        conn.execute(
+            """
+            INSERT INTO scans (
+                scan_dir, base_path, scan_type, serial_number, scan_id, created_at,
+                status
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(scan_dir) DO UPDATE SET
+            scan_type=excluded.scan_type, serial_number=excluded.serial_number,
+            scan_id=excluded.scan_id, created_at=excluded.created_at,
+            status=excluded.status
+            """,
+            (scan_dir, os.path.dirname(scan_dir), scan_type, serial_number, scan_id,
+             created_at if created_at is not None else time.time(),
+             SCAN_STATUS_STARTED),
+        )
+        conn.commit()
+
+    @staticmethod
+    def update_status(scan_dir: Union[str, Path], status: str) -> None:
+        """Tandai scan selesai ("completed") atau gagal ("failed")."""
+        conn = ScanCatalogRepository._get_connection()
+        conn.execute(
+            "UPDATE scans SET status = ? WHERE scan_dir = ?",
+            (status, _normalize(scan_dir)),
+        )
+        conn.commit()
+
+    @staticmethod
+    def _ensure_indexed(base_path: str, force: bool = False) -> None:
+        # Folder scan yang tidak dicatat lewat record_scan (mis. dari sebelum katalog
+        # ada) didaftarkan dengan mtime sebagai created_at, sama seperti urutan yang
+        # dipakai sebelumnya. Tanpa force, folder hanya dipindai jika base_path belum
+        # punya baris sama sekali.
+        conn = ScanCatalogRepository._get_connection()
+        if not force and conn.execute(
+            "SELECT 1 FROM scans WHERE base_path = ? LIMIT 1", (base_path,)
+        ).fetchone():
+            return
+        if not os.path.isdir(base_path):
+            return
+        known = {
+            row["scan_dir"]
+            for row in conn.execute(
+                "SELECT scan_dir FROM scans WHERE base_path = ?", (base_path,)
+            )
+        }
+        rows = []
+        with os.scandir(base_path) as entries:
+            for entry in entries:
+                scan_dir = os.path.join(base_path, entry.name)
+                if entry.is_dir() and scan_dir not in known:
+                    rows.append((scan_dir, base_path, entry.stat().st_mtime,
+                                 _status_from_disk(scan_dir)))
+        if rows:
+            conn.executemany(
+                "INSERT OR IGNORE INTO scans (scan_dir, base_path, created_at, status) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            logger.info(
+                f"Katalog scan: {len(rows)} folder didaftarkan dari {base_path}"
+            )
+
+    @staticmethod
+    def get_latest_scan_directory(base_path: Union[str, Path],
+                                  exclude: Optional[Union[str, Path]] = None,
+                                  status: Optional[str] = None) -> Optional[Path]:
+        """
+        Folder scan terbaru di base_path (BASE_SCAN_PATH/{scan_type}/{serial}),
+        atau None jika belum ada. exclude dipakai untuk melewati scan yang sedang
+        berjalan saat mencari scan sebelumnya, status untuk membatasi ke scan
+        dengan status tertentu (mis. "completed" untuk hasil dan risiko).
+
+        Jika tidak ada scan yang cocok, folder base_path dipindai sekali lagi untuk
+        folder yang dibuat di luar record_scan. Folder seperti itu tidak terlihat
+        selama masih ada scan lain yang cocok.
+        """
+        base_path = _normalize(base_path)
+        exclude = _normalize(exclude) if exclude is not None else ""
+        conn = ScanCatalogRepository._get_connection()
+        query = "SELECT scan_dir FROM scans WHERE base_path = ? AND scan_dir != ?"
+        params = [base_path, exclude]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT 1"
+
+        ScanCatalogRepository._ensure_indexed(base_path)
+        rescanned = False
+        while True:
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                if rescanned:
+                    return None
+                ScanCatalogRepository._ensure_indexed(base_path, force=True)
+                rescanned = True
+                continue
+            if os.path.isdir(row["scan_dir"]):
+                return Path(row["scan_dir"])
+
+            # Folder scan sudah dihapus dari disk
+            conn.execute("DELETE FROM scans WHERE scan_dir = ?", (row["scan_dir"],))
+            conn.commit()
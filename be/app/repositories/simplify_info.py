@@ -1,24 +1,16 @@
-import subprocess
+from app.utils.device_properties import device_properties
 
 
 def get_device_info() -> dict:
     """Retrieve the phone model and security patch version using ADB."""
     try:
+        properties = device_properties.get_properties()
+
         # Get the phone model
-        model_result = subprocess.run(
-            ["adb", "shell", "getprop", "ro.product.model"],
-            capture_output=True,
-            text=True,
-        )
-        phone_model = model_result.stdout.strip()
+        phone_model = properties.get("ro.product.model", "")
 
         # Get the security patch version
-        patch_result = subprocess.run(
-            ["adb", "shell", "getprop", "ro.build.version.security_patch"],
-            capture_output=True,
-            text=True,
-        )
-        security_patch = patch_result.stdout.strip()
+        security_patch = properties.get("ro.build.version.security_patch", "")
 
         return {"phone_model": phone_model, "security_patch": security_patch}
     except Exception as e:
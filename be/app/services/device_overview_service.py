@@ -5,6 +5,8 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from datetime import datetime
 from app.repositories.device_overview_repository import DeviceRepository
+from app.utils.adb_pool import adb_pool, AdbError
+from app.utils.device_properties import device_properties
 from urllib.parse import quote
 from dotenv import load_dotenv
 
@@ -16,31 +18,45 @@ class DeviceOverviewService:
         DeviceRepository.save_device_overview(serial_number, data)
 
     @staticmethod
-    def run_adb_command(command):
-        result = subprocess.run(command, capture_output=True, text=True)
-        return result.stdout.strip()
+    def run_adb_command(command, serial_number=None):
+        try:
+            return adb_pool.shell(serial_number, command).strip()
+        except (AdbError, OSError) as e:
+            print(f"Error menjalankan perintah ADB '{command}': {e}")
+            return ""
 
     @staticmethod
-    def get_device_model():
-        return DeviceOverviewService.run_adb_command(
-            ["adb", "shell", "getprop", "ro.product.model"]
-        )
+    def get_device_property(name: str, serial_number=None) -> str:
+        # Dibaca dari snapshot getprop per device, bukan satu round trip per properti
+        try:
+            return device_properties.get_property(serial_number, name)
+        except (AdbError, OSError) as e:
+            print(f"Error mendapatkan properti {name}: {e}")
+            return ""
 
     @staticmethod
-    def get_android_version():
-        return DeviceOverviewService.run_adb_command(
-            ["adb", "shell", "getprop", "ro.build.version.release"]
+    def get_device_model(serial_number=None):
+        return DeviceOverviewService.get_device_property("ro.product.model", serial_number)
+
+    @staticmethod
+    def get_android_version(serial_number=None):
+        return DeviceOverviewService.get_device_property(
+            "ro.build.version.release", serial_number
         )
 
     @staticmethod
-    def get_security_patch():
-        return DeviceOverviewService.run_adb_command(
-            ["adb", "shell", "getprop", "ro.build.version.security_patch"]
+    def get_security_patch(serial_number=None):
+        return DeviceOverviewService.get_device_property(
+            "ro.build.version.security_patch", serial_number
         )
 
     @staticmethod
     def get_serial_number():
-        return DeviceOverviewService.run_adb_command(["adb", "get-serialno"])
+        try:
+            return adb_pool.get_default_serial() or ""
+        except (AdbError, OSError) as e:
+            print(f"Error mendapatkan serial number: {e}")
+            return ""
 
     @staticmethod
     def get_last_scan(serial_number: str):
@@ -52,44 +68,44 @@ class DeviceOverviewService:
     @staticmethod
     def get_device_name(serial_number: str) -> str:
         try:
+            properties = device_properties.get_properties(serial_number)
+
             # Get the brand of the device
-            brand = subprocess.check_output(
-                ["adb", "-s", serial_number, "shell", "getprop", "ro.product.brand"],
-                stderr=subprocess.STDOUT
-            ).decode("utf-8").strip()
+            brand = properties.get("ro.product.brand", "")
 
             # Get the model of the device
-            model = subprocess.check_output(
-                ["adb", "-s", serial_number, "shell", "getprop", "ro.product.model"],
-                stderr=subprocess.STDOUT
-            ).decode("utf-8").strip()
+            model = properties.get("ro.product.model", "")
 
             # Combine brand and model
             return f"{brand} {model}"
-        except subprocess.CalledProcessError as e:
+        except (AdbError, OSError) as e:
             # Handle errors, such as when the device is not connected or ADB fails
-            return f"Error retrieving device name for serial {serial_number}: {e.output.decode('utf-8').strip()}"
+            return f"Error retrieving device name for serial {serial_number}: {e}"
 
 
     @staticmethod
-    def get_imei(slot: int) -> str:
+    def get_imeis() -> tuple:
+        # Script dijalankan sekali untuk kedua slot IMEI
         result = subprocess.run(
             ["bash", "app/utils/bash/get-imei.sh"], capture_output=True, text=True
         )
         imei_lines = result.stdout.strip().split("\n")
+        imei1 = imei_lines[0].replace("IMEI 1: ", "").strip()
+        imei2 = imei_lines[1].replace("IMEI 2: ", "").strip() if len(imei_lines) > 1 else ""
+        return imei1, imei2
 
-        if slot == 1:
-            return imei_lines[0].replace("IMEI 1: ", "").strip()
-        elif slot == 2:
-            return imei_lines[1].replace("IMEI 2: ", "").strip()
-        else:
+    @staticmethod
+    def get_imei(slot: int) -> str:
+        if slot not in (1, 2):
             return "Tidak valid"
+        return DeviceOverviewService.get_imeis()[slot - 1]
 
     @staticmethod
-    def get_device_images(model: str) -> str:
+    def get_device_images(model: str, serial_number=None, brand: str = None) -> str:
         try:
             base_url = f"{os.getenv('BASE_URL_DEVICE_OVERVIEW')}static/phone-images/images"
-            brand = DeviceOverviewService.get_device_brand()
+            if brand is None:
+                brand = DeviceOverviewService.get_device_brand(serial_number)
             encode_image = quote(model)
             image_url = f"{base_url}/{brand}/{encode_image}.jpg"
             
@@ -104,10 +120,9 @@ class DeviceOverviewService:
             return f"{os.getenv('BASE_URL_DEVICE_OVERVIEW_DEFAULT')}static/phone-images/images/default.jpg"
     
     @staticmethod
-    def get_device_brand() -> str:
+    def get_device_brand(serial_number=None) -> str:
         try:
-            import subprocess
-            brand = subprocess.check_output("adb shell getprop ro.product.brand", shell=True).decode('utf-8').strip()
+            brand = device_properties.get_property(serial_number, "ro.product.brand")
             return brand.lower()
         except Exception as e:
             print(f"Error mendapatkan brand dari perangkat: {e}")
@@ -115,18 +130,28 @@ class DeviceOverviewService:
 
 
     @staticmethod
-    def get_device_overview():
-        serial_number = DeviceOverviewService.get_serial_number()
-        model = DeviceOverviewService.get_device_model()  # Ambil model perangkat
+    def get_device_overview(serial_number=None):
+        # Serial di-resolve sekali dan semua properti dibaca dari satu snapshot getprop
+        try:
+            serial_number, properties = device_properties.get_snapshot(serial_number)
+            brand = properties.get("ro.product.brand", "")
+            model = properties.get("ro.product.model", "")  # Ambil model perangkat
+            name = f"{brand} {model}"
+        except (AdbError, OSError) as e:
+            print(f"Error mendapatkan properti perangkat {serial_number}: {e}")
+            serial_number = serial_number or ""
+            properties, brand, model = {}, "default", ""
+            name = f"Error retrieving device name for serial {serial_number}: {e}"
+        imei1, imei2 = DeviceOverviewService.get_imeis()
         overview = {
-            "name": DeviceOverviewService.get_device_name(serial_number),
-            "image": DeviceOverviewService.get_device_images(model),  # Gambar diambil berdasarkan model
+            "name": name,
+            "image": DeviceOverviewService.get_device_images(model, serial_number, brand.lower()),  # Gambar diambil berdasarkan model
             "model": model,
-            "imei1": DeviceOverviewService.get_imei(1),
-            "imei2": DeviceOverviewService.get_imei(2),
-            "android_version": DeviceOverviewService.get_android_version(),
+            "imei1": imei1,
+            "imei2": imei2,
+            "android_version": properties.get("ro.build.version.release", ""),
             "last_scan": DeviceOverviewService.get_last_scan(serial_number),
-            "security_patch": DeviceOverviewService.get_security_patch(),
+            "security_patch": properties.get("ro.build.version.security_patch", ""),
             "serial_number": serial_number,
         }
 
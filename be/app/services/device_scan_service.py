@@ -2,21 +2,20 @@ import os
 from mvt import android
 from click import Group
 import logging
-import subprocess
+from app.utils.adb_pool import adb_pool
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Jumlah modul MVT yang dijalankan bersamaan dalam satu scan. Default 1 karena
+# modul ADB (mvt/android/modules/adb) belum diuji memakai koneksi USB device
+# secara bersamaan, hasil dan log per modul sudah sama dengan run berurutan
+# (tests/test_command_workers.py, tests/test_command_logging.py)
+MVT_MODULE_WORKERS = os.getenv("MVT_MODULE_WORKERS", "1")
 
-def run_device_scan(output_directory: str):
-    os.makedirs(output_directory, exist_ok=True)
 
-    try:
-        subprocess.run(["adb", "kill-server"], check=True)
-        logger.info("ADB server restarted successfully.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to restart ADB server: {str(e)}")
-        raise RuntimeError(f"Failed to restart ADB server: {str(e)}")
+def run_device_scan(output_directory: str, serial_number: str = None):
+    os.makedirs(output_directory, exist_ok=True)
 
     cli: Group = android.cli
 
@@ -28,13 +27,23 @@ def run_device_scan(output_directory: str):
         "modules/indicators/",
         "-p",
         "1",
+        "--workers",
+        MVT_MODULE_WORKERS,
     ]
+    if not serial_number:
+        serial_number = adb_pool.get_default_serial()
+        if not serial_number:
+            raise RuntimeError("Failed to run scan: no device connected via ADB")
+    default_args += ["--serial", serial_number]
 
-    try:
-        cli(default_args)
-        logger.info("Scan completed successfully.")
-    except SystemExit as e:
-        logger.info(f"Scan completed with exit code: {e.code}")
-    except Exception as e:
-        logger.error(f"Failed to run scan: {str(e)}")
-        raise RuntimeError(f"Failed to run scan: {str(e)}")
+    # Modul ADB MVT mengklaim USB secara langsung, jadi hanya device ini yang
+    # dilepas dari ADB server. Device lain tetap memakai ADB server.
+    with adb_pool.usb_handoff(serial_number):
+        try:
+            cli(default_args)
+            logger.info("Scan completed successfully.")
+        except SystemExit as e:
+            logger.info(f"Scan completed with exit code: {e.code}")
+        except Exception as e:
+            logger.error(f"Failed to run scan: {str(e)}")
+            raise RuntimeError(f"Failed to run scan: {str(e)}")
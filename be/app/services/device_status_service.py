@@ -1,6 +1,7 @@
 import subprocess
 import re
 from app.repositories.device_status_repository import DeviceStatusRepository
+from app.utils.adb_pool import adb_pool
 
 PHONE_KEYWORDS = [
     "Android", "Phone", "Samsung", "Xiaomi", "Huawei", "Nokia", "Qualcomm",
@@ -44,16 +45,7 @@ class DeviceStatusService:
     @staticmethod
     def check_adb_connection():
         try:
-            result = subprocess.run(
-                ["adb", "devices"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-            output = result.stdout.decode("utf-8").strip()
-            lines = output.split("\n")[1:]  # Abaikan header
-            for line in lines:
-                parts = line.split()
-                if len(parts) == 2 and parts[1] == "device":
-                    return True
-            return False
+            return len(adb_pool.get_device_serials()) > 0
         except Exception as e:
             print(f"Error checking ADB connection: {e}")
             return False
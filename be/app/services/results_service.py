@@ -1,12 +1,16 @@
 import json
 import os
 import logging
-import subprocess
 from datetime import datetime
 from typing import Dict
 from app.repositories.risk_repository import RiskRepository
 from app.repositories.result_scan_overview_repository import ResultScanOverviewRepository
+from app.repositories.scan_catalog_repository import (
+    SCAN_STATUS_COMPLETED,
+    ScanCatalogRepository,
+)
 from pathlib import Path
+from app.utils.device_properties import device_properties
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,37 +21,28 @@ class ResultService:
     @staticmethod
     def get_phone_model(serial_number: str) -> str:
         try:
-            command = f"adb -s {serial_number} shell getprop ro.product.model" 
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                phone_model = result.stdout.strip()
-                return phone_model
-            else:
-                return "Unknown"
+            phone_model = device_properties.get_property(serial_number, "ro.product.model")
+            return phone_model or "Unknown"
         except Exception as e:
             return "Unknown"
 
     @staticmethod
     def get_security_patch_date(serial_number: str) -> str:
         try:
-            command = f"adb -s {serial_number} shell getprop ro.vendor.build.security_patch"
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                security_patch_date = result.stdout.strip()
-                return security_patch_date
-            else:
-                return "Unknown"
+            security_patch_date = device_properties.get_property(serial_number, "ro.vendor.build.security_patch")
+            return security_patch_date or "Unknown"
         except Exception as e:
             return "Unknown"
         
     def get_latest_scan_directory(base_path: Path) -> Path:
         try:
-            directories = [d for d in base_path.iterdir() if d.is_dir()]
-            if not directories:
-                raise FileNotFoundError(f"Tidak ada direktori scan ditemukan di {base_path}")
-            latest_directory = max(directories, key=lambda x: x.stat().st_mtime)
+            latest_directory = ScanCatalogRepository.get_latest_scan_directory(
+                base_path, status=SCAN_STATUS_COMPLETED
+            )
+            if latest_directory is None:
+                raise FileNotFoundError(
+                    f"Tidak ada direktori scan selesai ditemukan di {base_path}"
+                )
             logger.info(f"Direktori scan terbaru ditemukan: {latest_directory}")
             return latest_directory
         except Exception as e:
@@ -59,11 +54,17 @@ class ResultService:
         try:
             scan_type = "full-scan"
             base_path = Path(os.path.expanduser(f"{str(os.getenv('BASE_SCAN_PATH'))}")) / scan_type / serial_number
-            latest_scan_directory = ResultService.get_latest_scan_directory(base_path)
-            previous_detail_result = latest_scan_directory / "detail_result.json"
-            with open(previous_detail_result, "r") as file:
-                data = json.load(file)
-                last_scan_percentage = data["security_percentage"]
+            # Persentase dari scan terakhir yang selesai, scan yang sedang berjalan
+            # atau gagal tidak dihitung
+            latest_scan_directory = ScanCatalogRepository.get_latest_scan_directory(
+                base_path, status=SCAN_STATUS_COMPLETED
+            )
+            last_scan_percentage = "0.0%"
+            if latest_scan_directory is not None:
+                previous_detail_result = latest_scan_directory / "detail_result.json"
+                with open(previous_detail_result, "r") as file:
+                    data = json.load(file)
+                    last_scan_percentage = data["security_percentage"]
             security_percentage = RiskRepository.calculate_security_percentage(task_results)
             scan_overview_result = ResultScanOverviewRepository.generate_scan_overview(task_results)
             security_patch_date = ResultService.get_security_patch_date(serial_number)
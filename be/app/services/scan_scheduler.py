@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Jumlah scan yang boleh berjalan bersamaan untuk semua device
+SCAN_MAX_CONCURRENT = int(os.getenv("SCAN_MAX_CONCURRENT", 4))
+# Worker per serial berhenti sendiri jika antriannya kosong selama waktu ini (detik)
+SCAN_WORKER_IDLE_TIMEOUT = float(os.getenv("SCAN_WORKER_IDLE_TIMEOUT", 60))
+SCAN_JOB_HISTORY_LIMIT = int(os.getenv("SCAN_JOB_HISTORY_LIMIT", 200))
+
+
+class ScanScheduler:
+    """
+    Scheduler scan multi-device. Setiap serial memiliki antrian dan satu worker
+    sendiri sehingga scan untuk device yang sama berjalan berurutan, sementara
+    scan untuk device berbeda berjalan paralel dengan batas global
+    SCAN_MAX_CONCURRENT.
+    """
+
+    def __init__(self, max_concurrent: int = SCAN_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._queues: Dict[str, queue.Queue] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._jobs: Dict[str, dict] = {}
+        self._finished = deque()
+
+    def submit(
+        self, serial_number: str, scan_id: str, scan_type: str, func: Callable, *args
+    ) -> dict:
+        job = {
+            "scan_id": scan_id,
+            "serial_number": serial_number,
+            "scan_type": scan_type,
+            "status": "queued",
+            "queued_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[scan_id] = job
+            job_queue = self._queues.setdefault(serial_number, queue.Queue())
+            job_queue.put((job, func, args))
+            if serial_number not in self._workers:
+                worker = threading.Thread(
+                    target=self._worker,
+                    args=(serial_number, job_queue),
+                    name=f"scan-worker-{serial_number}",
+                    daemon=True,
+                )
+                self._workers[serial_number] = worker
+                worker.start()
+
+        logger.info(
+            f"Scan {scan_id} ({scan_type}) masuk antrian untuk device {serial_number}"
+        )
+        return dict(job)
+
+    def _worker(self, serial_number: str, job_queue: queue.Queue) -> None:
+        while True:
+            try:
+                job, func, args = job_queue.get(timeout=SCAN_WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self._lock:
+                    if job_queue.empty():
+                        self._workers.pop(serial_number, None)
+                        self._queues.pop(serial_number, None)
+                        return
+                continue
+
+            with self._slots:
+                self._update(
+                    job,
+                    status="running",
+                    started_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                )
+                logger.info(
+                    f"Scan {job['scan_id']} mulai berjalan untuk device {serial_number}"
+                )
+                try:
+                    func(*args)
+                    self._update(job, status="finished")
+                except Exception as e:
+                    logger.error(f"Scan {job['scan_id']} gagal: {e}")
+                    self._update(job, status="failed", error=str(e))
+                finally:
+                    self._update(
+                        job, finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    )
+                    self._archive(job)
+                    job_queue.task_done()
+
+    def _update(self, job: dict, **fields) -> None:
+        with self._lock:
+            job.update(fields)
+
+    def _archive(self, job: dict) -> None:
+        with self._lock:
+            self._finished.append(job["scan_id"])
+            while len(self._finished) > SCAN_JOB_HISTORY_LIMIT:
+                self._jobs.pop(self._finished.popleft(), None)
+
+    def get_jobs(self, serial_number: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return [
+                dict(job) for job in self._jobs.values()
+                if serial_number is None or job["serial_number"] == serial_number
+            ]
+
+    def get_job(self, scan_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(scan_id)
+            return dict(job) if job else None
+
+    def stats(self) -> dict:
+        jobs = self.get_jobs()
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active_workers": len(self._workers),
+            "queued": sum(1 for job in jobs if job["status"] == "queued"),
+            "running": sum(1 for job in jobs if job["status"] == "running"),
+        }
+
+
+scan_scheduler = ScanScheduler()
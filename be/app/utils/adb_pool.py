@@ -0,0 +1,455 @@
+import os
+import re
+import select
+import socket
+import subprocess
+import threading
+import uuid
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADB_SERVER_HOST = os.getenv("ADB_SERVER_HOST", "127.0.0.1")
+ADB_SERVER_PORT = int(os.getenv("ADB_SERVER_PORT", 5037))
+ADB_SOCKET_TIMEOUT = float(os.getenv("ADB_SOCKET_TIMEOUT", 60))
+# Jumlah maksimal sesi shell idle yang disimpan untuk setiap serial
+ADB_POOL_MAX_IDLE = int(os.getenv("ADB_POOL_MAX_IDLE", 4))
+
+
+class AdbError(Exception):
+    pass
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbError("Koneksi ke ADB server terputus")
+        data += chunk
+    return data
+
+
+def _connect_server() -> socket.socket:
+    """
+    Membuka koneksi TCP ke ADB server. Jika server belum berjalan,
+    `adb start-server` dijalankan sekali lalu koneksi dicoba ulang.
+    """
+    try:
+        return socket.create_connection(
+            (ADB_SERVER_HOST, ADB_SERVER_PORT), timeout=ADB_SOCKET_TIMEOUT
+        )
+    except ConnectionRefusedError:
+        logger.info("ADB server belum berjalan, menjalankan adb start-server...")
+        subprocess.run(["adb", "start-server"], capture_output=True)
+        return socket.create_connection(
+            (ADB_SERVER_HOST, ADB_SERVER_PORT), timeout=ADB_SOCKET_TIMEOUT
+        )
+
+
+def _send_request(sock: socket.socket, payload: str) -> None:
+    """
+    Mengirim satu request dengan format protokol ADB server
+    (panjang 4 digit hex + payload) lalu membaca status OKAY/FAIL.
+    """
+    data = payload.encode("utf-8")
+    sock.sendall(b"%04x" % len(data) + data)
+    status = _recv_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        length = int(_recv_exact(sock, 4), 16)
+        message = _recv_exact(sock, length).decode("utf-8", errors="replace")
+        raise AdbError(message)
+    raise AdbError(f"Status tidak dikenal dari ADB server: {status!r}")
+
+
+def _read_length_prefixed(sock: socket.socket) -> str:
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length).decode("utf-8", errors="replace")
+
+
+def _read_until_close(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def open_device_service(serial: str, service: str) -> socket.socket:
+    """
+    Membuka socket ke sebuah service (misalnya `shell:`) pada device tertentu
+    melalui ADB server, tanpa membuat proses `adb` baru.
+    """
+    sock = _connect_server()
+    try:
+        _send_request(sock, f"host:transport:{serial}")
+        _send_request(sock, service)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+class AdbShellSession:
+    """
+    Sesi `adb shell` persisten yang berjalan di atas satu socket ADB server.
+    Setiap perintah diakhiri dengan marker unik agar output dan exit code
+    bisa dipisahkan tanpa menutup sesi.
+    """
+
+    def __init__(self, serial: str, transport_id: Optional[str] = None):
+        self.serial = serial
+        self.transport_id = transport_id
+        self.sock = open_device_service(serial, "shell,raw:")
+        self.buffer = b""
+
+    def run(self, command: str) -> Tuple[int, str]:
+        marker = f"__cundamanix_{uuid.uuid4().hex}__"
+        script = (
+            f"{{ {command}\n}} </dev/null 2>/dev/null; "
+            f"printf '\\n{marker}:%d\\n' $?\n"
+        )
+        self.sock.sendall(script.encode("utf-8"))
+
+        end_marker = f"\n{marker}:".encode("utf-8")
+        while True:
+            idx = self.buffer.find(end_marker)
+            if idx != -1:
+                newline = self.buffer.find(b"\n", idx + len(end_marker))
+                if newline != -1:
+                    output = self.buffer[:idx]
+                    exit_code = int(self.buffer[idx + len(end_marker):newline])
+                    self.buffer = self.buffer[newline + 1:]
+                    return exit_code, output.decode("utf-8", errors="replace")
+
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise AdbError(f"Sesi shell untuk device {self.serial} terputus")
+            self.buffer += chunk
+
+    def is_alive(self) -> bool:
+        # Socket yang sudah ditutup ADB server terbaca EOF tanpa menunggu
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if not readable:
+                return True
+            return self.sock.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbServerLock:
+    """
+    Lock baca/tulis untuk akses ke satu device lewat ADB server. Pemakai device
+    (sesi shell, adb pull) memegang akses shared, sedangkan hand-off USB ke MVT
+    memegang akses exclusive hanya selama device dilepas/disambungkan kembali.
+    Akses shared bisa diambil ulang oleh thread yang sama (reentrant).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self):
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                while self._writer or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                with self._cond:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class AdbConnectionPool:
+    """
+    Pool koneksi ADB per serial. Semua akses device (daftar device, perintah
+    shell) melewati socket ADB server sehingga tidak ada fork/exec `adb`
+    untuk setiap request endpoint.
+    """
+
+    def __init__(self, max_idle: int = ADB_POOL_MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[AdbShellSession]] = {}
+        self._transport_ids: Dict[str, str] = {}
+        self._device_locks: Dict[str, AdbServerLock] = {}
+        # Device lama (adbd < Android 7) tidak mendukung `shell,raw:`,
+        # untuk device tersebut setiap perintah memakai service `shell:` biasa.
+        self._no_persistent_shell = set()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "discarded": 0,
+            "oneshot": 0,
+            "device_queries": 0,
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_devices(self) -> List[Dict[str, str]]:
+        """
+        Mengambil daftar device dari `host:devices-l`.
+        Sesi milik device yang sudah tidak terhubung atau tersambung ulang
+        (transport_id berubah) akan dibuang dari pool.
+        """
+        self._count("device_queries")
+        sock = _connect_server()
+        try:
+            _send_request(sock, "host:devices-l")
+            output = _read_length_prefixed(sock)
+        finally:
+            sock.close()
+
+        devices = []
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            device = {"serial": parts[0], "state": parts[1], "transport_id": ""}
+            match = re.search(r"transport_id:(\d+)", line)
+            if match:
+                device["transport_id"] = match.group(1)
+            devices.append(device)
+
+        self._sync_transports(devices)
+        return devices
+
+    def _sync_transports(self, devices: List[Dict[str, str]]) -> None:
+        current = {
+            d["serial"]: d["transport_id"] for d in devices if d["state"] == "device"
+        }
+        with self._lock:
+            for serial in list(self._transport_ids.keys()):
+                if current.get(serial) != self._transport_ids[serial]:
+                    self._drop_serial_locked(serial)
+            for serial, transport_id in current.items():
+                self._transport_ids[serial] = transport_id
+
+    def _drop_serial_locked(self, serial: str) -> None:
+        for session in self._idle.pop(serial, []):
+            session.close()
+            self._stats["discarded"] += 1
+        self._transport_ids.pop(serial, None)
+        self._no_persistent_shell.discard(serial)
+
+    def _device_lock(self, serial: str) -> AdbServerLock:
+        with self._lock:
+            return self._device_locks.setdefault(serial, AdbServerLock())
+
+    def server_access(self, serial: str):
+        """
+        Akses shared ke device lewat ADB server. Dipakai oleh operasi yang
+        membutuhkan device tetap terpasang di ADB server (misalnya `adb pull`),
+        sehingga hand-off USB untuk device tersebut menunggu operasi selesai.
+        Device lain tidak terpengaruh.
+        """
+        return self._device_lock(serial).shared()
+
+    def _adb_device_command(self, serial: str, command: str) -> bool:
+        result = subprocess.run(
+            ["adb", "-s", serial, command], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            logger.warning(
+                f"`adb -s {serial} {command}` gagal: "
+                f"{(result.stderr or result.stdout).strip()}"
+            )
+        return result.returncode == 0
+
+    @contextmanager
+    def usb_handoff(self, serial: str):
+        """
+        Melepas satu device dari ADB server (`adb -s <serial> detach`) agar modul
+        MVT bisa mengklaim USB device tersebut secara langsung, lalu
+        menyambungkannya kembali (`adb attach`) setelah selesai. ADB server tetap
+        berjalan sehingga device lain tidak terputus. Lock device hanya dipegang
+        saat detach/attach, bukan selama scan.
+        """
+        with self._device_lock(serial).exclusive():
+            with self._lock:
+                self._drop_serial_locked(serial)
+            detached = self._adb_device_command(serial, "detach")
+        if detached:
+            logger.info(f"Device {serial} dilepas dari ADB server untuk akses USB")
+        else:
+            # adb lama (< platform-tools 35) tidak punya detach, MVT akan
+            # melaporkan sendiri jika USB device tidak bisa diklaim
+            logger.warning(f"Device {serial} tidak bisa dilepas dari ADB server")
+
+        try:
+            yield
+        finally:
+            if detached:
+                with self._device_lock(serial).exclusive():
+                    self._adb_device_command(serial, "attach")
+                logger.info(f"Device {serial} disambungkan kembali ke ADB server")
+
+    def get_transport_id(self, serial: str) -> Optional[str]:
+        with self._lock:
+            return self._transport_ids.get(serial)
+
+    def get_device_serials(self) -> List[str]:
+        return [d["serial"] for d in self.get_devices() if d["state"] == "device"]
+
+    def get_default_serial(self) -> Optional[str]:
+        serials = self.get_device_serials()
+        return serials[0] if serials else None
+
+    def _acquire(self, serial: str) -> AdbShellSession:
+        while True:
+            with self._lock:
+                sessions = self._idle.get(serial)
+                if not sessions:
+                    self._stats["misses"] += 1
+                    transport_id = self._transport_ids.get(serial)
+                    break
+                session = sessions.pop()
+            # Sesi idle bisa saja sudah mati (misalnya adb server di-restart),
+            # sesi seperti itu dibuang sebelum ada perintah yang dikirim
+            if session.is_alive():
+                self._count("hits")
+                return session
+            session.close()
+            self._count("discarded")
+        return AdbShellSession(serial, transport_id)
+
+    def _release(self, session: AdbShellSession) -> None:
+        with self._lock:
+            if session.transport_id != self._transport_ids.get(session.serial):
+                session.close()
+                self._stats["discarded"] += 1
+                return
+            sessions = self._idle.setdefault(session.serial, [])
+            if len(sessions) < self.max_idle:
+                sessions.append(session)
+                return
+        session.close()
+
+    @contextmanager
+    def session(self, serial: str):
+        with self._checked_out(self._acquire(serial)) as session:
+            yield session
+
+    @contextmanager
+    def _checked_out(self, session: AdbShellSession):
+        try:
+            yield session
+        except Exception:
+            session.close()
+            self._count("discarded")
+            raise
+        else:
+            self._release(session)
+
+    def _run_oneshot(self, serial: str, command: str) -> Tuple[int, str]:
+        self._count("oneshot")
+        sock = open_device_service(serial, f"shell:{command} 2>/dev/null; echo $?")
+        try:
+            output = _read_until_close(sock).decode("utf-8", errors="replace")
+        finally:
+            sock.close()
+        output = output.replace("\r\n", "\n").rstrip("\n")
+        output, _, exit_code = output.rpartition("\n")
+        try:
+            return int(exit_code), output
+        except ValueError:
+            return 1, output
+
+    def run_shell(self, serial: Optional[str], command: str) -> Tuple[int, str]:
+        """
+        Menjalankan perintah shell pada device dan mengembalikan
+        (exit_code, stdout). Jika serial None, device pertama yang terhubung
+        akan digunakan (sama seperti `adb shell` tanpa `-s`).
+        """
+        if not serial:
+            serial = self.get_default_serial()
+            if not serial:
+                raise AdbError("Tidak ada device yang terhubung via ADB")
+
+        with self.server_access(serial):
+            return self._run_shell(serial, command)
+
+    def _run_shell(self, serial: str, command: str) -> Tuple[int, str]:
+        if serial in self._no_persistent_shell:
+            return self._run_oneshot(serial, command)
+
+        try:
+            session = self._acquire(serial)
+        except AdbError as e:
+            # adbd lama menolak service `shell,raw:` saat sesi dibuka
+            if "closed" in str(e) or "unknown" in str(e).lower():
+                logger.info(f"Device {serial} tidak mendukung shell persisten: {e}")
+                with self._lock:
+                    self._no_persistent_shell.add(serial)
+                return self._run_oneshot(serial, command)
+            raise
+        except OSError as e:
+            raise AdbError(f"Gagal membuka sesi shell pada {serial}: {e}")
+
+        # Setelah perintah terkirim tidak ada percobaan ulang, perintah bisa saja
+        # sudah berjalan di device (misalnya timeout saat membaca output)
+        with self._checked_out(session):
+            try:
+                return session.run(command)
+            except OSError as e:
+                raise AdbError(f"Gagal menjalankan perintah pada {serial}: {e}")
+
+    def shell(self, serial: Optional[str], command: str) -> str:
+        return self.run_shell(serial, command)[1]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / total, 4) if total else 0.0,
+                "idle_sessions": {
+                    serial: len(sessions) for serial, sessions in self._idle.items()
+                },
+            }
+
+
+adb_pool = AdbConnectionPool()
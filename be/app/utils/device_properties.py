@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+from mvt.android.artifacts.getprop import GetProp
+
+from app.utils.adb_pool import adb_pool, AdbError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Daftar device (serial -> transport_id) dipakai ulang selama waktu ini (detik),
+# sehingga beberapa pembacaan properti berturut-turut cukup satu host:devices-l
+DEVICE_LIST_TTL = float(os.getenv("DEVICE_LIST_TTL", 2))
+
+
+class DevicePropertyCache:
+    """
+    Cache properti Android per serial. Satu `getprop` penuh diambil sekali
+    per koneksi device, diparse dengan parser GetProp milik MVT, lalu dipakai
+    ulang oleh semua endpoint (overview, simplify-info, hasil scan).
+    Cache otomatis dibuang ketika device tersambung ulang (transport_id berubah).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        self._devices: Dict[str, str] = {}
+        self._devices_at = 0.0
+
+    def _get_devices(self, refresh: bool = False) -> Dict[str, str]:
+        with self._lock:
+            if not refresh and time.monotonic() - self._devices_at < DEVICE_LIST_TTL:
+                return self._devices
+
+        devices = {
+            d["serial"]: d["transport_id"]
+            for d in adb_pool.get_devices()
+            if d["state"] == "device"
+        }
+        with self._lock:
+            self._devices = devices
+            self._devices_at = time.monotonic()
+        return devices
+
+    def _resolve(self, serial: Optional[str]) -> Tuple[str, str]:
+        devices = self._get_devices()
+        if serial and serial not in devices:
+            # Device bisa saja baru tersambung sejak daftar terakhir diambil
+            devices = self._get_devices(refresh=True)
+        if not serial:
+            if not devices:
+                raise AdbError("Tidak ada device yang terhubung via ADB")
+            serial = next(iter(devices))
+        elif serial not in devices:
+            self.invalidate(serial)
+            raise AdbError(f"Device {serial} tidak terhubung via ADB")
+        return serial, devices[serial]
+
+    def get_snapshot(
+        self, serial: Optional[str] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """
+        Mengembalikan (serial, properti) dari satu snapshot getprop. Jika serial
+        None, device pertama yang terhubung dipakai.
+        """
+        serial, transport_id = self._resolve(serial)
+
+        with self._lock:
+            cached = self._snapshots.get(serial)
+            if cached and cached[0] == transport_id:
+                return serial, cached[1]
+
+        getprop = GetProp()
+        getprop.parse(adb_pool.shell(serial, "getprop"))
+        properties = {entry["name"]: entry["value"] for entry in getprop.results}
+
+        with self._lock:
+            self._snapshots[serial] = (transport_id, properties)
+        logger.info(
+            f"Snapshot getprop untuk {serial} disimpan ({len(properties)} properti)"
+        )
+        return serial, properties
+
+    def get_properties(self, serial: Optional[str] = None) -> Dict[str, str]:
+        return self.get_snapshot(serial)[1]
+
+    def get_property(self, serial: Optional[str], name: str, default: str = "") -> str:
+        return self.get_properties(serial).get(name, default)
+
+    def invalidate(self, serial: Optional[str] = None) -> None:
+        with self._lock:
+            self._devices_at = 0.0
+            if serial:
+                self._snapshots.pop(serial, None)
+            else:
+                self._snapshots.clear()
+
+
+device_properties = DevicePropertyCache()
@@ -0,0 +1,7 @@
+from mvt.common.utils import get_file_hashes
+
+
+def sha256_file(file_path: str) -> str:
+    # SHA-256/SHA-1/MD5 dihitung sekali jalan dan disimpan di cache hash MVT,
+    # file yang tidak berubah sejak scan sebelumnya tidak dibaca ulang.
+    return get_file_hashes(file_path)["sha256"]
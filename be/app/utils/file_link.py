@@ -0,0 +1,75 @@
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl FICLONE dari linux/fs.h (_IOW(0x94, 9, int)), reflink pada btrfs/xfs
+FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        _remove_quietly(dst)
+        return False
+
+
+def _copy_file_range(src: str, dst: str) -> bool:
+    # Copy di dalam kernel, tanpa melewati userspace. Di filesystem yang
+    # mendukung (btrfs, xfs, NFS 4.2) kernel otomatis membuat reflink.
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            remaining = os.fstat(src_file.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(
+                    src_file.fileno(), dst_file.fileno(), remaining
+                )
+                if copied == 0:
+                    break
+                remaining -= copied
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        _remove_quietly(dst)
+        return False
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """
+    Buat dst berisi file src tanpa menyalin data jika memungkinkan.
+    Urutan percobaan: hardlink, reflink (FICLONE), copy_file_range, lalu
+    shutil.copy2 sebagai fallback (misalnya beda filesystem). Mengembalikan
+    metode yang dipakai.
+    """
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno == errno.EEXIST:
+            raise
+
+    if _reflink(src, dst):
+        return "reflink"
+    if _copy_file_range(src, dst):
+        return "copy_file_range"
+
+    shutil.copy2(src, dst)
+    return "copy"
@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket sederhana. Token terisi ulang sebanyak rate_per_minute setiap
+    menit dan disimpan paling banyak satu menit kapasitas, sesuai jendela
+    rate limit VirusTotal.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self._lock = threading.Lock()
+        self.rate_per_minute = max(float(rate_per_minute), 0.0)
+        self._tokens = self.rate_per_minute
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(
+            self.rate_per_minute, self._tokens + elapsed * self.rate_per_minute / 60
+        )
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        with self._lock:
+            self._refill()
+            self.rate_per_minute = max(float(rate_per_minute), 0.0)
+            self._tokens = min(self._tokens, self.rate_per_minute)
+
+    def take(self, max_tokens: int, timeout: float = None) -> int:
+        """
+        Tunggu sampai minimal satu token tersedia lalu ambil sebanyak mungkin
+        token, maksimal max_tokens. Mengembalikan 0 jika timeout tercapai atau
+        rate 0 (tidak ada kapasitas).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    granted = min(int(self._tokens), max_tokens)
+                    self._tokens -= granted
+                    return granted
+                if self.rate_per_minute <= 0:
+                    return 0
+                wait = (1 - self._tokens) * 60 / self.rate_per_minute
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 0
+                wait = min(wait, remaining)
+            time.sleep(wait)
@@ -1,19 +1,68 @@
+import mmap
+from typing import Iterable, Iterator, Union
+
 from mvt.common.artifact import Artifact
 
+# Artifact content can be passed as a whole string or as any iterable of
+# lines (open file, pipe, generator...).
+ArtifactContent = Union[str, bytes, Iterable[Union[str, bytes]]]
+
+
+def _decode(line: Union[str, bytes]) -> str:
+    if isinstance(line, bytes):
+        return line.decode("utf-8", errors="replace")
+    return line
+
+
+def iter_lines(content: ArtifactContent) -> Iterator[str]:
+    """
+    Iterate over the lines of an artifact content without copying it.
+
+    :param content: string, bytes, mmap or iterable of lines
+    :return: iterator over the lines, without line terminators
+    """
+    if isinstance(content, (str, bytes)):
+        newline = "\n" if isinstance(content, str) else b"\n"
+        start = 0
+        length = len(content)
+        while start < length:
+            end = content.find(newline, start)
+            if end == -1:
+                end = length
+            yield _decode(content[start:end]).rstrip("\r")
+            start = end + 1
+        return
+
+    if isinstance(content, mmap.mmap):
+        content = iter(content.readline, b"")
+
+    for line in content:
+        yield _decode(line).rstrip("\r\n")
+
 
 class AndroidArtifact(Artifact):
     @staticmethod
-    def extract_dumpsys_section(dumpsys: str, separator: str) -> str:
+    def extract_dumpsys_section(dumpsys: ArtifactContent, separator: str) -> str:
         """
         Extract a section from a full dumpsys file.
 
-        :param dumpsys: content of the full dumpsys file (string)
+        :param dumpsys: content of the full dumpsys file (string or lines)
         :param separator: content of the first line separator (string)
         :return: section extracted (string)
         """
-        lines = []
+        return "\n".join(AndroidArtifact.iter_dumpsys_section(dumpsys, separator))
+
+    @staticmethod
+    def iter_dumpsys_section(dumpsys: ArtifactContent, separator: str) -> Iterator[str]:
+        """
+        Yield the lines of a section from a full dumpsys file.
+
+        :param dumpsys: content of the full dumpsys file (string or lines)
+        :param separator: content of the first line separator (string)
+        :return: iterator over the lines of the section
+        """
         in_section = False
-        for line in dumpsys.splitlines():
+        for line in iter_lines(dumpsys):
             if line.strip() == separator:
                 in_section = True
                 continue
@@ -26,6 +75,4 @@ class AndroidArtifact(Artifact):
             ):
                 break
 
-            lines.append(line)
-
-        return "\n".join(lines)
+            yield line
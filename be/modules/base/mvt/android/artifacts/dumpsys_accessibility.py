@@ -1,4 +1,4 @@
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 import re
 
 
@@ -7,24 +7,50 @@ class DumpsysAccessibilityArtifact(AndroidArtifact):
         if not self.indicators:
             return
 
+        matches = self.indicators.match_app_ids(
+            result["package_name"] for result in self.results
+        )
+
         for result in self.results:
-            ioc = self.indicators.check_app_id(result["package_name"])
+            ioc = matches.get(result["package_name"])
             if ioc:
                 result["matched_indicator"] = ioc
                 self.detected.append(result)
                 continue
 
-    def parse(self, content: str) -> None:
+    def parse(self, content: ArtifactContent) -> None:
         """
         Parse the Dumpsys Accessibility section/
         Adds results to self.results (List[Dict[str, str]])
 
-        :param content: content of the accessibility section (string)
+        :param content: content of the accessibility section (string or lines)
         """
+        # Both syntaxes are parsed in a single pass over the lines. Results of
+        # the "old" syntax are kept first, as they were before.
+        old_results = []
+        new_results = []
 
-        # "Old" syntax
         in_services = False
-        for line in content.splitlines():
+        old_done = False
+        for line in iter_lines(content):
+            # "New" syntax - AOSP >= 14 (?)
+            # Looks like:
+            # Enabled services:{{com.azure.authenticator/com.microsoft.brooklyn.module.accessibility.BrooklynAccessibilityService}, {com.agilebits.onepassword/com.agilebits.onepassword.filling.accessibility.FillingAccessibilityService}}
+            if line.strip().startswith("Enabled services:"):
+                matches = re.finditer(r"{([^{]+?)}", line)
+
+                for match in matches:
+                    # Each match is in format: <package_name>/<service>
+                    package_name, _, service = match.group(1).partition("/")
+
+                    new_results.append(
+                        {"package_name": package_name, "service": service}
+                    )
+
+            # "Old" syntax
+            if old_done:
+                continue
+
             if line.strip().startswith("installed services:"):
                 in_services = True
                 continue
@@ -34,29 +60,17 @@ class DumpsysAccessibilityArtifact(AndroidArtifact):
 
             if line.strip() == "}":
                 # At end of installed services
-                break
+                old_done = True
+                continue
 
             service = line.split(":")[1].strip()
 
-            self.results.append(
+            old_results.append(
                 {
                     "package_name": service.split("/")[0],
                     "service": service,
                 }
             )
 
-        # "New" syntax - AOSP >= 14 (?)
-        # Looks like:
-        # Enabled services:{{com.azure.authenticator/com.microsoft.brooklyn.module.accessibility.BrooklynAccessibilityService}, {com.agilebits.onepassword/com.agilebits.onepassword.filling.accessibility.FillingAccessibilityService}}
-
-        for line in content.splitlines():
-            if line.strip().startswith("Enabled services:"):
-                matches = re.finditer(r"{([^{]+?)}", line)
-
-                for match in matches:
-                    # Each match is in format: <package_name>/<service>
-                    package_name, _, service = match.group(1).partition("/")
-
-                    self.results.append(
-                        {"package_name": package_name, "service": service}
-                    )
+        self.results.extend(old_results)
+        self.results.extend(new_results)
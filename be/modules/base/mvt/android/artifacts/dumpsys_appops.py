@@ -3,7 +3,7 @@ from typing import Any, Dict, List, Union
 
 from mvt.common.utils import convert_datetime_to_iso
 
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysAppopsArtifact(AndroidArtifact):
@@ -32,13 +32,18 @@ class DumpsysAppopsArtifact(AndroidArtifact):
         return records
 
     def check_indicators(self) -> None:
+        matches = {}
+        if self.indicators:
+            matches = self.indicators.match_app_ids(
+                result.get("package_name") for result in self.results
+            )
+
         for result in self.results:
-            if self.indicators:
-                ioc = self.indicators.check_app_id(result.get("package_name"))
-                if ioc:
-                    result["matched_indicator"] = ioc
-                    self.detected.append(result)
-                    continue
+            ioc = matches.get(result.get("package_name"))
+            if ioc:
+                result["matched_indicator"] = ioc
+                self.detected.append(result)
+                continue
 
             for perm in result["permissions"]:
                 if (
@@ -50,7 +55,7 @@ class DumpsysAppopsArtifact(AndroidArtifact):
                         result["package_name"],
                     )
 
-    def parse(self, output: str) -> None:
+    def parse(self, output: ArtifactContent) -> None:
         self.results: List[Dict[str, Any]] = []
         perm = {}
         package = {}
@@ -58,7 +63,7 @@ class DumpsysAppopsArtifact(AndroidArtifact):
         uid = None
         in_packages = False
 
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if line.startswith("  Uid 0:"):
                 in_packages = True
 
@@ -1,6 +1,6 @@
 from typing import Union
 
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysBatteryDailyArtifact(AndroidArtifact):
@@ -21,17 +21,21 @@ class DumpsysBatteryDailyArtifact(AndroidArtifact):
         if not self.indicators:
             return
 
+        matches = self.indicators.match_app_ids(
+            result["package_name"] for result in self.results
+        )
+
         for result in self.results:
-            ioc = self.indicators.check_app_id(result["package_name"])
+            ioc = matches.get(result["package_name"])
             if ioc:
                 result["matched_indicator"] = ioc
                 self.detected.append(result)
                 continue
 
-    def parse(self, output: str) -> None:
+    def parse(self, output: ArtifactContent) -> None:
         daily = None
         daily_updates = []
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if line.startswith("  Daily from "):
                 if len(daily_updates) > 0:
                     self.results.extend(daily_updates)
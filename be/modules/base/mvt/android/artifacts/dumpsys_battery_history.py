@@ -1,4 +1,4 @@
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysBatteryHistoryArtifact(AndroidArtifact):
@@ -10,15 +10,19 @@ class DumpsysBatteryHistoryArtifact(AndroidArtifact):
         if not self.indicators:
             return
 
+        matches = self.indicators.match_app_ids(
+            result["package_name"] for result in self.results
+        )
+
         for result in self.results:
-            ioc = self.indicators.check_app_id(result["package_name"])
+            ioc = matches.get(result["package_name"])
             if ioc:
                 result["matched_indicator"] = ioc
                 self.detected.append(result)
                 continue
 
-    def parse(self, data: str) -> None:
-        for line in data.splitlines():
+    def parse(self, data: ArtifactContent) -> None:
+        for line in iter_lines(data):
             if line.startswith("Battery History "):
                 continue
 
@@ -1,6 +1,6 @@
 import re
 
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysDBInfoArtifact(AndroidArtifact):
@@ -12,16 +12,22 @@ class DumpsysDBInfoArtifact(AndroidArtifact):
         if not self.indicators:
             return
 
+        matches = self.indicators.match_app_ids(
+            part
+            for result in self.results
+            for part in result.get("path", "").split("/")
+        )
+
         for result in self.results:
             path = result.get("path", "")
             for part in path.split("/"):
-                ioc = self.indicators.check_app_id(part)
+                ioc = matches.get(part)
                 if ioc:
                     result["matched_indicator"] = ioc
                     self.detected.append(result)
                     continue
 
-    def parse(self, output: str) -> None:
+    def parse(self, output: ArtifactContent) -> None:
         rxp = re.compile(
             r".*\[([0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}\.[0-9]{3})\].*\[Pid:\((\d+)\)\](\w+).*sql\=\"(.+?)\""
         )  # pylint: disable=line-too-long
@@ -31,7 +37,7 @@ class DumpsysDBInfoArtifact(AndroidArtifact):
 
         pool = None
         in_operations = False
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if line.startswith("Connection pool for "):
                 pool = line.replace("Connection pool for ", "").rstrip(":")
 
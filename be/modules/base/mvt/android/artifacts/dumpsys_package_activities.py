@@ -1,4 +1,4 @@
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysPackageActivitiesArtifact(AndroidArtifact):
@@ -6,26 +6,30 @@ class DumpsysPackageActivitiesArtifact(AndroidArtifact):
         if not self.indicators:
             return
 
+        matches = self.indicators.match_app_ids(
+            activity["package_name"] for activity in self.results
+        )
+
         for activity in self.results:
-            ioc = self.indicators.check_app_id(activity["package_name"])
+            ioc = matches.get(activity["package_name"])
             if ioc:
                 activity["matched_indicator"] = ioc
                 self.detected.append(activity)
                 continue
 
-    def parse(self, content: str):
+    def parse(self, content: ArtifactContent):
         """
         Parse the Dumpsys Package section for activities
         Adds results to self.results
 
-        :param content: content of the package section (string)
+        :param content: content of the package section (string or lines)
         """
         self.results = []
 
         in_activity_resolver_table = False
         in_non_data_actions = False
         intent = None
-        for line in content.splitlines():
+        for line in iter_lines(content):
             if line.startswith("Activity Resolver Table:"):
                 in_activity_resolver_table = True
                 continue
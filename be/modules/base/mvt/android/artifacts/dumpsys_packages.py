@@ -1,13 +1,21 @@
 import re
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterator, List, Union
 
 from mvt.android.utils import ROOT_PACKAGES
 
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class DumpsysPackagesArtifact(AndroidArtifact):
     def check_indicators(self) -> None:
+        matches = {}
+        if self.indicators:
+            matches = self.indicators.match_app_ids(
+                result.get("package_name", "")
+                for result in self.results
+                if result["package_name"] not in ROOT_PACKAGES
+            )
+
         for result in self.results:
             if result["package_name"] in ROOT_PACKAGES:
                 self.log.warning(
@@ -18,10 +26,7 @@ class DumpsysPackagesArtifact(AndroidArtifact):
                 self.detected.append(result)
                 continue
 
-            if not self.indicators:
-                continue
-
-            ioc = self.indicators.check_app_id(result.get("package_name", ""))
+            ioc = matches.get(result.get("package_name", ""))
             if ioc:
                 result["matched_indicator"] = ioc
                 self.detected.append(result)
@@ -51,7 +56,7 @@ class DumpsysPackagesArtifact(AndroidArtifact):
         return records
 
     @staticmethod
-    def parse_dumpsys_package_for_details(output: str) -> Dict[str, Any]:
+    def parse_dumpsys_package_for_details(output: ArtifactContent) -> Dict[str, Any]:
         """
         Parse one entry of a dumpsys package information
         """
@@ -69,7 +74,7 @@ class DumpsysPackagesArtifact(AndroidArtifact):
         in_runtime_permissions = False
         in_declared_permissions = False
         in_requested_permissions = True
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if in_install_permissions:
                 if line.startswith(" " * 4) and not line.startswith(" " * 6):
                     in_install_permissions = False
@@ -132,7 +137,7 @@ class DumpsysPackagesArtifact(AndroidArtifact):
 
         return details
 
-    def parse_dumpsys_packages(self, output: str) -> List[Dict[str, Any]]:
+    def parse_dumpsys_packages(self, output: ArtifactContent) -> List[Dict[str, Any]]:
         """
         Parse the dumpsys package service data
         """
@@ -142,10 +147,10 @@ class DumpsysPackagesArtifact(AndroidArtifact):
         package_name = None
         package = {}
         lines = []
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if line.startswith("  Package ["):
                 if len(lines) > 0:
-                    details = self.parse_dumpsys_package_for_details("\n".join(lines))
+                    details = self.parse_dumpsys_package_for_details(lines)
                     package.update(details)
                     results.append(package)
                     lines = []
@@ -165,24 +170,16 @@ class DumpsysPackagesArtifact(AndroidArtifact):
             lines.append(line)
 
         if len(lines) > 0:
-            details = self.parse_dumpsys_package_for_details("\n".join(lines))
+            details = self.parse_dumpsys_package_for_details(lines)
             package.update(details)
             results.append(package)
 
         return results
 
-    def parse(self, content: str):
-        """
-        Parse the Dumpsys Package section for activities
-        Adds results to self.results
-
-        :param content: content of the package section (string)
-        """
-        self.results = []
-        package = []
-
+    @staticmethod
+    def _iter_package_list(content: ArtifactContent) -> Iterator[str]:
         in_package_list = False
-        for line in content.split("\n"):
+        for line in iter_lines(content):
             if line.startswith("Packages:"):
                 in_package_list = True
                 continue
@@ -193,6 +190,13 @@ class DumpsysPackagesArtifact(AndroidArtifact):
             if line.strip() == "":
                 break
 
-            package.append(line)
+            yield line
+
+    def parse(self, content: ArtifactContent):
+        """
+        Parse the Dumpsys Package section for activities
+        Adds results to self.results
 
-        self.results = self.parse_dumpsys_packages("\n".join(package))
+        :param content: content of the package section (string or lines)
+        """
+        self.results = self.parse_dumpsys_packages(self._iter_package_list(content))
@@ -1,4 +1,4 @@
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 INTENT_NEW_OUTGOING_SMS = "android.provider.Telephony.NEW_OUTGOING_SMS"
 INTENT_SMS_RECEIVED = "android.provider.Telephony.SMS_RECEIVED"
@@ -13,6 +13,14 @@ class DumpsysReceiversArtifact(AndroidArtifact):
     """
 
     def check_indicators(self) -> None:
+        matches = {}
+        if self.indicators:
+            matches = self.indicators.match_app_ids(
+                receiver["package_name"]
+                for receivers in self.results.values()
+                for receiver in receivers
+            )
+
         for intent, receivers in self.results.items():
             for receiver in receivers:
                 if intent == INTENT_NEW_OUTGOING_SMS:
@@ -42,22 +50,19 @@ class DumpsysReceiversArtifact(AndroidArtifact):
                         receiver["receiver"],
                     )
 
-                if not self.indicators:
-                    continue
-
-                ioc = self.indicators.check_app_id(receiver["package_name"])
+                ioc = matches.get(receiver["package_name"])
                 if ioc:
                     receiver["matched_indicator"] = ioc
                     self.detected.append({intent: receiver})
                     continue
 
-    def parse(self, output: str) -> None:
+    def parse(self, output: ArtifactContent) -> None:
         self.results = {}
 
         in_receiver_resolver_table = False
         in_non_data_actions = False
         intent = None
-        for line in output.splitlines():
+        for line in iter_lines(output):
             if line.startswith("Receiver Resolver Table:"):
                 in_receiver_resolver_table = True
                 continue
@@ -3,7 +3,7 @@ from typing import Dict, List
 
 from mvt.android.utils import warn_android_patch_level
 
-from .artifact import AndroidArtifact
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 INTERESTING_PROPERTIES = [
     "gsm.sim.operator.alpha",
@@ -21,11 +21,11 @@ INTERESTING_PROPERTIES = [
 
 
 class GetProp(AndroidArtifact):
-    def parse(self, entry: str) -> None:
+    def parse(self, entry: ArtifactContent) -> None:
         self.results: List[Dict[str, str]] = []
         rxp = re.compile(r"\[(.+?)\]: \[(.+?)\]")
 
-        for line in entry.splitlines():
+        for line in iter_lines(entry):
             line = line.strip()
             if line == "":
                 continue
@@ -1,9 +1,12 @@
-from .artifact import AndroidArtifact
+import itertools
+
+from .artifact import AndroidArtifact, ArtifactContent, iter_lines
 
 
 class Processes(AndroidArtifact):
-    def parse(self, entry: str) -> None:
-        for line in entry.split("\n")[1:]:
+    def parse(self, entry: ArtifactContent) -> None:
+        # The first line is the header of the ps output.
+        for line in itertools.islice(iter_lines(entry), 1, None):
             proc = line.split()
 
             # Skip empty lines
@@ -44,6 +47,10 @@ class Processes(AndroidArtifact):
         if not self.indicators:
             return
 
+        app_matches = self.indicators.match_app_ids(
+            result.get("proc_name", "") for result in self.results
+        )
+
         for result in self.results:
             proc_name = result.get("proc_name", "")
             if not proc_name:
@@ -53,7 +60,7 @@ class Processes(AndroidArtifact):
             if result["proc_name"] == "gatekeeperd":
                 continue
 
-            ioc = self.indicators.check_app_id(proc_name)
+            ioc = app_matches.get(proc_name)
             if ioc:
                 result["matched_indicator"] = ioc
                 self.detected.append(result)
@@ -14,6 +14,7 @@ from mvt.common.help import (
     HELP_MSG_OUTPUT,
     HELP_MSG_SERIAL,
     HELP_MSG_VERBOSE,
+    HELP_MSG_WORKERS,
 )
 from mvt.common.logo import logo
 from mvt.common.updates import IndicatorsUpdates
@@ -142,6 +143,9 @@ def download_apks(ctx, all_apks, virustotal, output, from_file, serial, verbose)
 @click.option("--module", "-m", help=HELP_MSG_MODULE)
 @click.option("--non-interactive", "-n", is_flag=True, help=HELP_MSG_NONINTERACTIVE)
 @click.option("--backup-password", "-p", help=HELP_MSG_ANDROID_BACKUP_PASSWORD)
+@click.option(
+    "--workers", "-w", type=int, default=1, show_default=True, help=HELP_MSG_WORKERS
+)
 @click.option("--verbose", "-v", is_flag=True, help=HELP_MSG_VERBOSE)
 @click.pass_context
 def check_adb(
@@ -154,6 +158,7 @@ def check_adb(
     module,
     non_interactive,
     backup_password,
+    workers,
     verbose,
 ):
     set_verbose_logging(verbose)
@@ -169,6 +174,7 @@ def check_adb(
         module_name=module,
         serial=serial,
         module_options=module_options,
+        workers=workers,
     )
 
     if list_modules:
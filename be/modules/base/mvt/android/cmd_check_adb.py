@@ -17,6 +17,7 @@ class CmdAndroidCheckADB(Command):
         module_name: Optional[str] = None,
         serial: Optional[str] = None,
         module_options: Optional[dict] = None,
+        workers: int = 1,
     ) -> None:
         super().__init__(
             target_path=target_path,
@@ -26,6 +27,7 @@ class CmdAndroidCheckADB(Command):
             serial=serial,
             module_options=module_options,
             log=log,
+            workers=workers,
         )
 
         self.name = "check-adb"
@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from typing import Callable, Optional
+from typing import Callable, Optional, Tuple
 
 from rich.progress import track
 
@@ -9,6 +9,7 @@ from mvt.common.module import InsufficientPrivileges
 
 from .modules.adb.base import AndroidExtraction
 from .modules.adb.packages import Packages
+from .utils import ApkCache, get_apk_cache_key
 
 log = logging.getLogger(__name__)
 
@@ -35,6 +36,7 @@ class DownloadAPKs(AndroidExtraction):
         self.packages = packages
         self.all_apks = all_apks
         self.results_path_apks = None
+        self.apk_cache: Optional[ApkCache] = None
 
     @classmethod
     def from_json(cls, json_path: str) -> Callable:
@@ -47,11 +49,18 @@ class DownloadAPKs(AndroidExtraction):
             packages = json.load(handle)
             return cls(packages=packages)
 
-    def pull_package_file(self, package_name: str, remote_path: str) -> None:
+    def pull_package_file(
+        self,
+        package_name: str,
+        remote_path: str,
+        cache_key: Optional[Tuple[str, str]] = None,
+    ) -> None:
         """Pull files related to specific package from the device.
 
         :param package_name: Name of the package to download
         :param remote_path: Path to the file to download
+        :param cache_key: (versionCode, lastUpdateTime) of the package, used
+                          to reuse a copy pulled during a previous extraction
         :returns: Path to the local copy
 
         """
@@ -74,6 +83,14 @@ class DownloadAPKs(AndroidExtraction):
                 self.results_path_apks, f"{package_name}{file_name}_{name_counter}.apk"
             )
 
+        cached_path = None
+        if self.apk_cache and cache_key:
+            cached_path = self.apk_cache.get(package_name, remote_path, cache_key)
+        if cached_path:
+            log.info("Package file %s is unchanged, using cached copy", remote_path)
+            ApkCache.link(cached_path, local_path)
+            return local_path
+
         try:
             self._adb_download(remote_path, local_path)
         except InsufficientPrivileges:
@@ -89,6 +106,9 @@ class DownloadAPKs(AndroidExtraction):
             self._adb_reconnect()
             return None
 
+        if self.apk_cache and cache_key:
+            self.apk_cache.put(package_name, remote_path, cache_key, local_path)
+
         return local_path
 
     def get_packages(self) -> None:
@@ -137,6 +157,8 @@ class DownloadAPKs(AndroidExtraction):
         if not os.path.exists(self.results_path_apks):
             os.makedirs(self.results_path_apks, exist_ok=True)
 
+        self.apk_cache = ApkCache(self.serial)
+
         for i in track(
             range(len(packages_selection)),
             description=f"Downloading {len(packages_selection)} packages...",
@@ -152,10 +174,11 @@ class DownloadAPKs(AndroidExtraction):
 
             # Sometimes the package path contains multiple lines for multiple
             # apks. We loop through each line and download each file.
+            cache_key = get_apk_cache_key(package)
             for package_file in package["files"]:
                 device_path = package_file["path"]
                 local_path = self.pull_package_file(
-                    package["package_name"], device_path
+                    package["package_name"], device_path, cache_key
                 )
                 if not local_path:
                     continue
@@ -1,5 +1,16 @@
+import json
+import os
+import re
+import shutil
+import threading
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+# Pulled APKs are kept per device and reused until the package is updated,
+# see ApkCache.
+MVT_APK_CACHE_PATH = os.environ.get(
+    "MVT_APK_CACHE", os.path.join("modules", "apk_cache")
+)
 
 
 def warn_android_patch_level(patch_level: str, log) -> bool:
@@ -99,3 +110,110 @@ BROWSER_INSTALLERS = [
     "com.google.android.packageinstaller",
     "com.android.packageinstaller",
 ]
+
+
+def get_apk_cache_key(package: dict) -> Optional[Tuple[str, str]]:
+    """Return the (versionCode, lastUpdateTime) of a parsed package.
+
+    :param package: Package details, as parsed from dumpsys package
+    :returns: The cache key, or None if the package details are incomplete
+
+    """
+    # dumpsys reports "versionCode=123 minSdk=21 targetSdk=33".
+    version_code = str(package.get("version_code", "")).split(" ", 1)[0]
+    last_update_time = str(package.get("last_update_time", "")).strip()
+    if not version_code or not last_update_time:
+        return None
+
+    return version_code, last_update_time
+
+
+class ApkCache:
+    """Per-device cache of pulled APK files, keyed on package name,
+    versionCode and lastUpdateTime. A package that was not updated since
+    the last extraction does not need to be pulled again.
+    """
+
+    def __init__(
+        self, serial: Optional[str], cache_path: str = MVT_APK_CACHE_PATH
+    ) -> None:
+        device = re.sub(r"[^\w.-]", "_", serial or "default")
+        self.path = os.path.join(cache_path, device)
+        self.index_path = os.path.join(self.path, "index.json")
+        self._lock = threading.Lock()
+        self._index: Dict[str, dict] = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as handle:
+                self._index = json.load(handle)
+        except (OSError, ValueError):
+            pass
+
+    def get(
+        self, package_name: str, remote_path: str, key: Tuple[str, str]
+    ) -> Optional[str]:
+        """Look up the cached copy of a package file.
+
+        :param package_name: Name of the package
+        :param remote_path: Path of the file on the device
+        :param key: (versionCode, lastUpdateTime) of the installed package
+        :returns: Path to the cached copy, or None if missing or outdated
+
+        """
+        with self._lock:
+            entry = self._index.get(package_name)
+            if not entry or entry["key"] != list(key):
+                return None
+            cached_path = entry["files"].get(remote_path)
+
+        if cached_path and os.path.isfile(cached_path):
+            return cached_path
+        return None
+
+    def put(
+        self,
+        package_name: str,
+        remote_path: str,
+        key: Tuple[str, str],
+        local_path: str,
+    ) -> None:
+        """Store a freshly pulled package file in the cache.
+
+        :param package_name: Name of the package
+        :param remote_path: Path of the file on the device
+        :param key: (versionCode, lastUpdateTime) of the installed package
+        :param local_path: Path to the pulled file
+
+        """
+        package_dir = os.path.join(self.path, package_name)
+        with self._lock:
+            entry = self._index.get(package_name)
+            if not entry or entry["key"] != list(key):
+                # The package was updated, drop the files of the old version.
+                shutil.rmtree(package_dir, ignore_errors=True)
+                entry = {"key": list(key), "files": {}}
+                self._index[package_name] = entry
+
+            os.makedirs(package_dir, exist_ok=True)
+            cached_path = os.path.join(package_dir, os.path.basename(remote_path))
+            self.link(local_path, cached_path)
+            entry["files"][remote_path] = cached_path
+
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self._index, handle)
+            os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def link(src: str, dst: str) -> None:
+        """Hardlink src to dst, or copy it if hardlinks are not possible.
+
+        :param src: Path to the existing file
+        :param dst: Path to create, replaced if it already exists
+
+        """
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
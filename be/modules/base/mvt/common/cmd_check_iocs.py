@@ -61,8 +61,7 @@ class CmdCheckIOCS(Command):
                     file_path, log=logging.getLogger(iocs_module.__module__)
                 )
                 if self.iocs.total_ioc_count > 0:
-                    m.indicators = self.iocs
-                    m.indicators.log = m.log
+                    m.indicators = self.iocs.with_log(m.log)
 
                 try:
                     exec_or_profile("m.check_indicators()", globals(), locals())
@@ -1,7 +1,9 @@
+import contextvars
 import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
@@ -14,6 +16,21 @@ from mvt.common.utils import (
 )
 from mvt.common.version import MVT_VERSION
 
+# Log file of the command running in the current context. Several commands can
+# run in the same process (one per device), each one only logs its own records.
+_command_log_path: contextvars.ContextVar = contextvars.ContextVar(
+    "mvt_command_log_path", default=None
+)
+
+
+class CommandLogFilter(logging.Filter):
+    def __init__(self, log_path: str) -> None:
+        super().__init__()
+        self.log_path = log_path
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return _command_log_path.get() == self.log_path
+
 
 class Command:
     def __init__(
@@ -26,6 +43,7 @@ class Command:
         module_options: Optional[dict] = None,
         hashes: bool = False,
         log: logging.Logger = logging.getLogger(__name__),
+        workers: int = 1,
     ) -> None:
         self.name = ""
         self.modules = []
@@ -36,6 +54,9 @@ class Command:
         self.module_name = module_name
         self.serial = serial
         self.log = log
+        # Number of modules allowed to run at the same time. Modules are
+        # still initialized and collected in their declared order.
+        self.workers = max(1, workers)
 
         # This dictionary can contain options that will be passed down from
         # the Command to all modules. This can for example be used to pass
@@ -50,6 +71,7 @@ class Command:
         self.hash_values = []
         self.timeline = []
         self.timeline_detected = []
+        self._log_handler = None
 
         # Load IOCs
         self._create_storage()
@@ -72,24 +94,39 @@ class Command:
             return
 
         logger = logging.getLogger("mvt")
-        file_handler = logging.FileHandler(
-            os.path.join(self.results_path, "cundamanix.log")
-        )
+        log_path = os.path.abspath(os.path.join(self.results_path, "cundamanix.log"))
+        file_handler = logging.FileHandler(log_path)
         formatter = logging.Formatter(
             "%(asctime)s - [cundamanix] - " "%(levelname)s - %(message)s"
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
+        file_handler.addFilter(CommandLogFilter(log_path))
 
         # MVT can be run in a loop
-        # Old file handlers stick around in subsequent loops
-        # Remove any existing logging.FileHandler instances
-        for handler in logger.handlers:
-            if isinstance(handler, logging.FileHandler):
+        # Old file handlers for the same results folder stick around in
+        # subsequent loops. Handlers of commands running for other devices
+        # are left alone.
+        for handler in list(logger.handlers):
+            if (
+                isinstance(handler, logging.FileHandler)
+                and handler.baseFilename == log_path
+            ):
                 logger.removeHandler(handler)
+                handler.close()
 
         # And finally add the new one
+        _command_log_path.set(log_path)
         logger.addHandler(file_handler)
+        self._log_handler = file_handler
+
+    def _close_logging(self) -> None:
+        if not self._log_handler:
+            return
+
+        logging.getLogger("mvt").removeHandler(self._log_handler)
+        self._log_handler.close()
+        self._log_handler = None
 
     def _store_timeline(self) -> None:
         if not self.results_path:
@@ -186,11 +223,18 @@ class Command:
             )
 
     def run(self) -> None:
+        try:
+            self._run()
+        finally:
+            self._close_logging()
+
+    def _run(self) -> None:
         try:
             self.init()
         except NotImplementedError:
             pass
 
+        modules = []
         for module in self.modules:
             if self.module_name and module.__name__ != self.module_name:
                 continue
@@ -206,8 +250,7 @@ class Command:
             )
 
             if self.iocs.total_ioc_count:
-                m.indicators = self.iocs
-                m.indicators.log = m.log
+                m.indicators = self.iocs.with_log(m.log)
 
             if self.serial:
                 m.serial = self.serial
@@ -217,8 +260,25 @@ class Command:
             except NotImplementedError:
                 pass
 
-            run_module(m)
+            modules.append(m)
+
+        if self.workers > 1 and len(modules) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # Each module runs in a copy of this context, so its records
+                # still go to this command's log file.
+                futures = [
+                    executor.submit(contextvars.copy_context().run, run_module, m)
+                    for m in modules
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            for m in modules:
+                run_module(m)
 
+        # Results are collected in module order, so the timeline and the
+        # detection count are the same as with a sequential run.
+        for m in modules:
             self.executed.append(m)
 
             self.detected_count += len(m.detected)
@@ -1,8 +1,11 @@
+import copy
+import hashlib
 import json
 import logging
 import os
+import pickle
 from functools import lru_cache
-from typing import Any, Dict, Iterator, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 import ahocorasick
 
@@ -15,6 +18,29 @@ from .url import URL
 # MVT_DATA_FOLDER = user_data_dir("mvt")
 MVT_DATA_FOLDER = "modules"
 MVT_INDICATORS_FOLDER = os.path.join(MVT_DATA_FOLDER, "indicators")
+# Compiled indicators are stored here, keyed on the content and mtime of the
+# STIX2 files they were built from.
+MVT_INDICATORS_INDEX_FOLDER = os.environ.get(
+    "MVT_INDICATORS_INDEX", os.path.join(MVT_DATA_FOLDER, "indicators_index")
+)
+INDICATORS_INDEX_VERSION = 2
+
+# Normalization applied to both indicators and checked values for the
+# exact-match lookups.
+EXACT_MATCH_TYPES = {
+    "app_ids": str.lower,
+    "files_sha256": str.lower,
+    "emails": str.lower,
+    "android_property_names": str.lower,
+    "file_names": None,
+    "processes": None,
+}
+# Process names are truncated to 16 characters by the kernel.
+TRUNCATED_PROCESS_NAME_LENGTH = 16
+
+# Indexes already loaded by this process, so that every Command created by
+# a long running process does not read the index file again.
+_loaded_indexes: Dict[str, dict] = {}
 
 logger = logging.getLogger(__name__)
 
@@ -28,31 +54,134 @@ class Indicators:
         self.log = log
         self.ioc_collections: List[Dict[str, Any]] = []
         self.total_ioc_count = 0
+        # Pre-built automatons loaded from the compiled index.
+        self._compiled_matchers: Dict[str, ahocorasick.Automaton] = {}
+        # Normalized value -> first matching indicator, per IOC type.
+        self._lookups: Dict[str, Dict[str, Dict[str, Any]]] = {}
 
-    def _load_downloaded_indicators(self) -> None:
+    def with_log(self, log: logging.Logger) -> "Indicators":
+        """Return a view of these indicators that logs through another logger.
+
+        The view shares the loaded collections and lookups, so each module
+        can report its detections with its own logger while running
+        concurrently with other modules.
+
+        :param log: Logger used for detections
+        :returns: Indicators sharing the loaded indicators
+
+        """
+        view = copy.copy(self)
+        view.log = log
+        return view
+
+    def _get_downloaded_indicators(self) -> List[str]:
         if not os.path.isdir(MVT_INDICATORS_FOLDER):
-            return
+            return []
 
-        for ioc_file_name in os.listdir(MVT_INDICATORS_FOLDER):
-            if ioc_file_name.lower().endswith(".stix2"):
-                self.parse_stix2(os.path.join(MVT_INDICATORS_FOLDER, ioc_file_name))
+        return [
+            os.path.join(MVT_INDICATORS_FOLDER, ioc_file_name)
+            for ioc_file_name in os.listdir(MVT_INDICATORS_FOLDER)
+            if ioc_file_name.lower().endswith(".stix2")
+        ]
 
-    def _check_stix2_env_variable(self) -> None:
+    def _get_stix2_env_variable(self) -> List[str]:
         """
         Checks if a variable MVT_STIX2 contains path to a STIX files.
         """
         if "MVT_STIX2" not in os.environ:
-            return
+            return []
 
+        files = []
         paths = os.environ["MVT_STIX2"].split(":")
         for path in paths:
             if os.path.isfile(path):
-                self.parse_stix2(path)
+                files.append(path)
             else:
                 self.log.error(
                     "Path specified with env MVT_STIX2 is not a valid file: %s", path
                 )
 
+        return files
+
+    @staticmethod
+    def _get_index_key(file_paths: List[str]) -> str:
+        """Compute the key of the compiled index for a list of STIX2 files.
+
+        :param file_paths: Ordered list of STIX2 files
+        :returns: Hex digest identifying the files, their content and mtime
+
+        """
+        digest = hashlib.sha256(f"v{INDICATORS_INDEX_VERSION}".encode())
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            digest.update(os.path.abspath(file_path).encode("utf-8"))
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+            with open(file_path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def _load_index(self, key: str) -> bool:
+        index = _loaded_indexes.get(key)
+        if index is None:
+            index_path = os.path.join(MVT_INDICATORS_INDEX_FOLDER, f"{key}.pickle")
+            if not os.path.isfile(index_path):
+                return False
+
+            try:
+                with open(index_path, "rb") as handle:
+                    index = pickle.load(handle)
+            except Exception as exc:
+                self.log.debug(
+                    "Unable to load compiled indicators %s: %s", index_path, exc
+                )
+                return False
+
+            _loaded_indexes[key] = index
+
+        # Pre-built automatons and lookups are only valid if nothing else
+        # was loaded.
+        if not self.ioc_collections:
+            self._compiled_matchers = dict(index["matchers"])
+            self._lookups = dict(index["lookups"])
+        else:
+            self._compiled_matchers = {}
+            self._lookups = {}
+
+        self.ioc_collections.extend(index["collections"])
+        self.total_ioc_count += index["total_ioc_count"]
+        return True
+
+    def _save_index(self, key: str, collections: list, total_ioc_count: int) -> None:
+        index = {
+            "collections": collections,
+            "total_ioc_count": total_ioc_count,
+            "matchers": {
+                "domains": self._build_matcher(self._iter_iocs(collections, "domains"))
+            },
+            "lookups": {
+                ioc_type: self._build_lookup(collections, ioc_type)
+                for ioc_type in EXACT_MATCH_TYPES
+            },
+        }
+        _loaded_indexes[key] = index
+
+        try:
+            os.makedirs(MVT_INDICATORS_INDEX_FOLDER, exist_ok=True)
+            index_path = os.path.join(MVT_INDICATORS_INDEX_FOLDER, f"{key}.pickle")
+            tmp_path = f"{index_path}.tmp"
+            with open(tmp_path, "wb") as handle:
+                pickle.dump(index, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+
+            # Remove indexes built from older versions of the indicators.
+            for file_name in os.listdir(MVT_INDICATORS_INDEX_FOLDER):
+                if file_name.endswith(".pickle") and file_name != f"{key}.pickle":
+                    os.remove(os.path.join(MVT_INDICATORS_INDEX_FOLDER, file_name))
+        except OSError as exc:
+            self.log.debug("Unable to store compiled indicators: %s", exc)
+
     def _new_collection(
         self,
         cid: Optional[str] = None,
@@ -188,27 +317,28 @@ class Indicators:
             )
             collections.append(collection)
 
-        # We loop through all indicators.
+        # Map each indicator to the first related malware definition, in the
+        # order the relationships appear in the file.
+        indicator_malware = {}
+        for relationship in relationships:
+            source_ref = relationship["source_ref"]
+            if source_ref in indicator_malware:
+                continue
+
+            # Look for a malware definition with the correct identifier.
+            if relationship["target_ref"] in malware:
+                indicator_malware[source_ref] = relationship["target_ref"]
+
+        collections_by_id = {}
+        for collection in collections:
+            collections_by_id.setdefault(collection["id"], collection)
+
+        # We loop through all indicators and add them to the collection
+        # matching the malware ID we got from the relationship.
         for indicator in indicators:
-            malware_id = None
-
-            # We loop through all relationships and find the one pertinent to
-            # the current indicator.
-            for relationship in relationships:
-                if relationship["source_ref"] != indicator["id"]:
-                    continue
-
-                # Look for a malware definition with the correct identifier.
-                if relationship["target_ref"] in malware.keys():
-                    malware_id = relationship["target_ref"]
-                    break
-
-            # Now we look for the correct collection matching the malware ID we
-            # got from the relationship.
-            for collection in collections:
-                if collection["id"] == malware_id:
-                    self._process_indicator(indicator, collection)
-                    break
+            collection = collections_by_id.get(indicator_malware.get(indicator["id"]))
+            if collection:
+                self._process_indicator(indicator, collection)
 
         for coll in collections:
             self.log.debug(
@@ -218,28 +348,55 @@ class Indicators:
             )
 
         self.ioc_collections.extend(collections)
+        # Pre-built automatons and lookups do not include the new collections.
+        self._compiled_matchers = {}
+        self._lookups = {}
 
     def load_indicators_files(
         self, files: list, load_default: Optional[bool] = True
     ) -> None:
         """
         Load a list of indicators files.
+
+        The parsed indicators are stored in a compiled index, which is reused
+        as long as the STIX2 files do not change.
         """
+        file_paths = []
         for file_path in files:
             if os.path.isfile(file_path):
-                self.parse_stix2(file_path)
+                file_paths.append(file_path)
             else:
                 self.log.warning("No indicators file exists at path %s", file_path)
 
         # Load downloaded indicators and any indicators from env variable.
         if load_default:
-            self._load_downloaded_indicators()
+            file_paths.extend(self._get_downloaded_indicators())
+
+        file_paths.extend(self._get_stix2_env_variable())
+
+        if file_paths:
+            key = self._get_index_key(file_paths)
+            if self._load_index(key):
+                self.log.info(
+                    "Loaded compiled indicators for %d STIX2 files", len(file_paths)
+                )
+            else:
+                loaded_collections = len(self.ioc_collections)
+                loaded_count = self.total_ioc_count
+                for file_path in file_paths:
+                    self.parse_stix2(file_path)
+
+                self._save_index(
+                    key,
+                    self.ioc_collections[loaded_collections:],
+                    self.total_ioc_count - loaded_count,
+                )
 
-        self._check_stix2_env_variable()
         self.log.info("Loaded a total of %d unique indicators", self.total_ioc_count)
 
-    def get_iocs(self, ioc_type: str) -> Iterator[Dict[str, Any]]:
-        for ioc_collection in self.ioc_collections:
+    @staticmethod
+    def _iter_iocs(collections: list, ioc_type: str) -> Iterator[Dict[str, Any]]:
+        for ioc_collection in collections:
             for ioc in ioc_collection.get(ioc_type, []):
                 yield {
                     "value": ioc,
@@ -248,6 +405,69 @@ class Indicators:
                     "stix2_file_name": ioc_collection["stix2_file_name"],
                 }
 
+    def get_iocs(self, ioc_type: str) -> Iterator[Dict[str, Any]]:
+        return self._iter_iocs(self.ioc_collections, ioc_type)
+
+    @classmethod
+    def _build_lookup(
+        cls, collections: list, ioc_type: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Build the exact-match lookup of an IOC type.
+
+        Only the first indicator for each normalized value is kept, as the
+        checks always returned the first match in collection order.
+
+        :param collections: List of IOC collections
+        :param ioc_type: Type of IOC, one of EXACT_MATCH_TYPES
+        :returns: Dictionary of normalized value to indicator details
+
+        """
+        normalize = EXACT_MATCH_TYPES[ioc_type]
+        lookup: Dict[str, Dict[str, Any]] = {}
+        for ioc in cls._iter_iocs(collections, ioc_type):
+            value = normalize(ioc["value"]) if normalize else ioc["value"]
+            lookup.setdefault(value, ioc)
+
+            # Truncated process names match any indicator they are a prefix of.
+            if (
+                ioc_type == "processes"
+                and len(value) >= TRUNCATED_PROCESS_NAME_LENGTH
+            ):
+                lookup.setdefault(
+                    f"truncated:{value[:TRUNCATED_PROCESS_NAME_LENGTH]}", ioc
+                )
+
+        return lookup
+
+    def _lookup(self, ioc_type: str, value: str) -> Optional[Dict[str, Any]]:
+        if ioc_type not in self._lookups:
+            self._lookups[ioc_type] = self._build_lookup(self.ioc_collections, ioc_type)
+
+        normalize = EXACT_MATCH_TYPES[ioc_type]
+        ioc = self._lookups[ioc_type].get(normalize(value) if normalize else value)
+        return dict(ioc) if ioc else None
+
+    @staticmethod
+    def _match_many(
+        check: Callable[[str], Optional[dict]], values: Iterable[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        matches = {}
+        # Records often repeat the same value, each one is only checked once.
+        for value in dict.fromkeys(values):
+            ioc = check(value)
+            if ioc:
+                matches[value] = ioc
+
+        return matches
+
+    @staticmethod
+    def _build_matcher(iocs) -> ahocorasick.Automaton:
+        automaton = ahocorasick.Automaton()
+        for ioc in iocs:
+            automaton.add_word(ioc["value"], ioc)
+        automaton.make_automaton()
+        return automaton
+
     @lru_cache()
     def get_ioc_matcher(
         self, ioc_type: Optional[str] = None, ioc_list: Optional[list] = None
@@ -268,18 +488,16 @@ class Indicators:
         We use an LRU cache to avoid rebuilding the automaton every time we call a
         function such as check_domain().
         """
-        automaton = ahocorasick.Automaton()
         if ioc_type:
+            if ioc_type in self._compiled_matchers:
+                return self._compiled_matchers[ioc_type]
             iocs = self.get_iocs(ioc_type)
         elif ioc_list:
             iocs = ioc_list
         else:
             raise ValueError("Must provide either ioc_tyxpe or ioc_list")
 
-        for ioc in iocs:
-            automaton.add_word(ioc["value"], ioc)
-        automaton.make_automaton()
-        return automaton
+        return self._build_matcher(iocs)
 
     @lru_cache()
     def check_domain(self, url: str) -> Union[dict, None]:
@@ -394,21 +612,103 @@ class Indicators:
 
         return None
 
-    def check_domains(self, urls: list) -> Union[dict, None]:
+    def match_urls(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Check many URLs against the provided list of domain indicators.
+
+        The domains and top level domains of all URLs are matched in a single
+        pass of the automaton over a joined buffer. Shortened URLs and URLs
+        that cannot be parsed go through check_domain().
+
+        :param urls: Iterable of URLs to check against domain indicators
+        :returns: Dictionary of each matching URL to its indicator details
+
+        """
+        matches: Dict[str, Dict[str, Any]] = {}
+        parsed = []
+        for url in dict.fromkeys(urls):
+            if not url or not isinstance(url, str):
+                continue
+
+            try:
+                parsed_url = URL(url)
+                shortened = parsed_url.check_if_shortened()
+            except Exception:
+                parsed_url, shortened = None, True
+
+            if shortened:
+                ioc = self.check_domain(url)
+                if ioc:
+                    matches[url] = ioc
+                continue
+
+            parsed.append(parsed_url)
+
+        if not parsed:
+            return matches
+
+        # Each URL contributes its domain and its top level domain, in this
+        # order, separated by new lines which never appear in a domain.
+        segments = []
+        for parsed_url in parsed:
+            segments.append(parsed_url.domain.lower())
+            segments.append(parsed_url.top_level.lower())
+
+        segment_ends = {}
+        offset = 0
+        for idx, segment in enumerate(segments):
+            offset += len(segment)
+            segment_ends.setdefault(offset - 1, []).append(idx)
+            offset += 1
+
+        found: Dict[int, Dict[str, Any]] = {}
+        domain_matcher = self.get_ioc_matcher("domains")
+        for end, ioc in domain_matcher.iter("\n".join(segments)):
+            for idx in segment_ends.get(end, []):
+                if segments[idx] == ioc["value"]:
+                    found[idx] = ioc
+
+        for pos, parsed_url in enumerate(parsed):
+            if pos * 2 in found:
+                ioc = found[pos * 2]
+                self.log.warning(
+                    "Found a known suspicious domain %s "
+                    'matching indicator "%s" from "%s"',
+                    parsed_url.url,
+                    ioc["value"],
+                    ioc["name"],
+                )
+            elif pos * 2 + 1 in found:
+                ioc = found[pos * 2 + 1]
+                self.log.warning(
+                    "Found a sub-domain with a suspicious top "
+                    'level %s matching indicator "%s" from "%s"',
+                    parsed_url.url,
+                    ioc["value"],
+                    ioc["name"],
+                )
+            else:
+                continue
+
+            matches[parsed_url.url] = ioc
+
+        return matches
+
+    def check_domains(self, urls: Iterable[str]) -> Union[dict, None]:
         """Check a list of URLs against the provided list of domain indicators.
 
         :param urls: List of URLs to check against domain indicators
         :type urls: list
-        :returns: Indicator details if matched, otherwise None
+        :returns: Indicator details of the first matching URL, otherwise None
 
         """
         if not urls:
             return None
 
+        urls = list(urls)
+        matches = self.match_urls(urls)
         for url in urls:
-            check = self.check_domain(url)
-            if check:
-                return check
+            if url in matches:
+                return matches[url]
 
         return None
 
@@ -425,27 +725,31 @@ class Indicators:
             return None
 
         proc_name = os.path.basename(process)
-        for ioc in self.get_iocs("processes"):
-            if proc_name == ioc["value"]:
-                self.log.warning(
-                    'Found a known suspicious process name "%s" '
-                    'matching indicators from "%s"',
-                    process,
-                    ioc["name"],
-                )
-                return ioc
+        if len(proc_name) == TRUNCATED_PROCESS_NAME_LENGTH:
+            # Covers both exact matches and longer indicators, whichever
+            # comes first in the collections.
+            ioc = self._lookup("processes", f"truncated:{proc_name}")
+        else:
+            ioc = self._lookup("processes", proc_name)
 
-            if len(proc_name) == 16:
-                if ioc["value"].startswith(proc_name):
-                    self.log.warning(
-                        "Found a truncated known suspicious "
-                        'process name "%s" matching indicators from "%s"',
-                        process,
-                        ioc["name"],
-                    )
-                    return ioc
+        if not ioc:
+            return None
 
-        return None
+        if proc_name == ioc["value"]:
+            self.log.warning(
+                'Found a known suspicious process name "%s" '
+                'matching indicators from "%s"',
+                process,
+                ioc["name"],
+            )
+        else:
+            self.log.warning(
+                "Found a truncated known suspicious "
+                'process name "%s" matching indicators from "%s"',
+                process,
+                ioc["name"],
+            )
+        return ioc
 
     def check_processes(self, processes: list) -> Union[dict, None]:
         """Check the provided list of processes against the list of
@@ -477,15 +781,15 @@ class Indicators:
         if not email:
             return None
 
-        for ioc in self.get_iocs("emails"):
-            if email.lower() == ioc["value"].lower():
-                self.log.warning(
-                    'Found a known suspicious email address "%s" '
-                    'matching indicators from "%s"',
-                    email,
-                    ioc["name"],
-                )
-                return ioc
+        ioc = self._lookup("emails", email)
+        if ioc:
+            self.log.warning(
+                'Found a known suspicious email address "%s" '
+                'matching indicators from "%s"',
+                email,
+                ioc["name"],
+            )
+            return ioc
 
         return None
 
@@ -501,15 +805,15 @@ class Indicators:
         if not file_name:
             return None
 
-        for ioc in self.get_iocs("file_names"):
-            if ioc["value"] == file_name:
-                self.log.warning(
-                    'Found a known suspicious file name "%s" '
-                    'matching indicators from "%s"',
-                    file_name,
-                    ioc["name"],
-                )
-                return ioc
+        ioc = self._lookup("file_names", file_name)
+        if ioc:
+            self.log.warning(
+                'Found a known suspicious file name "%s" '
+                'matching indicators from "%s"',
+                file_name,
+                ioc["name"],
+            )
+            return ioc
 
         return None
 
@@ -606,18 +910,29 @@ class Indicators:
         if not file_hash:
             return None
 
-        for ioc in self.get_iocs("files_sha256"):
-            if file_hash.lower() == ioc["value"].lower():
-                self.log.warning(
-                    'Found a known suspicious file with hash "%s" '
-                    'matching indicators from "%s"',
-                    file_hash,
-                    ioc["name"],
-                )
-                return ioc
+        ioc = self._lookup("files_sha256", file_hash)
+        if ioc:
+            self.log.warning(
+                'Found a known suspicious file with hash "%s" '
+                'matching indicators from "%s"',
+                file_hash,
+                ioc["name"],
+            )
+            return ioc
 
         return None
 
+    def match_file_hashes(
+        self, file_hashes: Iterable[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Check many SHA256 file hashes against the list of indicators.
+
+        :param file_hashes: Iterable of SHA256 hashes to check
+        :returns: Dictionary of each matching hash to its indicator details
+
+        """
+        return self._match_many(self.check_file_hash, file_hashes)
+
     def check_app_id(self, app_id: str) -> Union[dict, None]:
         """Check the provided app identifier (typically an Android package name)
         against the list of indicators.
@@ -630,18 +945,27 @@ class Indicators:
         if not app_id:
             return None
 
-        for ioc in self.get_iocs("app_ids"):
-            if app_id.lower() == ioc["value"].lower():
-                self.log.warning(
-                    'Found a known suspicious app with ID "%s" '
-                    'matching indicators from "%s"',
-                    app_id,
-                    ioc["name"],
-                )
-                return ioc
+        ioc = self._lookup("app_ids", app_id)
+        if ioc:
+            self.log.warning(
+                'Found a known suspicious app with ID "%s" '
+                'matching indicators from "%s"',
+                app_id,
+                ioc["name"],
+            )
+            return ioc
 
         return None
 
+    def match_app_ids(self, app_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Check many app identifiers against the list of indicators.
+
+        :param app_ids: Iterable of app IDs to check
+        :returns: Dictionary of each matching app ID to its indicator details
+
+        """
+        return self._match_many(self.check_app_id, app_ids)
+
     def check_android_property_name(self, property_name: str) -> Optional[dict]:
         """Check the android property name against the list of indicators.
 
@@ -653,14 +977,14 @@ class Indicators:
         if property_name is None:
             return None
 
-        for ioc in self.get_iocs("android_property_names"):
-            if property_name.lower() == ioc["value"].lower():
-                self.log.warning(
-                    'Found a known suspicious Android property "%s" '
-                    'matching indicators from "%s"',
-                    property_name,
-                    ioc["name"],
-                )
-                return ioc
+        ioc = self._lookup("android_property_names", property_name)
+        if ioc:
+            self.log.warning(
+                'Found a known suspicious Android property "%s" '
+                'matching indicators from "%s"',
+                property_name,
+                ioc["name"],
+            )
+            return ioc
 
         return None
@@ -5,7 +5,9 @@ import json
 import logging
 import os
 import re
-from typing import Any, Iterator, Union
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, Optional, Union
 
 from rich.logging import RichHandler
 
@@ -176,6 +178,131 @@ def keys_bytes_to_string(obj: Any) -> Any:
     return new_obj
 
 
+HASH_BUFFER_SIZE = 1024 * 1024
+# Hashes are cached on disk, keyed on the path, size, mtime and inode of
+# the file, so that unchanged files are never read again.
+MVT_HASH_CACHE_PATH = os.environ.get(
+    "MVT_HASH_CACHE", os.path.join("modules", "hash_cache.sqlite3")
+)
+
+
+class FileHashCache:
+    """Persistent cache of file digests keyed on (path, size, mtime, inode)."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Losing the last entries on a crash only means hashing again.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    md5 TEXT NOT NULL
+                )
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[Dict[str, str]]:
+        try:
+            with self._lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT size, mtime_ns, inode, sha256, sha1, md5 "
+                        "FROM file_hashes WHERE path = ?",
+                        (path,),
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error:
+            return None
+
+        if not row or tuple(row[:3]) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return {"sha256": row[3], "sha1": row[4], "md5": row[5]}
+
+    def set(self, path: str, stat: os.stat_result, hashes: Dict[str, str]) -> None:
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        path,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        stat.st_ino,
+                        hashes["sha256"],
+                        hashes["sha1"],
+                        hashes["md5"],
+                    ),
+                )
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+file_hash_cache = FileHashCache(MVT_HASH_CACHE_PATH)
+
+
+def get_file_hashes(file_path: str, use_cache: bool = True) -> Dict[str, str]:
+    """Calculate the SHA256, SHA1 and MD5 hashes of a file in a single pass.
+
+    :param file_path: Path to the file to hash
+    :param use_cache: Look up and store the hashes in the persistent cache
+    :returns: Dictionary with the "sha256", "sha1" and "md5" hex digests
+    :raises OSError: If the file cannot be read
+
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    if use_cache:
+        cached = file_hash_cache.get(path, stat)
+        if cached:
+            return cached
+
+    sha256_hash = hashlib.sha256()
+    sha1_hash = hashlib.sha1()
+    md5_hash = hashlib.md5()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as handle:
+        while True:
+            size = handle.readinto(buffer)
+            if not size:
+                break
+            chunk = view[:size]
+            sha256_hash.update(chunk)
+            sha1_hash.update(chunk)
+            md5_hash.update(chunk)
+
+    hashes = {
+        "sha256": sha256_hash.hexdigest(),
+        "sha1": sha1_hash.hexdigest(),
+        "md5": md5_hash.hexdigest(),
+    }
+    if use_cache:
+        file_hash_cache.set(path, stat, hashes)
+    return hashes
+
+
 def get_sha256_from_file_path(file_path: str) -> str:
     """Calculate the SHA256 hash of a file from a file path.
 
@@ -183,16 +310,11 @@ def get_sha256_from_file_path(file_path: str) -> str:
     :returns: The SHA256 hash string
 
     """
-    sha256_hash = hashlib.sha256()
     try:
-        with open(file_path, "rb") as handle:
-            for byte_block in iter(lambda: handle.read(4096), b""):
-                sha256_hash.update(byte_block)
+        return get_file_hashes(file_path)["sha256"]
     except OSError:
         return ""
 
-    return sha256_hash.hexdigest()
-
 
 def generate_hashes_from_path(path: str, log) -> Iterator[dict]:
     """
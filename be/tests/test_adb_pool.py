@@ -0,0 +1,200 @@
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+from app.utils import adb_pool as adb_pool_module
+from app.utils.adb_pool import (
+    AdbConnectionPool,
+    AdbError,
+    AdbServerLock,
+    AdbShellSession,
+)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not reached in time")
+        time.sleep(0.01)
+
+
+def test_shared_is_reentrant_while_writer_waits():
+    lock = AdbServerLock()
+    writer_done = threading.Event()
+
+    def writer():
+        with lock.exclusive():
+            writer_done.set()
+
+    with lock.shared():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        wait_for(lambda: lock._writers_waiting == 1)
+
+        # Nested access from the thread that already holds the lock must not
+        # queue behind the waiting writer, otherwise it would deadlock.
+        with lock.shared():
+            assert not writer_done.is_set()
+
+        assert not writer_done.is_set()
+
+    thread.join(timeout=2)
+    assert writer_done.is_set()
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = AdbServerLock()
+    order = []
+    release_first_reader = threading.Event()
+
+    def first_reader():
+        with lock.shared():
+            order.append("reader-1")
+            release_first_reader.wait(timeout=2)
+
+    def writer():
+        with lock.exclusive():
+            order.append("writer")
+
+    def second_reader():
+        with lock.shared():
+            order.append("reader-2")
+
+    threads = [threading.Thread(target=first_reader)]
+    threads[0].start()
+    wait_for(lambda: lock._readers == 1)
+
+    threads.append(threading.Thread(target=writer))
+    threads[1].start()
+    wait_for(lambda: lock._writers_waiting == 1)
+
+    threads.append(threading.Thread(target=second_reader))
+    threads[2].start()
+    time.sleep(0.05)
+    assert order == ["reader-1"]
+
+    release_first_reader.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert order == ["reader-1", "writer", "reader-2"]
+
+
+def test_usb_handoff_detaches_only_one_device(monkeypatch):
+    commands = []
+
+    def fake_run(command, *args, **kwargs):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+
+    monkeypatch.setattr(adb_pool_module.subprocess, "run", fake_run)
+    pool = AdbConnectionPool()
+    other_device_done = threading.Event()
+    same_device_done = threading.Event()
+
+    def use_device(serial, done):
+        with pool.server_access(serial):
+            done.set()
+
+    with pool.usb_handoff("SERIAL_A"):
+        # The device lock is only held while detaching, not during the scan
+        for serial, done in (
+            ("SERIAL_B", other_device_done),
+            ("SERIAL_A", same_device_done),
+        ):
+            threading.Thread(target=use_device, args=(serial, done)).start()
+        assert other_device_done.wait(timeout=2)
+        assert same_device_done.wait(timeout=2)
+
+    assert commands == [
+        ["adb", "-s", "SERIAL_A", "detach"],
+        ["adb", "-s", "SERIAL_A", "attach"],
+    ]
+
+
+class FakeSession:
+    def __init__(self, serial, transport_id=None, result=(0, "ok"), error=None):
+        self.serial = serial
+        self.transport_id = transport_id
+        self.result = result
+        self.error = error
+        self.commands = []
+        self.closed = False
+
+    def is_alive(self):
+        return True
+
+    def run(self, command):
+        self.commands.append(command)
+        if self.error:
+            raise self.error
+        return self.result
+
+    def close(self):
+        self.closed = True
+
+
+def test_stale_idle_session_is_replaced_before_sending(monkeypatch):
+    opened = []
+
+    def open_session(serial, transport_id=None):
+        opened.append(FakeSession(serial, transport_id))
+        return opened[-1]
+
+    monkeypatch.setattr(adb_pool_module, "AdbShellSession", open_session)
+    local, remote = socket.socketpair()
+    remote.close()
+    stale = AdbShellSession.__new__(AdbShellSession)
+    stale.serial, stale.transport_id, stale.sock, stale.buffer = "S", None, local, b""
+
+    pool = AdbConnectionPool()
+    pool._idle["S"] = [stale]
+
+    assert pool._run_shell("S", "id") == (0, "ok")
+    assert len(opened) == 1
+    assert opened[0].commands == ["id"]
+    assert pool.stats()["discarded"] == 1
+
+
+def test_failure_after_send_is_not_retried(monkeypatch):
+    opened = []
+
+    def open_session(serial, transport_id=None):
+        opened.append(serial)
+        return FakeSession(serial, transport_id)
+
+    monkeypatch.setattr(adb_pool_module, "AdbShellSession", open_session)
+    pool = AdbConnectionPool()
+    session = FakeSession("S", error=AdbError("connection closed"))
+    pool._idle["S"] = [session]
+
+    with pytest.raises(AdbError):
+        pool._run_shell("S", "pm install app.apk")
+
+    # The command may already have run on the device, so it is not resent
+    assert session.commands == ["pm install app.apk"]
+    assert session.closed
+    assert opened == []
+    assert "S" not in pool._no_persistent_shell
+
+
+def test_rejected_session_falls_back_to_oneshot(monkeypatch):
+    def open_session(serial, transport_id=None):
+        raise AdbError("closed")
+
+    monkeypatch.setattr(adb_pool_module, "AdbShellSession", open_session)
+    pool = AdbConnectionPool()
+    oneshot = []
+    monkeypatch.setattr(
+        pool, "_run_oneshot", lambda serial, command: oneshot.append(command) or (0, "")
+    )
+
+    pool._run_shell("S", "id")
+    pool._run_shell("S", "id")
+
+    assert oneshot == ["id", "id"]
+    assert "S" in pool._no_persistent_shell
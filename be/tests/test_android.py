@@ -6,6 +6,8 @@ from mvt.android.artifacts.dumpsys_package_activities import (
     DumpsysPackageActivitiesArtifact,
 )
 from mvt.android.artifacts.dumpsys_appops import DumpsysAppopsArtifact
+from mvt.android.utils import ApkCache, get_apk_cache_key
+from mvt.common.indicators import Indicators
 
 import os
 import logging
@@ -105,3 +107,96 @@ class TestAndroidArtifact:
         assert da.results[6]["package_name"] == "com.sec.factory.camera"
         assert len(da.results[6]["permissions"][1]["entries"]) == 1
         assert len(da.results[11]["permissions"]) == 4
+
+    def test_check_indicators_bulk(self):
+        indicators = Indicators(log=logging)
+        collection = indicators._new_collection(name="Test", file_name="test.stix2")
+        collection["app_ids"] = ["com.sec.factory.camera"]
+        indicators.ioc_collections.append(collection)
+
+        da = DumpsysAppopsArtifact()
+        da.log = logging
+        da.indicators = indicators
+        with open(get_artifact("dumpsys_appops.txt")) as f:
+            da.parse(f.read())
+
+        matches = indicators.match_app_ids(r["package_name"] for r in da.results)
+        assert list(matches.keys()) == ["com.sec.factory.camera"]
+
+        da.check_indicators()
+        assert len(da.detected) == 1
+        assert da.detected[0]["matched_indicator"]["name"] == "Test"
+
+    def test_indicators_with_log(self, caplog):
+        indicators = Indicators(log=logging.getLogger("shared"))
+        collection = indicators._new_collection(name="Test", file_name="test.stix2")
+        collection["processes"] = ["evil_process"]
+        indicators.ioc_collections.append(collection)
+
+        first = indicators.with_log(logging.getLogger("module.first"))
+        second = indicators.with_log(logging.getLogger("module.second"))
+
+        with caplog.at_level(logging.WARNING):
+            assert first.check_process("evil_process")
+            assert second.check_processes(["evil_process"])
+
+        loggers = [record.name for record in caplog.records]
+        assert loggers == ["module.first", "module.second"]
+        assert indicators.log.name == "shared"
+        assert first.ioc_collections is indicators.ioc_collections
+
+    def test_parsing_streamed_lines(self):
+        # Parsers accept an open file (iterable of lines) as well as a string
+        # and must produce the same results.
+        cases = [
+            (GetProp, "getprop.txt"),
+            (Processes, "ps.txt"),
+            (DumpsysPackagesArtifact, "dumpsys_packages.txt"),
+            (DumpsysPackageActivitiesArtifact, "dumpsys_packages.txt"),
+            (DumpsysAppopsArtifact, "dumpsys_appops.txt"),
+        ]
+        for artifact_class, fname in cases:
+            file = get_artifact(fname)
+            with open(file) as f:
+                data = f.read()
+
+            from_string = artifact_class()
+            from_string.log = logging
+            from_string.parse(data)
+
+            from_stream = artifact_class()
+            from_stream.log = logging
+            with open(file, "rb") as f:
+                from_stream.parse(f)
+
+            assert from_stream.results == from_string.results
+
+    def test_apk_cache(self, tmp_path):
+        dpa = DumpsysPackagesArtifact()
+        with open(get_artifact("dumpsys_packages.txt")) as f:
+            dpa.parse(f.read())
+
+        key = get_apk_cache_key(dpa.results[0])
+        assert key == ("500700000", "2008-12-31 16:00:00")
+
+        package = dpa.results[0]["package_name"]
+        remote_path = "/data/app/~~a==/pkg-b==/base.apk"
+        apk = tmp_path / "pulled.apk"
+        apk.write_bytes(b"apk v1")
+
+        cache = ApkCache("emulator-5554", str(tmp_path / "cache"))
+        assert cache.get(package, remote_path, key) is None
+        cache.put(package, remote_path, key, str(apk))
+
+        # The index is persisted and reused by a new instance.
+        cache = ApkCache("emulator-5554", str(tmp_path / "cache"))
+        cached_path = cache.get(package, remote_path, key)
+        with open(cached_path, "rb") as f:
+            assert f.read() == b"apk v1"
+
+        # An update invalidates the cached copy of the package.
+        updated_key = (key[0], "2024-01-01 00:00:00")
+        assert cache.get(package, remote_path, updated_key) is None
+        cache.put(package, remote_path, updated_key, str(apk))
+        assert cache.get(package, remote_path, key) is None
+        assert cache.get(package, remote_path, updated_key)
@@ -0,0 +1,77 @@
+import logging
+import threading
+
+from mvt.common.command import Command
+from mvt.common.module import MVTModule
+
+
+class OverlappingModule(MVTModule):
+    # Every module of both scans waits here, so all of them run at once
+    barrier = None
+
+    def run(self) -> None:
+        self.log.info("module started for %s", self.serial)
+        OverlappingModule.barrier.wait(timeout=5)
+        self.log.info("module finished for %s", self.serial)
+
+
+class OtherOverlappingModule(OverlappingModule):
+    pass
+
+
+# Module loggers are named after the module path, like MVT's own modules
+for module_class in (OverlappingModule, OtherOverlappingModule):
+    module_class.__module__ = "mvt.android.modules.overlapping"
+
+
+class OverlappingCommand(Command):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.modules = [OverlappingModule, OtherOverlappingModule]
+
+
+def test_overlapping_scans_write_their_own_log(tmp_path):
+    mvt_logger = logging.getLogger("mvt")
+    previous_level = mvt_logger.level
+    mvt_logger.setLevel(logging.INFO)
+    OverlappingModule.barrier = threading.Barrier(4)
+    errors = []
+
+    def scan(serial):
+        try:
+            command = OverlappingCommand(
+                results_path=str(tmp_path / serial),
+                serial=serial,
+                log=logging.getLogger("mvt.android.cli"),
+                workers=2,
+            )
+            command.log.info("scan started for %s", serial)
+            command.run()
+        except Exception as exc:
+            errors.append(exc)
+
+    try:
+        threads = [
+            threading.Thread(target=scan, args=(serial,))
+            for serial in ("SERIAL_A", "SERIAL_B")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+    finally:
+        mvt_logger.setLevel(previous_level)
+
+    assert errors == []
+    for serial, other in (("SERIAL_A", "SERIAL_B"), ("SERIAL_B", "SERIAL_A")):
+        log = (tmp_path / serial / "cundamanix.log").read_text()
+        assert f"scan started for {serial}" in log
+        assert log.count(f"module finished for {serial}") == 2
+        assert other not in log
+
+    # Handlers are removed once each command is done
+    assert not [
+        handler
+        for handler in mvt_logger.handlers
+        if isinstance(handler, logging.FileHandler)
+    ]
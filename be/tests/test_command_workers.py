@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+
+from mvt.common.command import Command
+from mvt.common.module import MVTModule
+
+
+class RecordingModule(MVTModule):
+    # Set when the modules must all be running at the same time
+    barrier = None
+    delay = 0.0
+
+    def run(self) -> None:
+        if RecordingModule.barrier:
+            RecordingModule.barrier.wait(timeout=5)
+        # Earlier modules finish last, so completion order differs from
+        # declaration order
+        time.sleep(self.delay)
+        name = self.get_slug()
+        self.results = [
+            {"name": name, "index": index, "isodate": f"2024-01-0{index + 1}"}
+            for index in range(3)
+        ]
+
+    def check_indicators(self) -> None:
+        self.detected = [self.results[0]]
+
+    def serialize(self, record: dict) -> dict:
+        return {
+            "timestamp": record["isodate"],
+            "module": record["name"],
+            "event": "entry",
+            "data": str(record["index"]),
+        }
+
+
+class FirstModule(RecordingModule):
+    delay = 0.1
+
+
+class SecondModule(RecordingModule):
+    delay = 0.05
+
+
+class ThirdModule(RecordingModule):
+    pass
+
+
+class RecordingCommand(Command):
+    def __init__(self, **kwargs):
+        super().__init__(log=logging.getLogger("mvt.test"), **kwargs)
+        self.modules = [FirstModule, SecondModule, ThirdModule]
+
+
+def run_command(results_path, workers):
+    command = RecordingCommand(results_path=str(results_path), workers=workers)
+    command.run()
+    return command
+
+
+def test_parallel_modules_match_sequential_run(tmp_path):
+    RecordingModule.barrier = None
+    sequential = run_command(tmp_path / "sequential", workers=1)
+
+    # Only passes if all three modules are running at once
+    RecordingModule.barrier = threading.Barrier(3)
+    try:
+        parallel = run_command(tmp_path / "parallel", workers=3)
+    finally:
+        RecordingModule.barrier = None
+
+    assert [type(m) for m in parallel.executed] == [
+        FirstModule,
+        SecondModule,
+        ThirdModule,
+    ]
+    assert [m.results for m in parallel.executed] == [
+        m.results for m in sequential.executed
+    ]
+    assert parallel.detected_count == sequential.detected_count == 3
+    assert parallel.timeline == sequential.timeline
+    assert parallel.timeline_detected == sequential.timeline_detected
+    for name in ("first_module.json", "timeline.csv", "timeline_detected.csv"):
+        assert (tmp_path / "parallel" / name).read_text() == (
+            tmp_path / "sequential" / name
+        ).read_text()
@@ -0,0 +1,65 @@
+import pytest
+
+from app.utils import device_properties as device_properties_module
+from app.utils.adb_pool import AdbError
+from app.utils.device_properties import DevicePropertyCache
+
+GETPROP_OUTPUT = """[ro.product.brand]: [samsung]
+[ro.product.model]: [SM-A525F]
+[ro.build.version.release]: [13]
+"""
+
+
+class FakeAdbPool:
+    def __init__(self, devices):
+        self.devices = devices
+        self.device_queries = 0
+        self.shell_calls = 0
+
+    def get_devices(self):
+        self.device_queries += 1
+        return self.devices
+
+    def shell(self, serial, command):
+        self.shell_calls += 1
+        return GETPROP_OUTPUT
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    pool = FakeAdbPool([{"serial": "R58N", "state": "device", "transport_id": "3"}])
+    monkeypatch.setattr(device_properties_module, "adb_pool", pool)
+    return pool
+
+
+def test_property_reads_share_one_device_query(fake_pool):
+    cache = DevicePropertyCache()
+
+    serial, properties = cache.get_snapshot()
+    assert serial == "R58N"
+    assert properties["ro.product.model"] == "SM-A525F"
+    assert cache.get_property("R58N", "ro.product.brand") == "samsung"
+    assert cache.get_property("R58N", "ro.build.version.release") == "13"
+
+    assert fake_pool.device_queries == 1
+    assert fake_pool.shell_calls == 1
+
+
+def test_unknown_serial_refreshes_device_list(fake_pool):
+    cache = DevicePropertyCache()
+    cache.get_properties("R58N")
+
+    with pytest.raises(AdbError):
+        cache.get_properties("OTHER")
+    assert fake_pool.device_queries == 2
+
+
+def test_reconnect_invalidates_snapshot(fake_pool, monkeypatch):
+    monkeypatch.setattr(device_properties_module, "DEVICE_LIST_TTL", 0)
+    cache = DevicePropertyCache()
+    cache.get_properties("R58N")
+
+    fake_pool.devices = [{"serial": "R58N", "state": "device", "transport_id": "4"}]
+    cache.get_properties("R58N")
+
+    assert fake_pool.shell_calls == 2
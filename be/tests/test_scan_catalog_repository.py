@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from app.repositories import scan_catalog_repository as catalog_module
+from app.repositories.scan_catalog_repository import ScanCatalogRepository
+
+
+@pytest.fixture
+def base_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_module, "SCAN_CATALOG_DB", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(catalog_module, "_local", catalog_module.threading.local())
+    path = tmp_path / "full-scan" / "SERIAL_A"
+    path.mkdir(parents=True)
+    return path
+
+
+def make_scan(base_path, name, created_at):
+    scan_dir = base_path / name
+    scan_dir.mkdir()
+    ScanCatalogRepository.record_scan(
+        scan_dir, "full-scan", "SERIAL_A", name, created_at
+    )
+    return scan_dir
+
+
+def test_status_filter_skips_running_and_failed_scans(base_path):
+    completed = make_scan(base_path, "01012025_100000", 1)
+    failed = make_scan(base_path, "02012025_100000", 2)
+    running = make_scan(base_path, "03012025_100000", 3)
+    ScanCatalogRepository.update_status(completed, "completed")
+    ScanCatalogRepository.update_status(failed, "failed")
+
+    latest = ScanCatalogRepository.get_latest_scan_directory
+    assert latest(base_path) == running
+    assert latest(base_path, status="completed") == completed
+    assert latest(base_path, exclude=completed, status="completed") is None
+
+
+def test_unrecorded_folder_is_found_on_miss(base_path):
+    make_scan(base_path, "01012025_100000", 1)
+
+    # Folder dibuat di luar record_scan setelah katalog punya baris
+    copied = base_path / "02012025_100000"
+    copied.mkdir()
+    with open(copied / "detail_result.json", "w") as file:
+        json.dump({"status": "completed"}, file)
+
+    latest = ScanCatalogRepository.get_latest_scan_directory
+    assert latest(base_path, status="completed") == copied
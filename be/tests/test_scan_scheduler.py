@@ -0,0 +1,72 @@
+import threading
+import time
+
+from app.services.scan_scheduler import ScanScheduler
+
+
+def wait_for_jobs(scheduler, scan_ids, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [scheduler.get_job(scan_id) for scan_id in scan_ids]
+        if all(job["finished_at"] for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    raise AssertionError("Scan jobs did not finish in time")
+
+
+def test_scans_for_same_serial_run_in_order():
+    scheduler = ScanScheduler(max_concurrent=4)
+    lock = threading.Lock()
+    events = []
+    running = {"SERIAL_A": 0}
+
+    def scan(name):
+        with lock:
+            running["SERIAL_A"] += 1
+            assert running["SERIAL_A"] == 1
+            events.append(name)
+        time.sleep(0.02)
+        with lock:
+            running["SERIAL_A"] -= 1
+
+    scan_ids = [f"SERIAL_A_{i}" for i in range(3)]
+    for scan_id in scan_ids:
+        scheduler.submit("SERIAL_A", scan_id, "fast-scan", scan, scan_id)
+
+    jobs = wait_for_jobs(scheduler, scan_ids)
+    assert events == scan_ids
+    assert [job["status"] for job in jobs] == ["finished"] * 3
+
+
+def test_scans_for_different_serials_run_in_parallel():
+    scheduler = ScanScheduler(max_concurrent=2)
+    second_started = threading.Event()
+
+    def first_scan():
+        # Only finishes when the other device's scan runs at the same time
+        if not second_started.wait(timeout=2):
+            raise RuntimeError("Scan for SERIAL_B did not start")
+
+    def second_scan():
+        second_started.set()
+
+    scheduler.submit("SERIAL_A", "scan_a", "full-scan", first_scan)
+    scheduler.submit("SERIAL_B", "scan_b", "full-scan", second_scan)
+
+    jobs = wait_for_jobs(scheduler, ["scan_a", "scan_b"])
+    assert [job["status"] for job in jobs] == ["finished", "finished"]
+
+
+def test_failed_scan_does_not_stop_queue():
+    scheduler = ScanScheduler(max_concurrent=1)
+
+    def failing_scan():
+        raise RuntimeError("device disconnected")
+
+    scheduler.submit("SERIAL_A", "scan_1", "fast-scan", failing_scan)
+    scheduler.submit("SERIAL_A", "scan_2", "fast-scan", lambda: None)
+
+    first, second = wait_for_jobs(scheduler, ["scan_1", "scan_2"])
+    assert first["status"] == "failed"
+    assert first["error"] == "device disconnected"
+    assert second["status"] == "finished"
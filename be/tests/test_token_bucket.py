@@ -0,0 +1,54 @@
+import pytest
+
+from app.utils import token_bucket
+from app.utils.token_bucket import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(token_bucket.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(token_bucket.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_take_grants_burst_then_paces(clock):
+    bucket = TokenBucket(rate_per_minute=4)
+
+    assert bucket.take(10) == 4
+    assert clock.sleeps == []
+
+    # One token is refilled every 15 seconds at 4 requests per minute
+    assert bucket.take(10) == 1
+    assert sum(clock.sleeps) == pytest.approx(15)
+
+
+def test_take_returns_zero_on_timeout(clock):
+    bucket = TokenBucket(rate_per_minute=4)
+    bucket.take(4)
+
+    assert bucket.take(1, timeout=5) == 0
+    assert sum(clock.sleeps) == pytest.approx(5)
+
+
+def test_set_rate_caps_stored_tokens(clock):
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.set_rate(2)
+
+    assert bucket.take(10) == 2
+
+    bucket.set_rate(0)
+    assert bucket.take(1) == 0
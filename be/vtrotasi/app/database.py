@@ -1,14 +1,42 @@
+import os
 import sqlite3
+import threading
 
 DATABASE = "keys.db"
+# Lama menunggu lock SQLite sebelum error "database is locked" (milidetik)
+DATABASE_BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", 5000))
+
+_local = threading.local()
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
+    """
+    Koneksi SQLite yang dipakai ulang per thread (dan per proses, karena worker
+    Celery prefork dibuat dengan fork). Koneksi ini tidak perlu di-close oleh
+    pemanggil, gunakan `with conn:` atau conn.commit() untuk menyimpan.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+
+    conn = sqlite3.connect(DATABASE, timeout=DATABASE_BUSY_TIMEOUT_MS / 1000)
     conn.row_factory = sqlite3.Row
+    # WAL membuat pembaca tidak memblokir penulis (dan sebaliknya) antar worker
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DATABASE_BUSY_TIMEOUT_MS}")
+    _local.conn = conn
+    _local.pid = os.getpid()
     return conn
 
 
+def close_db_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
 def initialize_database():
     conn = get_db_connection()
     conn.execute(
@@ -35,5 +63,40 @@ def initialize_database():
         )
     """
     )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS verdict_cache (
+            sha256 TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            expires_at DATETIME NOT NULL
+        )
+    """
+    )
+    # Kolom lease key (lihat lease_api_key di tasks.py) untuk database lama
+    api_key_columns = {
+        row["name"] for row in conn.execute("PRAGMA table_info(api_keys)")
+    }
+    for column, definition in (
+        ("window_start", "REAL DEFAULT 0"),
+        ("window_count", "INTEGER DEFAULT 0"),
+        ("cooldown_until", "REAL DEFAULT 0"),
+        ("last_leased_at", "REAL DEFAULT 0"),
+    ):
+        if column not in api_key_columns:
+            conn.execute(f"ALTER TABLE api_keys ADD COLUMN {column} {definition}")
+    # task_results(task_id) sudah terindeks lewat constraint UNIQUE
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_api_keys_status_usage
+        ON api_keys (status, usage_count)
+    """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_verdict_cache_expires_at
+        ON verdict_cache (expires_at)
+    """
+    )
     conn.commit()
-    conn.close()
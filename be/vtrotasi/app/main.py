@@ -1,13 +1,16 @@
 from fastapi import FastAPI, File, UploadFile
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from celery.result import AsyncResult
 import sqlite3
 import os
 import json
 
-from app.models import AddKeysRequest, ScanFilesRequest
+from app.models import AddKeysRequest, ScanFilesRequest, TaskResultsRequest, VerdictLookupRequest
 from app.database import initialize_database, get_db_connection
-from app.tasks import scan_file_task
+from app.tasks import scan_file_task, reset_limited_keys, count_active_keys, REQUESTS_PER_MINUTE_PER_KEY
+from app.verdict_cache import purge_expired_verdicts, get_cached_verdicts
+from app.vt_upload import UPLOAD_CHUNK_SIZE
 
 
 app = FastAPI()
@@ -18,6 +21,7 @@ UPLOAD_FOLDER = "/app/uploaded_files"
 @app.on_event("startup")
 def startup_event():
     initialize_database()
+    purge_expired_verdicts()
 
 
 @app.post("/upload-files/")
@@ -29,9 +33,10 @@ async def upload_files(files: List[UploadFile] = File(...)):
 
     for file in files:
         file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        # file_path = os.
+        # Ditulis per potongan supaya file besar (APK, video) tidak dibaca utuh ke memori
         with open(file_path, "wb") as f:
-            f.write(await file.read())
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
         saved_files.append(file_path)
 
     return {"uploaded_files": saved_files, "message": "Files uploaded successfully"}
@@ -50,68 +55,104 @@ def add_keys(request: AddKeysRequest):
         except sqlite3.IntegrityError:
             skipped.append(key)
 
-    conn.close()
     return {"inserted": inserted, "skipped": skipped}
 
 
+@app.get("/capacity")
+def get_capacity():
+    # Kapasitas saat ini dipakai submitter untuk mengatur kecepatan /scan-files
+    reset_limited_keys()
+    active_keys = count_active_keys()
+    return {
+        "active_keys": active_keys,
+        "requests_per_minute_per_key": REQUESTS_PER_MINUTE_PER_KEY,
+        "requests_per_minute": active_keys * REQUESTS_PER_MINUTE_PER_KEY,
+    }
+
+
 @app.post("/scan-files")
 def scan_files(request: ScanFilesRequest):
-    tasks = [scan_file_task.delay(file_path) for file_path in request.file_paths]
+    tasks = [scan_file_task.delay(file_path, request.sha256.get(file_path)) for file_path in request.file_paths]
     return {"task_ids": [task.id for task in tasks]}
 
 
+@app.post("/cached-verdicts")
+def cached_verdicts(request: VerdictLookupRequest):
+    # Dipakai backend untuk mengecek hash (mis. dihitung di device) sebelum file
+    # ditarik. Hanya verdict final (status "found") yang dikembalikan.
+    verdicts = get_cached_verdicts(request.sha256, status="found")
+    return {"verdicts": {sha256: verdict["response"] for sha256, verdict in verdicts.items()}}
 
 
 
 
-# masalah : 
-# 1. endpoint task-status masih ada di web localhost
-# 2. nilai yang direturn cuma perlu task.result aja
-@app.get("/task-result/{task_id}")
-def get_task_status(task_id: str):
-
-    conn = get_db_connection()
-    cursor = conn.execute("SELECT * FROM task_results WHERE task_id = ?", (task_id,))
-    result = cursor.fetchone()
-    conn.close()
 
 
+# Jumlah task yang diambil dari result backend dalam satu round trip
+TASK_RESULTS_CHUNK_SIZE = int(os.getenv("TASK_RESULTS_CHUNK_SIZE", 500))
 
-    task_result = AsyncResult(task_id)
-    if task_result.state == "PENDING":
-        return {"task_id": task_id, "status": task_result.state, "result": None}
 
-
-
-
-    elif task_result.state == "FAILURE":
+def fetch_task_metas(task_ids: List[str]) -> dict:
+    """
+    Ambil state dan hasil beberapa task sekaligus. Backend key-value (Redis)
+    dibaca dengan satu MGET, backend lain dibaca per task lewat AsyncResult.
+    """
+    backend = scan_file_task.backend
+    try:
+        keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+        values = backend.mget(keys)
+        if hasattr(values, "items"):
+            values = [values.get(key) for key in keys]
+        return {
+            task_id: backend.decode_result(value) if value else None
+            for task_id, value in zip(task_ids, values)
+        }
+    except NotImplementedError:
+        metas = {}
+        for task_id in task_ids:
+            task_result = AsyncResult(task_id)
+            metas[task_id] = {"status": task_result.state, "result": task_result.info}
+        return metas
+
+
+def build_task_result(task_id: str, meta: Optional[dict]):
+    status = meta["status"] if meta else "PENDING"
+    if status == "PENDING":
+        return {"task_id": task_id, "status": status, "result": None}
+    elif status == "FAILURE":
         return {
             "task_id": task_id,
-            # "file_path": result["file_path"],
-            "status": task_result.state,
-            "result": str(task_result.info),
+            "status": status,
+            "result": str(meta["result"]),
         }
     else:
-        # return {
-        #     "task_id": task_id,
-        #     "file_path": result["file_path"],
-        #     "status": task_result.state,
-        #     "result": task_result.info,
-        # }
-            return task_result.info
-
-# @app.get("/task-result/{task_id}")
-# def get_task_result(task_id: str):
-#     conn = get_db_connection()
-#     cursor = conn.execute("SELECT * FROM task_results WHERE task_id = ?", (task_id,))
-#     result = cursor.fetchone()
-#     conn.close()
-#     if not result:
-#         return {"error": "Task not found"}
-#     return {
-#         "task_id": result["task_id"],
-#         "file_path": result["file_path"],
-#         "status": result["status"],
-#         # "result": str(task_result.info),
-#         "created_at": result["created_at"],
-#     }
\ No newline at end of file
+        return meta["result"]
+
+
+def iter_task_results(task_ids: List[str]):
+    for i in range(0, len(task_ids), TASK_RESULTS_CHUNK_SIZE):
+        chunk = task_ids[i:i + TASK_RESULTS_CHUNK_SIZE]
+        metas = fetch_task_metas(chunk)
+        for task_id in chunk:
+            yield task_id, build_task_result(task_id, metas.get(task_id))
+
+
+@app.get("/task-result/{task_id}")
+def get_task_status(task_id: str):
+    return build_task_result(task_id, fetch_task_metas([task_id])[task_id])
+
+
+@app.post("/task-results")
+def get_task_results(request: TaskResultsRequest):
+    # Isi setiap result sama dengan response /task-result/{task_id}
+    return {"results": dict(iter_task_results(request.task_ids))}
+
+
+@app.post("/task-results/stream")
+def stream_task_results(request: TaskResultsRequest):
+    # Versi NDJSON untuk daftar task yang sangat besar, satu task per baris
+    def generate():
+        for task_id, result in iter_task_results(request.task_ids):
+            yield json.dumps({"task_id": task_id, "result": result}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 
 
 class AddKeysRequest(BaseModel):
@@ -8,3 +8,13 @@ class AddKeysRequest(BaseModel):
 
 class ScanFilesRequest(BaseModel):
     file_paths: List[str]
+    # SHA-256 yang sudah dihitung pengirim (opsional), per file path
+    sha256: Dict[str, str] = {}
+
+
+class TaskResultsRequest(BaseModel):
+    task_ids: List[str]
+
+
+class VerdictLookupRequest(BaseModel):
+    sha256: List[str]
@@ -1,124 +1,346 @@
+import os
+import threading
+import time
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from app.database import get_db_connection
+from app.verdict_cache import get_cached_verdict, save_verdict
+from app.vt_upload import MultipartFileStream, VT_DIRECT_UPLOAD_LIMIT
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hashlib
 from datetime import datetime, timedelta
 
 celery = Celery("tasks", broker="redis://redis:6379/0", backend="redis://redis:6379/0")
 
-BASE_URL = "https://www.virustotal.com/api/v3/files/"
+VT_API_URL = os.getenv("VT_API_URL", "https://www.virustotal.com/api/v3").rstrip("/")
+BASE_URL = f"{VT_API_URL}/files/"
+UPLOAD_URL = f"{VT_API_URL}/files"
+LARGE_UPLOAD_URL = f"{VT_API_URL}/files/upload_url"
+# Timeout request ke VirusTotal (detik), upload diberi read timeout lebih lama
+VT_CONNECT_TIMEOUT = float(os.getenv("VT_CONNECT_TIMEOUT", 10))
+VT_READ_TIMEOUT = float(os.getenv("VT_READ_TIMEOUT", 60))
+VT_UPLOAD_READ_TIMEOUT = float(os.getenv("VT_UPLOAD_READ_TIMEOUT", 300))
+# Jumlah retry untuk error koneksi dan 5xx (429 ditangani rotasi key)
+VT_HTTP_RETRIES = int(os.getenv("VT_HTTP_RETRIES", 3))
+VT_HTTP_BACKOFF_FACTOR = float(os.getenv("VT_HTTP_BACKOFF_FACTOR", 1))
+VT_HTTP_POOL_SIZE = int(os.getenv("VT_HTTP_POOL_SIZE", 10))
+HASH_BUFFER_SIZE = 1024 * 1024
 RESET_INTERVAL_HOURS = 24
+# VirusTotal public API membatasi 4 request/menit untuk setiap API key
+REQUESTS_PER_MINUTE_PER_KEY = int(os.getenv("VT_REQUESTS_PER_MINUTE_PER_KEY", 4))
+# Batas penumpukan update usage_count sebelum ditulis ke database
+USAGE_FLUSH_COUNT = int(os.getenv("USAGE_FLUSH_COUNT", 20))
+KEY_WINDOW_SECONDS = 60
+# Lama task menunggu jatah key tersedia sebelum dianggap gagal (detik)
+KEY_LEASE_MAX_WAIT_SECONDS = float(os.getenv("KEY_LEASE_MAX_WAIT_SECONDS", 300))
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", 10))
+
+_usage_lock = threading.Lock()
+# key -> (jumlah pemakaian yang belum ditulis, last_used)
+_pending_usage = {}
+_usage_state = {"flushed_at": time.monotonic()}
+
+_http = {"session": None, "pid": None}
+
+
+def get_http_session() -> requests.Session:
+    """
+    Session keep-alive per proses worker supaya koneksi TLS ke VirusTotal
+    dipakai ulang antar task.
+    """
+    if _http["session"] is None or _http["pid"] != os.getpid():
+        retry = Retry(
+            total=VT_HTTP_RETRIES,
+            backoff_factor=VT_HTTP_BACKOFF_FACTOR,
+            status_forcelist=[500, 502, 503, 504],
+            # Upload (POST) hanya diulang jika koneksi gagal dibuat
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=VT_HTTP_POOL_SIZE, pool_maxsize=VT_HTTP_POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http["session"] = session
+        _http["pid"] = os.getpid()
+    return _http["session"]
 
 
 def reset_limited_keys():
     conn = get_db_connection()
-    cursor = conn.execute("SELECT key, reset_time FROM api_keys WHERE status = 'limited'")
-    rows = cursor.fetchall()
-    now = datetime.utcnow()
+    with conn:
+        conn.execute(
+            "UPDATE api_keys SET status = 'active', reset_time = NULL "
+            "WHERE status = 'limited' AND reset_time IS NOT NULL AND reset_time <= ?",
+            (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),),
+        )
+
+
+def _try_lease_api_key():
+    """
+    Ambil satu jatah request dari key aktif secara atomik (BEGIN IMMEDIATE),
+    dipilih round-robin berdasarkan lease paling lama. Setiap key punya jatah
+    REQUESTS_PER_MINUTE_PER_KEY per jendela 60 detik dan masuk cooldown begitu
+    jatahnya habis, sebelum VirusTotal membalas 429.
+
+    Mengembalikan (key, None), atau (None, detik sampai ada key yang bisa
+    dipakai), atau (None, None) jika tidak ada key aktif sama sekali.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            """
+            SELECT key, window_start, window_count, cooldown_until FROM api_keys
+            WHERE status = 'active'
+            ORDER BY last_leased_at ASC, id ASC
+            """
+        ).fetchall()
+
+        retry_after = None
+        for row in rows:
+            if row["cooldown_until"] > now:
+                wait = row["cooldown_until"] - now
+                retry_after = wait if retry_after is None else min(retry_after, wait)
+                continue
+
+            window_start, window_count = row["window_start"], row["window_count"]
+            if now - window_start >= KEY_WINDOW_SECONDS:
+                window_start, window_count = now, 0
+            window_count += 1
+            cooldown_until = 0
+            if window_count >= REQUESTS_PER_MINUTE_PER_KEY:
+                cooldown_until = window_start + KEY_WINDOW_SECONDS
 
-    for row in rows:
-        reset_time = row["reset_time"]
-        if reset_time and datetime.strptime(reset_time, "%Y-%m-%d %H:%M:%S") <= now:
             conn.execute(
-                "UPDATE api_keys SET status = 'active', reset_time = NULL WHERE key = ?", (row["key"],)
-            )  # noqa
-    conn.commit()
-    conn.close()
+                """
+                UPDATE api_keys
+                SET window_start = ?, window_count = ?, cooldown_until = ?,
+                    last_leased_at = ?
+                WHERE key = ?
+                """,
+                (window_start, window_count, cooldown_until, now, row["key"]),
+            )
+            conn.commit()
+            return row["key"], None
 
+        conn.commit()
+        return None, retry_after
+    except Exception:
+        conn.rollback()
+        raise
 
-def get_active_key():
+
+def lease_api_key(max_wait: float = None):
+    """
+    Lease key untuk satu request VirusTotal, menunggu sampai jatah per menit
+    tersedia paling lama max_wait detik. None jika tidak ada key yang bisa
+    dipakai.
+    """
+    if max_wait is None:
+        max_wait = KEY_LEASE_MAX_WAIT_SECONDS
+    deadline = time.monotonic() + max_wait
+
+    while True:
+        api_key, retry_after = _try_lease_api_key()
+        if api_key:
+            return api_key
+        if retry_after is None or time.monotonic() + retry_after > deadline:
+            return None
+        time.sleep(retry_after)
+
+
+def count_active_keys():
     conn = get_db_connection()
-    cursor = conn.execute("SELECT key FROM api_keys WHERE status = 'active' ORDER BY usage_count ASC LIMIT 1")
-    row = cursor.fetchone()
-    conn.close()
-    return row["key"] if row else None
+    row = conn.execute(
+        "SELECT COUNT(*) AS total FROM api_keys WHERE status = 'active'"
+    ).fetchone()
+    return row["total"]
 
 
 def handle_api_key_limit(api_key: str):
     reset_time = (datetime.utcnow() + timedelta(hours=RESET_INTERVAL_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
     conn = get_db_connection()
-    conn.execute("UPDATE api_keys SET status = 'limited', reset_time = ? WHERE key = ?", (reset_time, api_key))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE api_keys SET status = 'limited', reset_time = ? WHERE key = ?", (reset_time, api_key))
 
 
 def increment_key_usage(api_key: str):
+    """
+    Pemakaian key dikumpulkan di memori lalu ditulis sekaligus setiap
+    USAGE_FLUSH_COUNT pemakaian atau USAGE_FLUSH_SECONDS detik.
+    """
+    with _usage_lock:
+        count, _ = _pending_usage.get(api_key, (0, None))
+        _pending_usage[api_key] = (count + 1, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+        flush_due = (
+            sum(count for count, _ in _pending_usage.values()) >= USAGE_FLUSH_COUNT
+            or time.monotonic() - _usage_state["flushed_at"] >= USAGE_FLUSH_SECONDS
+        )
+
+    if flush_due:
+        flush_key_usage()
+
+
+def flush_key_usage():
+    with _usage_lock:
+        pending = dict(_pending_usage)
+        _pending_usage.clear()
+        _usage_state["flushed_at"] = time.monotonic()
+
+    if not pending:
+        return
+
     conn = get_db_connection()
-    conn.execute(
-        """
-        UPDATE api_keys
-        SET usage_count = usage_count + 1, last_used = ?
-        WHERE key = ?
-        """,
-        (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), api_key),
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.executemany(
+            """
+            UPDATE api_keys
+            SET usage_count = usage_count + ?, last_used = ?
+            WHERE key = ?
+            """,
+            [(count, last_used, api_key) for api_key, (count, last_used) in pending.items()],
+        )
+
+
+@worker_process_shutdown.connect
+def flush_key_usage_on_shutdown(**kwargs):
+    flush_key_usage()
 
 
 def save_task_result(task_id, file_path, status, result):
     conn = get_db_connection()
-    conn.execute(
-        """
-        INSERT INTO task_results (task_id, file_path, status, result)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(task_id) DO UPDATE SET
-        status=excluded.status, result=excluded.result
-        """,
-        (task_id, file_path, status, result),
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO task_results (task_id, file_path, status, result)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(task_id) DO UPDATE SET
+            status=excluded.status, result=excluded.result
+            """,
+            (task_id, file_path, status, result),
+        )
 
 
 @celery.task(bind=True)
-def scan_file_task(self, file_path):
+def scan_file_task(self, file_path, file_hash=None):
+    if not os.path.isfile(file_path):
+        save_task_result(self.request.id, file_path, "FAILURE", "File not found.")
+        return {"file_path": file_path, "error": "File not found."}
+
+    # Hash dari pengirim dipakai jika ada, selain itu dihitung di sini
+    if not file_hash:
+        try:
+            file_hash = sha256_file(file_path)
+        except FileNotFoundError:
+            save_task_result(self.request.id, file_path, "FAILURE", "File not found.")
+            return {"file_path": file_path, "error": "File not found."}
+
+    # File yang sama (mis. APK populer) sering discan dari banyak device,
+    # verdict yang masih berlaku dipakai tanpa menghabiskan kuota API key.
+    cached = get_cached_verdict(file_hash)
+    if cached:
+        save_task_result(self.request.id, file_path, "SUCCESS", str(cached["response"]))
+        return {"file_path": file_path, "response": cached["response"], "cached": True}
+
     reset_limited_keys()
 
-    api_key = get_active_key()
+    api_key = lease_api_key()
     if not api_key:
         save_task_result(self.request.id, file_path, "FAILURE", "No active API keys available.")
         return {"file_path": file_path, "error": "No active API keys available."}
 
-    headers = {"x-apikey": api_key}
+    session = get_http_session()
+    try:
+        return _lookup_file(self, session, file_path, file_hash, api_key)
+    except requests.RequestException as e:
+        save_task_result(self.request.id, file_path, "FAILURE", f"Error contacting VirusTotal: {e}")
+        return {"file_path": file_path, "error": f"Error contacting VirusTotal: {e}"}
+
+
+def upload_file(session, file_path, headers):
+    """
+    Upload file ke VirusTotal dengan body multipart yang dibaca bertahap dari
+    disk. File di atas VT_DIRECT_UPLOAD_LIMIT diupload ke URL sekali pakai dari
+    /files/upload_url. Mengembalikan None jika upload URL gagal didapat.
+    """
+    upload_url = UPLOAD_URL
+    if os.path.getsize(file_path) > VT_DIRECT_UPLOAD_LIMIT:
+        url_response = session.get(LARGE_UPLOAD_URL, headers=headers, timeout=(VT_CONNECT_TIMEOUT, VT_READ_TIMEOUT))
+        if url_response.status_code != 200:
+            return None
+        upload_url = url_response.json()["data"]
+
+    with MultipartFileStream(file_path) as body:
+        return session.post(
+            upload_url,
+            headers={**headers, "Content-Type": body.content_type},
+            data=body,
+            timeout=(VT_CONNECT_TIMEOUT, VT_UPLOAD_READ_TIMEOUT),
+        )
 
-    # Calculate file hash
+
+def sha256_file(file_path):
     sha256_hash = hashlib.sha256()
-    try:
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-    except FileNotFoundError:
-        save_task_result(self.request.id, file_path, "FAILURE", "File not found.")
-        return {"file_path": file_path, "error": "File not found."}
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            sha256_hash.update(view[:size])
+    return sha256_hash.hexdigest()
+
 
-    file_hash = sha256_hash.hexdigest()
+def _lookup_file(task, session, file_path, file_hash, api_key):
+    headers = {"x-apikey": api_key}
     url = BASE_URL + file_hash
 
     while True:
-        response = requests.get(url, headers=headers)
+        response = session.get(
+            url, headers=headers, timeout=(VT_CONNECT_TIMEOUT, VT_READ_TIMEOUT)
+        )
 
         if response.status_code == 429:
             handle_api_key_limit(api_key)
-            api_key = get_active_key()
+            api_key = lease_api_key()
             if not api_key:
-                save_task_result(
-                    self.request.id, file_path, "FAILURE", "All API keys have reached their limit."
-                )  # noqa
-                return {"file_path": file_path, "error": "All API keys have reached their limit."}
+                error = "All API keys have reached their limit."
+                save_task_result(task.request.id, file_path, "FAILURE", error)
+                return {"file_path": file_path, "error": error}
             headers["x-apikey"] = api_key
         elif response.status_code == 404:
-            with open(file_path, "rb") as file:
-                upload_response = requests.post(
-                    "https://www.virustotal.com/api/v3/files", headers=headers, files={"file": file}
+            # Upload juga dihitung VirusTotal sebagai satu request
+            api_key = lease_api_key()
+            if not api_key:
+                error = "All API keys have reached their limit."
+                save_task_result(task.request.id, file_path, "FAILURE", error)
+                return {"file_path": file_path, "error": error}
+            headers["x-apikey"] = api_key
+            upload_response = upload_file(session, file_path, headers)
+            if upload_response is None or upload_response.status_code != 200:
+                save_task_result(
+                    task.request.id, file_path, "FAILURE", "Error uploading file."
                 )
-                if upload_response.status_code != 200:
-                    save_task_result(self.request.id, file_path, "FAILURE", "Error uploading file.")
-                    return {"file_path": file_path, "error": "Error uploading file to VirusTotal."}
-                increment_key_usage(api_key)
-                save_task_result(self.request.id, file_path, "SUCCESS", str(upload_response.json()))
-                return {"file_path": file_path, "response": upload_response.json()}
+                return {
+                    "file_path": file_path,
+                    "error": "Error uploading file to VirusTotal.",
+                }
+            increment_key_usage(api_key)
+            save_verdict(file_hash, "not_found", upload_response.json())
+            save_task_result(
+                task.request.id, file_path, "SUCCESS", str(upload_response.json())
+            )
+            return {"file_path": file_path, "response": upload_response.json()}
         else:
             increment_key_usage(api_key)
-            save_task_result(self.request.id, file_path, "SUCCESS", str(response.json()))
+            if response.status_code == 200:
+                save_verdict(file_hash, "found", response.json())
+            save_task_result(
+                task.request.id, file_path, "SUCCESS", str(response.json())
+            )
             return {"file_path": file_path, "response": response.json()}
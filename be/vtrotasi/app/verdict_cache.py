@@ -0,0 +1,100 @@
+import os
+import json
+from datetime import datetime, timedelta
+
+from app.database import get_db_connection
+
+# Lama verdict VirusTotal (response 200) disimpan sebelum dicek ulang
+VERDICT_CACHE_TTL_HOURS = float(os.getenv("VERDICT_CACHE_TTL_HOURS", 24))
+# Lama hash yang belum dikenal VirusTotal (404, file sudah diupload) disimpan.
+# Dibuat singkat supaya setelah analisis selesai verdict asli bisa diambil.
+VERDICT_CACHE_NEGATIVE_TTL_MINUTES = float(
+    os.getenv("VERDICT_CACHE_NEGATIVE_TTL_MINUTES", 30)
+)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+VERDICT_LOOKUP_CHUNK_SIZE = 500
+
+
+def get_cached_verdict(sha256: str):
+    """Ambil verdict yang masih berlaku untuk hash ini, atau None."""
+    conn = get_db_connection()
+    cursor = conn.execute(
+        "SELECT status, response FROM verdict_cache "
+        "WHERE sha256 = ? AND expires_at > ?",
+        (sha256, datetime.utcnow().strftime(DATE_FORMAT)),
+    )
+    row = cursor.fetchone()
+
+    if not row:
+        return None
+    return {"status": row["status"], "response": json.loads(row["response"])}
+
+
+def get_cached_verdicts(sha256_list, status: str = None) -> dict:
+    """
+    Ambil verdict yang masih berlaku untuk banyak hash sekaligus.
+    Mengembalikan {sha256: {"status", "response"}}, hash tanpa verdict tidak disertakan.
+    """
+    conn = get_db_connection()
+    now = datetime.utcnow().strftime(DATE_FORMAT)
+    hashes = list(dict.fromkeys(sha256_list))
+    verdicts = {}
+    # Batas jumlah parameter SQLite (999 di versi lama)
+    for i in range(0, len(hashes), VERDICT_LOOKUP_CHUNK_SIZE):
+        chunk = hashes[i:i + VERDICT_LOOKUP_CHUNK_SIZE]
+        query = (
+            "SELECT sha256, status, response FROM verdict_cache "
+            f"WHERE sha256 IN ({','.join('?' * len(chunk))}) AND expires_at > ?"
+        )
+        params = [*chunk, now]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        for row in conn.execute(query, params):
+            verdicts[row["sha256"]] = {
+                "status": row["status"],
+                "response": json.loads(row["response"]),
+            }
+    return verdicts
+
+
+def save_verdict(sha256: str, status: str, response):
+    """
+    Simpan response VirusTotal untuk hash ini.
+    status "found" memakai VERDICT_CACHE_TTL_HOURS, status "not_found" (hasil
+    upload setelah 404) memakai VERDICT_CACHE_NEGATIVE_TTL_MINUTES.
+    """
+    if status == "found":
+        ttl = timedelta(hours=VERDICT_CACHE_TTL_HOURS)
+    else:
+        ttl = timedelta(minutes=VERDICT_CACHE_NEGATIVE_TTL_MINUTES)
+
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    conn.execute(
+        """
+        INSERT INTO verdict_cache (sha256, status, response, created_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET
+        status=excluded.status, response=excluded.response,
+        created_at=excluded.created_at, expires_at=excluded.expires_at
+        """,
+        (
+            sha256,
+            status,
+            json.dumps(response),
+            now.strftime(DATE_FORMAT),
+            (now + ttl).strftime(DATE_FORMAT),
+        ),
+    )
+    conn.commit()
+
+
+def purge_expired_verdicts():
+    conn = get_db_connection()
+    conn.execute(
+        "DELETE FROM verdict_cache WHERE expires_at <= ?",
+        (datetime.utcnow().strftime(DATE_FORMAT),),
+    )
+    conn.commit()
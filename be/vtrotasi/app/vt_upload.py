@@ -0,0 +1,76 @@
+import os
+import uuid
+import mimetypes
+
+# Ukuran potongan saat membaca/menulis file (byte)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# File lebih besar dari batas upload langsung VirusTotal (32 MB) diupload
+# lewat URL dari /files/upload_url
+VT_DIRECT_UPLOAD_LIMIT = int(os.getenv("VT_DIRECT_UPLOAD_LIMIT", 32 * 1024 * 1024))
+
+
+class MultipartFileStream:
+    """
+    Body multipart/form-data satu file yang dibaca bertahap dari disk, sehingga
+    memori worker tidak bergantung pada ukuran file. Panjang body diketahui di
+    awal agar requests mengirim Content-Length (bukan chunked encoding).
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        field_name: str = "file",
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+    ):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        file_name = os.path.basename(file_path).replace('"', "")
+        file_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; '
+            f'filename="{file_name}"\r\n'
+            f"Content-Type: {file_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._size = os.path.getsize(file_path)
+        self._parts = None
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self._size + len(self._tail)
+
+    def __enter__(self):
+        self._file = open(self.file_path, "rb")
+        self._parts = [self._head, self._file, self._tail]
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.chunk_size
+
+        data = b""
+        while self._parts and len(data) < size:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                need = size - len(data)
+                data += part[:need]
+                if len(part) > need:
+                    self._parts[0] = part[need:]
+                else:
+                    self._parts.pop(0)
+            else:
+                chunk = part.read(size - len(data))
+                if not chunk:
+                    self._parts.pop(0)
+                    continue
+                data += chunk
+        return data